@@ -2,6 +2,10 @@ import cv2
 import sys
 import os
 
+# Shared pipeline helpers live in the Ubuntu optimized folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ubuntu_22_04_optimized'))
+from camera_discovery import probe_cameras
+
 def test_camera_access():
     print("Testing different camera access methods...")
     
@@ -11,21 +15,19 @@ def test_camera_access():
     
     for backend_idx, backend in enumerate(backends):
         print(f"\nTrying backend: {backend_names[backend_idx]}")
+        # Indices 0-9 are probed concurrently, then reported in order
+        cameras = {info.index: info for info in probe_cameras(range(10), backend=backend)}
         for idx in range(10):
             print(f"  Testing camera index {idx}...")
-            cap = cv2.VideoCapture(idx, backend)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret:
-                    print(f"    SUCCESS: Camera {idx} works with {backend_names[backend_idx]} backend!")
-                    print(f"    Frame size: {frame.shape}")
-                    cap.release()
-                    return idx, backend
-                else:
-                    print(f"    Camera {idx} opened but can't read frames")
-                cap.release()
-            else:
+            info = cameras.get(idx)
+            if info is None:
                 print(f"    Camera {idx} not available")
+            elif info.readable:
+                print(f"    SUCCESS: Camera {idx} works with {backend_names[backend_idx]} backend!")
+                print(f"    Frame size: ({info.height}, {info.width}, 3)")
+                return idx, backend
+            else:
+                print(f"    Camera {idx} opened but can't read frames")
     
     # Method 2: Try specific device paths
     print("\nTrying specific device paths...")
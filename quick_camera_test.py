@@ -1,7 +1,13 @@
 import cv2
-import numpy as np
+import os
+import sys
 import time
 
+# Shared pipeline helpers live in the Ubuntu optimized folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ubuntu_22_04_optimized'))
+from camera_discovery import probe_cameras
+from static_feed import StaticFeedDetector, analyze_feed
+
 def quick_virtual_camera_test():
     """Quick test to find the OBS virtual camera"""
     print("🔍 Quick Virtual Camera Detection")
@@ -9,10 +15,16 @@ def quick_virtual_camera_test():
     print()
     
     results = []
+    detector = StaticFeedDetector(similarity_threshold=0.95)  # High threshold for static detection
+    # Probe cameras 0-10 concurrently and only sample the ones that opened
+    available = {info.index for info in probe_cameras(range(11), read_frame=False)}
     
     for camera_index in range(11):  # Test cameras 0-10
         print(f"Testing camera {camera_index}...", end=" ")
         
+        if camera_index not in available:
+            print("❌ Not available")
+            continue
         cap = cv2.VideoCapture(camera_index)
         if not cap.isOpened():
             print("❌ Not available")
@@ -22,36 +34,16 @@ def quick_virtual_camera_test():
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
-        # Capture a few frames and compare
-        frames = []
-        similarities = []
-        
-        for i in range(10):  # Capture 10 frames
-            ret, frame = cap.read()
-            if ret:
-                frames.append(frame)
-                time.sleep(0.1)
-        
+        # Compare up to 10 frames, stopping as soon as the answer is clear
+        result = analyze_feed(cap, max_frames=10, timeout=1.0, detector=detector)
         cap.release()
         
-        if len(frames) < 2:
+        if len(result.similarities) == 0:
             print("❌ No frames captured")
             continue
         
-        # Calculate similarity between consecutive frames
-        for i in range(1, len(frames)):
-            # Convert to grayscale
-            gray1 = cv2.cvtColor(frames[i-1], cv2.COLOR_BGR2GRAY)
-            gray2 = cv2.cvtColor(frames[i], cv2.COLOR_BGR2GRAY)
-            
-            # Calculate similarity
-            mse = np.mean((gray1.astype(float) - gray2.astype(float)) ** 2)
-            max_mse = 255 ** 2
-            similarity = 1 - (mse / max_mse)
-            similarities.append(similarity)
-        
-        avg_similarity = np.mean(similarities)
-        is_static = avg_similarity > 0.95  # High threshold for static detection
+        avg_similarity = result.similarity
+        is_static = result.is_static
         
         status = "🟢 STATIC (Virtual Camera)" if is_static else "🔴 DYNAMIC (Real Camera)"
         print(f"{status} (similarity: {avg_similarity:.3f})")
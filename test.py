@@ -1,20 +1,24 @@
 import cv2
-import sys, time
-import mediapipe as mp
+import sys, time, threading
 import numpy as np
-mp_drawing = mp.solutions.drawing_utils
-mp_face_mesh = mp.solutions.face_mesh
-
-# For live video:
-
-drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-face_mesh = mp_face_mesh.FaceMesh(
+import argparse
+import os
+# Shared pipeline helpers live in the Ubuntu optimized folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ubuntu_22_04_optimized'))
+from frame_pipeline import create_pipeline, add_pipeline_arguments
+from frame_source import CameraSource, open_source, add_source_arguments
+from startup import BackgroundFaceMesh
+from camera_discovery import CameraCache, find_camera, confirm_camera
+from hud_overlay import HudOverlay
+
+# For live video. MediaPipe loads on a background thread while the camera is opened
+face_mesh = BackgroundFaceMesh(
     static_image_mode=False,  # Set to False for video
     max_num_faces=1,          # Allow up to 2 faces
     refine_landmarks=True,    # Better landmark accuracy
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5
-)
+).start()
 
 # Eye landmark indices for MediaPipe Face Mesh
 LEFT_EYE_LANDMARKS = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
@@ -101,12 +105,7 @@ def get_face_mesh(image):
     
     for face_landmarks in results.multi_face_landmarks:
         # Draw face mesh
-        mp_drawing.draw_landmarks(
-            image=annotated_image,
-            landmark_list=face_landmarks,
-            connections=mp_face_mesh.FACEMESH_CONTOURS,
-            landmark_drawing_spec=drawing_spec,
-            connection_drawing_spec=drawing_spec)
+        face_mesh.draw_landmarks(annotated_image, face_landmarks)
         
         # Calculate eye aspect ratios for blink detection
         left_ear = calculate_eye_aspect_ratio(LEFT_EYE_POINTS, face_landmarks.landmark)
@@ -139,19 +138,28 @@ def get_face_mesh(image):
     return annotated_image, 0, blink_counter, 0, yawn_counter
      
      
-font = cv2.FONT_HERSHEY_SIMPLEX    
-# Try different camera indices for OBS DroidCam
-camera_indices = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-cap = None
-
-for idx in camera_indices:
-    print(f"Trying camera index {idx}...")
-    cap = cv2.VideoCapture(idx)
-    if cap.isOpened():
-        print(f"Successfully opened camera at index {idx}")
-        break
-    else:
+parser = argparse.ArgumentParser(description='DroidCam Blink & Yawn Detection')
+add_pipeline_arguments(parser)
+add_source_arguments(parser)
+parser.add_argument('--hud-fps', type=float, default=10.0,
+                    help='How often the FPS/EAR/MAR readouts refresh; 0 = every frame (default: 10)')
+args = parser.parse_args()
+
+# Try camera indices 0-10 for OBS DroidCam (probed concurrently, last good one first)
+if args.source is not None:
+    # Recorded or synthetic input instead of the phone camera
+    cap = open_source(args.source, args.pacing, args.fps, args.loop)
+else:
+    print("Looking for the DroidCam camera...")
+    idx, from_cache = find_camera(preferred=range(11))
+    cap = CameraSource(idx) if idx is not None else None
+    if from_cache and not cap.isOpened():
         cap.release()
+        CameraCache().invalidate()
+        idx, from_cache = find_camera(preferred=range(11), use_cache=False)
+        cap = CameraSource(idx) if idx is not None else None
+    if cap is not None and cap.isOpened():
+        print(f"Successfully opened camera at index {idx}")
 
 if cap is None or not cap.isOpened():
     print("Could not open any camera. Please check:")
@@ -167,37 +175,42 @@ print("Blink & Yawn Detection Started!")
 print("Blink normally and yawn to test the counters.")
 print("Press ESC to quit, S to save, R to reset counters")
 
-while cap.isOpened():
-    s = time.time()
-    ret, img = cap.read()  
-    if ret == False:
-        print('WebCAM Read Error')    
-        sys.exit(0)
-        
-    annotated, ear, blinks, mar, yawns = get_face_mesh(img)
-    e = time.time()
-    fps = 1 / (e - s)
-    
-    # Add FPS and title
-    cv2.putText(annotated, 'FPS:%5.2f'%(fps), (10,30), font, fontScale = 0.7,  color = (0,255,0), thickness = 2)
-    cv2.putText(annotated, 'DroidCam: Blink & Yawn Detection', (10,60), font, fontScale = 0.6,  color = (0,255,0), thickness = 1)
-    
-    # Add blink counter and EAR display
-    cv2.putText(annotated, f'Blinks: {blinks}', (10,90), font, fontScale = 0.8,  color = (255,0,255), thickness = 2)
-    cv2.putText(annotated, f'EAR: {ear:.3f}', (10,120), font, fontScale = 0.5,  color = (255,255,0), thickness = 1)
-    
-    # Add yawn counter and MAR display
-    cv2.putText(annotated, f'Yawns: {yawns}', (10,150), font, fontScale = 0.8,  color = (0,255,255), thickness = 2)
-    cv2.putText(annotated, f'MAR: {mar:.3f}', (10,180), font, fontScale = 0.5,  color = (255,255,0), thickness = 1)
+# HUD text: static lines are rasterized once, the rest only when their text changes
+hud = HudOverlay(refresh_hz=args.hud_fps)
+hud.add('fps', (10,30), 0.7, (0,255,0), thickness=2)
+hud.add('title', (10,60), 0.6, (0,255,0), text='DroidCam: Blink & Yawn Detection')
+hud.add('blinks', (10,90), 0.8, (255,0,255), thickness=2)
+hud.add('ear', (10,120), 0.5, (255,255,0))
+hud.add('yawns', (10,150), 0.8, (0,255,255), thickness=2)
+hud.add('mar', (10,180), 0.5, (255,255,0))
+hud.add('blink_detected', (10,210), 0.6, (0,0,255), thickness=2)
+hud.add('yawn_detected', (10,240), 0.6, (255,0,0), thickness=2)
+hud.add('help', (10,270), 0.4, (0,255,0), text='ESC=quit, S=save, R=reset counters')
+
+frames = create_pipeline(cap, get_face_mesh, args.pipelined, args.queue_size, args.drop_policy)
+# Only a discovered camera is remembered for the next start
+camera_confirmed = args.source is not None
+
+for item in frames:
+    if not camera_confirmed:
+        # First frame arrived: remember this camera for the next start
+        threading.Thread(target=confirm_camera, args=(idx, item.frame.shape), daemon=True).start()
+        camera_confirmed = True
+    annotated, ear, blinks, mar, yawns = item.result
+    fps = 1 / item.frame_time if item.frame_time > 0 else 0
+    
+    # FPS and ratio readouts refresh at --hud-fps; text is only re-rasterized when it changes
+    if hud.due():
+        hud.set('fps', 'FPS:%5.2f'%(fps))
+        hud.set('ear', f'EAR: {ear:.3f}')
+        hud.set('mar', f'MAR: {mar:.3f}')
+    hud.set('blinks', f'Blinks: {blinks}')
+    hud.set('yawns', f'Yawns: {yawns}')
     
     # Visual indicators for detection
-    if ear > 0 and ear < EYE_AR_THRESH:
-        cv2.putText(annotated, 'BLINK DETECTED!', (10,210), font, fontScale = 0.6,  color = (0,0,255), thickness = 2)
-    
-    if mar > MOUTH_AR_THRESH:
-        cv2.putText(annotated, 'YAWN DETECTED!', (10,240), font, fontScale = 0.6,  color = (255,0,0), thickness = 2)
-    
-    cv2.putText(annotated, 'ESC=quit, S=save, R=reset counters', (10,270), font, fontScale = 0.4,  color = (0,255,0), thickness = 1)
+    hud.set('blink_detected', 'BLINK DETECTED!' if ear > 0 and ear < EYE_AR_THRESH else None)
+    hud.set('yawn_detected', 'YAWN DETECTED!' if mar > MOUTH_AR_THRESH else None)
+    hud.draw(annotated)
     
     cv2.imshow('DroidCam Face Mesh', annotated)
     key = cv2.waitKey(1)
@@ -210,8 +223,12 @@ while cap.isOpened():
     elif key == ord('r') or key == ord('R'):  # Reset counters
         blink_counter = 0
         yawn_counter = 0
+        hud.invalidate()
         print(f"Counters reset - Blinks: 0, Yawns: 0")
 
+frames.stop()
+if frames.read_failed:
+    print('WebCAM Read Error')
 cap.release()
 cv2.destroyAllWindows()
 face_mesh.close()
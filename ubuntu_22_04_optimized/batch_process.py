@@ -0,0 +1,310 @@
+"""Offline batch mode: run the drowsiness detection logic over recorded drives"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from landmark_cache import CACHE_DIR, DEFAULT_MAX_BYTES, LandmarkCache
+
+# Optional dependency for Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+OUTPUT_FORMATS = ['npz', 'parquet']
+
+# Set in each worker process by _init_worker()
+detection = None
+landmark_cache = None
+
+
+def expand_inputs(patterns):
+    """Expand file names, image directories and (quoted) glob patterns into a sorted, de-duplicated list"""
+    files = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True)
+        files.extend(matches if matches else [pattern])
+    return sorted(set(f for f in files if os.path.isfile(f) or os.path.isdir(f)))
+
+
+def output_names(paths, reserved=()):
+    """Unique name per input: its path relative to the inputs' common directory, without the file extension.
+
+    a/cam.avi and b/cam.avi become a__cam and b__cam. Raises ValueError
+    when two inputs (or an input and a reserved name) still map to the
+    same name, instead of letting one output overwrite the other.
+    """
+    if not paths:
+        return []
+    absolute = [os.path.abspath(os.path.normpath(path)) for path in paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in absolute])
+    names, owners = [], {name: '(reserved)' for name in reserved}
+    for path, full in zip(paths, absolute):
+        relative = os.path.relpath(full, root)
+        if os.path.isfile(full):
+            relative = os.path.splitext(relative)[0]
+        name = relative.replace(os.sep, '__')
+        if name in owners:
+            raise ValueError(f"{path} and {owners[name]} would both be written as '{name}'")
+        owners[name] = path
+        names.append(name)
+    return names
+
+
+def write_columns(path, columns, output_format):
+    """Write a dict of equal-length columns as a columnar file"""
+    if output_format == 'parquet':
+        table = pa.table({name: np.asarray(values) for name, values in columns.items()})
+        pq.write_table(table, path + '.parquet')
+        return path + '.parquet'
+    np.savez(path + '.npz', **{name: np.asarray(values) for name, values in columns.items()})
+    return path + '.npz'
+
+
+def _init_worker(roi_tracking=False, cache_dir=None, cache_max_bytes=None):
+    """Give every worker process its own FaceMesh and detector state"""
+    global detection, landmark_cache
+    # Keep OpenCV from spawning a thread pool per worker
+    import cv2
+    cv2.setNumThreads(1)
+    import drowsiness_detection_ubuntu
+    detection = drowsiness_detection_ubuntu
+    detection.roi_tracker.enabled = roi_tracking
+    if cache_dir:
+        landmark_cache = LandmarkCache(cache_dir, cache_max_bytes)
+
+
+def face_mesh_settings():
+    """Everything that changes FaceMesh output, for the landmark cache key"""
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        mediapipe_version = version('mediapipe')
+    except PackageNotFoundError:
+        mediapipe_version = ''
+    return dict(detection.face_mesh.options, mediapipe=mediapipe_version)
+
+
+def _detect_frames(cap):
+    """get_face_mesh on every frame (ROI tracking and frame skipping apply)"""
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        _, ear, _, mar, _, is_drowsy = detection.get_face_mesh(frame, annotate=False, timestamp=cap.timestamp)
+        yield cap.timestamp, ear, mar, is_drowsy
+
+
+def _record_frames(cap, writer):
+    """Full-frame FaceMesh on every frame, keeping all landmarks for the cache"""
+    import cv2
+    from landmark_math import compute_aspect_ratios, landmarks_to_array
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        results = detection.face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        landmarks = None
+        if results.multi_face_landmarks:
+            landmarks = landmarks_to_array(results.multi_face_landmarks[0].landmark)
+        writer.append(landmarks)
+        ratios = compute_aspect_ratios(landmarks).tolist() if landmarks is not None else None
+        ear, _, mar, _, is_drowsy = detection.process_ratios(ratios, cap.timestamp)
+        yield cap.timestamp, ear, mar, is_drowsy
+
+
+def _replay_frames(reader):
+    """Detector logic on cached landmarks: no decoding and no inference, one chunk in memory at a time"""
+    from landmark_math import compute_aspect_ratios
+
+    for start, landmarks, present in reader.chunks():
+        # Frames without a face are all zeros; their ratios are discarded
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = compute_aspect_ratios(landmarks).tolist()
+        for i, face in enumerate(present):
+            timestamp = (start + i) / reader.fps
+            ear, _, mar, _, is_drowsy = detection.process_ratios(ratios[i] if face else None, timestamp)
+            yield timestamp, ear, mar, is_drowsy
+
+
+def process_video(video_path, output_dir, output_format, name=None):
+    """Run the detector over one video (or image directory) as fast as possible and write its per-frame metrics.
+
+    The metrics go to <name>.frames.npz/.parquet; name defaults to the
+    video's file name without extension (main() passes output_names()).
+
+    With a landmark cache, a video seen before with the same FaceMesh
+    settings is replayed from its cached landmarks; otherwise FaceMesh runs
+    on every full frame and the landmarks are cached on the way.
+    """
+    from frame_source import UNTHROTTLED, open_source
+
+    detection.reset_counters()
+    detection.reset_tracking()
+
+    cap = reader = writer = None
+    if landmark_cache is not None and os.path.isfile(video_path):
+        settings = face_mesh_settings()
+        key = landmark_cache.key(video_path, settings)
+        reader = landmark_cache.open(key)
+    if reader is None:
+        cap = open_source(video_path, UNTHROTTLED)
+        if not cap.isOpened():
+            return {'video': video_path, 'error': 'could not open video'}
+        if landmark_cache is not None and os.path.isfile(video_path):
+            landmark_count = 478 if settings.get('refine_landmarks') else 468
+            writer = landmark_cache.writer(key, landmark_count, cap.fps, settings)
+
+    if reader is not None:
+        frames = _replay_frames(reader)
+    elif writer is not None:
+        frames = _record_frames(cap, writer)
+    else:
+        frames = _detect_frames(cap)
+
+    timestamps, ears, mars = [], [], []
+    face_present, blinks, yawns, drowsy = [], [], [], []
+
+    start = time.time()
+    try:
+        # Video time, so per-minute rates are right however fast the video is processed
+        for timestamp, ear, mar, is_drowsy in frames:
+            timestamps.append(timestamp)
+            # EAR is 0 when no face was found
+            face_present.append(ear > 0)
+            ears.append(ear)
+            mars.append(mar)
+            blinks.append(detection.blink_counter)
+            yawns.append(detection.yawn_counter)
+            drowsy.append(is_drowsy)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    elapsed = time.time() - start
+    if writer is not None:
+        writer.commit()
+    if cap is not None:
+        cap.release()
+
+    frame_count = len(timestamps)
+    drowsy = np.asarray(drowsy, dtype=bool)
+    if name is None:
+        name = output_names([video_path])[0]
+    write_columns(os.path.join(output_dir, name + '.frames'), {
+        'frame': np.arange(frame_count, dtype=np.int32),
+        'timestamp': np.asarray(timestamps, dtype=np.float64),
+        'face_present': np.asarray(face_present, dtype=bool),
+        'ear': np.asarray(ears, dtype=np.float32),
+        'mar': np.asarray(mars, dtype=np.float32),
+        'blinks': np.asarray(blinks, dtype=np.int32),
+        'yawns': np.asarray(yawns, dtype=np.int32),
+        'drowsy': drowsy,
+    }, output_format)
+
+    # Rising edges of the drowsiness alert
+    drowsy_events = int(np.count_nonzero(drowsy[1:] & ~drowsy[:-1]) + (drowsy[0] if frame_count else 0))
+    return {
+        'video': video_path,
+        'name': name,
+        'frames': frame_count,
+        'face_frames': int(np.count_nonzero(face_present)),
+        'duration': timestamps[-1] if timestamps else 0.0,
+        'blinks': detection.blink_counter,
+        'yawns': detection.yawn_counter,
+        'drowsy_events': drowsy_events,
+        'drowsy_frames': int(np.count_nonzero(drowsy)),
+        'processing_time': elapsed,
+        'processing_fps': frame_count / elapsed if elapsed > 0 else 0.0,
+        'landmarks_cached': reader is not None,
+        'error': '',
+    }
+
+
+def _process_job(job):
+    video_path, name, output_dir, output_format = job
+    try:
+        return process_video(video_path, output_dir, output_format, name)
+    except Exception as e:
+        return {'video': video_path, 'error': str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run drowsiness detection over recorded videos')
+    parser.add_argument('inputs', nargs='+',
+                        help='Video files, image directories or glob patterns (e.g. "drives/**/*.mp4")')
+    parser.add_argument('-o', '--output', default='batch_results', help='Output directory (default: batch_results)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes, each with its own FaceMesh (default: CPU count)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='npz',
+                        help='Columnar output format (parquet needs pyarrow)')
+    parser.add_argument('--roi-tracking', action='store_true',
+                        help='Run FaceMesh on a crop around the previous face position')
+    parser.add_argument('--landmark-cache', nargs='?', const=CACHE_DIR, metavar='DIR',
+                        help=f'Cache FaceMesh landmarks per video and reuse them on later runs (default dir: {CACHE_DIR})')
+    parser.add_argument('--cache-size-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help='Evict least recently used cache entries above this size (default: 2048)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and pa is None:
+        print("❌ Parquet output needs pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("❌ No input videos found")
+        sys.exit(1)
+
+    try:
+        names = output_names(files, reserved=('summary',))
+    except ValueError as e:
+        print(f"❌ Output name collision: {e}")
+        sys.exit(1)
+
+    os.makedirs(args.output, exist_ok=True)
+    workers = max(1, min(args.workers, len(files)))
+    print(f"🎞️  Processing {len(files)} video(s) with {workers} worker(s)...")
+
+    jobs = [(f, name, args.output, args.format) for f, name in zip(files, names)]
+    summaries = []
+    start = time.time()
+    # spawn: MediaPipe graphs must not be inherited through fork
+    context = multiprocessing.get_context('spawn')
+    if args.landmark_cache:
+        print(f"🗃️  Landmark cache: {args.landmark_cache} (up to {args.cache_size_mb:.0f} MB)")
+        if args.roi_tracking:
+            print("⚠️  ROI tracking is not used for videos whose landmarks are being cached")
+    initargs = (args.roi_tracking, args.landmark_cache, int(args.cache_size_mb * 1024 ** 2))
+    with context.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for summary in pool.imap_unordered(_process_job, jobs):
+            summaries.append(summary)
+            if summary['error']:
+                print(f"❌ {summary['video']}: {summary['error']}")
+            else:
+                cached = ' from cached landmarks' if summary['landmarks_cached'] else ''
+                print(f"✅ {summary['video']}: {summary['frames']} frames{cached}, "
+                      f"{summary['blinks']} blinks, {summary['yawns']} yawns, "
+                      f"{summary['drowsy_events']} drowsy alerts ({summary['processing_fps']:.1f} FPS)")
+
+    summaries.sort(key=lambda s: s['video'])
+    ok = [s for s in summaries if not s['error']]
+    keys = [key for key in (ok[0] if ok else {'video': None}) if key != 'error']
+    columns = {key: [s[key] for s in ok] for key in keys}
+    summary_path = write_columns(os.path.join(args.output, 'summary'), columns, args.format)
+
+    elapsed = time.time() - start
+    total_frames = sum(s['frames'] for s in ok)
+    print(f"📊 {len(ok)}/{len(files)} videos, {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed > 0 else 0:.1f} FPS overall)")
+    print(f"💾 Summary written to {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
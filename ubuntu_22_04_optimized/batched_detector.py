@@ -0,0 +1,204 @@
+"""Blink/yawn/drowsiness state for many streams, updated one batch of frames at a time.
+
+DrowsinessDetector keeps the counters of update_counters() and the
+DrowsinessWindow rings of N streams in NumPy arrays, so an aggregation
+process can advance hundreds of streams with a few array operations
+instead of one Python call per stream and frame.
+"""
+import numpy as np
+
+from detection_events import BLINK, YAWN, DROWSY_START, DROWSY_END
+
+# Rows returned by DrowsinessDetector.update(); count is the blink/yawn total after the event
+EVENT_DTYPE = np.dtype([('stream', np.int32), ('event', 'U12'), ('timestamp', np.float64), ('count', np.int32)])
+EVENT_NAMES = np.array([BLINK, YAWN, DROWSY_START, DROWSY_END])
+
+
+class BatchedSlidingWindow:
+    """SlidingWindow for N streams: one (N, capacity) ring of timestamped samples per stream.
+
+    Every method takes an array of stream indices that must not repeat
+    within one call.
+    """
+
+    def __init__(self, streams, window, capacity):
+        self.window = window
+        self.capacity = capacity
+        self.times = np.zeros((streams, capacity), np.float64)
+        self.values = np.zeros((streams, capacity), np.int32)
+        self.head = np.zeros(streams, np.intp)     # Index of each stream's oldest sample
+        self.size = np.zeros(streams, np.intp)
+        self.total = np.zeros(streams, np.int64)   # Sum of the values currently in each window
+
+    def _drop_oldest(self, rows):
+        head = self.head[rows]
+        self.total[rows] -= self.values[rows, head]
+        self.head[rows] = (head + 1) % self.capacity
+        self.size[rows] -= 1
+
+    def push(self, rows, timestamps, values=1):
+        """Append one sample per row without expiring (the caller expires the rows itself)"""
+        full = rows[self.size[rows] == self.capacity]
+        if len(full):
+            self._drop_oldest(full)
+        index = (self.head[rows] + self.size[rows]) % self.capacity
+        self.times[rows, index] = timestamps
+        self.values[rows, index] = values
+        self.size[rows] += 1
+        self.total[rows] += values
+
+    def add(self, rows, timestamps, values=1):
+        self.push(rows, timestamps, values)
+        self.expire(rows, timestamps)
+
+    def expire(self, rows, now):
+        cutoff = np.asarray(now, np.float64) - self.window
+        # Usually a single pass: a stream rarely loses more than one sample per frame
+        while len(rows):
+            stale = (self.size[rows] > 0) & (self.times[rows, self.head[rows]] <= cutoff)
+            rows, cutoff = rows[stale], cutoff[stale]
+            if len(rows):
+                self._drop_oldest(rows)
+
+    def reset(self, rows):
+        self.head[rows] = self.size[rows] = self.total[rows] = 0
+
+
+class DrowsinessDetector:
+    """update_counters() and DrowsinessWindow for N streams at once.
+
+    Feed only frames with a face, like the single-stream detector. Streams
+    are identified by their index in [0, streams).
+    """
+
+    def __init__(self, streams, ear_thresh=0.25, blink_frames=2, mar_thresh=0.6, yawn_frames=10,
+                 blink_thresh=15, yawn_thresh=3, perclos_thresh=0.15, event_window=60.0, perclos_window=60.0,
+                 max_fps=60):
+        self.streams = streams
+        self.ear_thresh = ear_thresh
+        self.blink_frames = blink_frames
+        self.mar_thresh = mar_thresh
+        self.yawn_frames = yawn_frames
+        self.blink_thresh = blink_thresh
+        self.yawn_thresh = yawn_thresh
+        self.perclos_thresh = perclos_thresh
+        self.min_perclos_frames = 30
+        # Same capacities as DrowsinessWindow
+        self.blink_window = BatchedSlidingWindow(streams, event_window, int(event_window * 4) + 16)
+        self.yawn_window = BatchedSlidingWindow(streams, event_window, int(event_window) + 16)
+        self.eyes_closed = BatchedSlidingWindow(streams, perclos_window, int(perclos_window * max_fps))
+
+        self.blink_counter = np.zeros(streams, np.int32)
+        self.blink_frame_counter = np.zeros(streams, np.int32)
+        self.yawn_counter = np.zeros(streams, np.int32)
+        self.yawn_frame_counter = np.zeros(streams, np.int32)
+        self.drowsy_alert = np.zeros(streams, bool)
+
+    def reset(self, streams=None):
+        """Clear the state of some streams (e.g. after a reconnect), or of all of them"""
+        rows = np.arange(self.streams) if streams is None else np.asarray(streams, np.intp)
+        for array in (self.blink_counter, self.blink_frame_counter, self.yawn_counter, self.yawn_frame_counter):
+            array[rows] = 0
+        self.drowsy_alert[rows] = False
+        for window in (self.blink_window, self.yawn_window, self.eyes_closed):
+            window.reset(rows)
+
+    @property
+    def blinks_per_minute(self):
+        return self.blink_window.size * 60.0 / self.blink_window.window
+
+    @property
+    def yawns_per_minute(self):
+        return self.yawn_window.size * 60.0 / self.yawn_window.window
+
+    @property
+    def perclos(self):
+        return self.eyes_closed.total / np.maximum(self.eyes_closed.size, 1)
+
+    def update(self, stream_ids, ear, mar, timestamps):
+        """Advance the streams by one batch of face frames; returns the emitted events (EVENT_DTYPE array).
+
+        Rows of the same stream are applied in batch order, so a batch may
+        hold several consecutive frames per stream.
+        """
+        stream_ids = np.asarray(stream_ids, np.intp)
+        ear = np.asarray(ear, np.float64)
+        mar = np.asarray(mar, np.float64)
+        timestamps = np.asarray(timestamps, np.float64)
+        if not len(stream_ids):
+            return np.zeros(0, EVENT_DTYPE)
+
+        order = np.argsort(stream_ids, kind='stable')
+        sorted_ids = stream_ids[order]
+        repeated = sorted_ids[1:] == sorted_ids[:-1]
+        if not repeated.any():
+            return self._update_unique(np.arange(len(stream_ids)), stream_ids, ear, mar, timestamps)[1]
+
+        # Occurrence number of every row within its stream: round k holds each stream's k-th frame
+        group_start = np.flatnonzero(np.r_[True, ~repeated])
+        occurrence = np.empty(len(order), np.intp)
+        occurrence[order] = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+
+        parts = []
+        for round_index in range(occurrence.max() + 1):
+            rows = np.flatnonzero(occurrence == round_index)
+            parts.append(self._update_unique(rows, stream_ids[rows], ear[rows], mar[rows], timestamps[rows]))
+        batch_rows = np.concatenate([rows for rows, _ in parts])
+        events = np.concatenate([events for _, events in parts])
+        # Report events in batch order
+        return events[np.argsort(batch_rows, kind='stable')]
+
+    def _update_unique(self, rows, streams, ear, mar, timestamps):
+        eyes_closed = ear < self.ear_thresh
+        blink_frames = self.blink_frame_counter[streams]
+        blink = ~eyes_closed & (blink_frames >= self.blink_frames)
+        self.blink_frame_counter[streams] = np.where(eyes_closed, blink_frames + 1, 0)
+        self.blink_counter[streams] += blink
+
+        mouth_open = mar > self.mar_thresh
+        yawn_frames = self.yawn_frame_counter[streams]
+        yawn = ~mouth_open & (yawn_frames >= self.yawn_frames)
+        self.yawn_frame_counter[streams] = np.where(mouth_open, yawn_frames + 1, 0)
+        self.yawn_counter[streams] += yawn
+
+        # Expiring before appending keeps the same samples as SlidingWindow.add() (times never go back)
+        for window in (self.eyes_closed, self.blink_window, self.yawn_window):
+            window.expire(streams, timestamps)
+        self.eyes_closed.push(streams, timestamps, eyes_closed)
+        self.blink_window.push(streams[blink], timestamps[blink])
+        self.yawn_window.push(streams[yawn], timestamps[yawn])
+
+        eyes_closed_size = self.eyes_closed.size[streams]
+        drowsy = ((self.blink_window.size[streams] * 60.0 / self.blink_window.window > self.blink_thresh)
+                  | (self.yawn_window.size[streams] * 60.0 / self.yawn_window.window > self.yawn_thresh)
+                  | ((eyes_closed_size >= self.min_perclos_frames)
+                     & (self.eyes_closed.total[streams] / np.maximum(eyes_closed_size, 1) > self.perclos_thresh)))
+        changed = drowsy != self.drowsy_alert[streams]
+        self.drowsy_alert[streams] = drowsy
+
+        # Per row in the order update_counters() emits them: blink, yawn, then the alert change
+        kinds, hits = np.nonzero(np.stack((blink, yawn, changed & drowsy, changed & ~drowsy)))
+        if not len(hits):
+            return rows[:0], np.zeros(0, EVENT_DTYPE)
+        order = np.argsort(hits, kind='stable')
+        kinds, hits = kinds[order], hits[order]
+        events = np.zeros(len(hits), EVENT_DTYPE)
+        events['stream'] = streams[hits]
+        events['event'] = EVENT_NAMES[kinds]
+        events['timestamp'] = timestamps[hits]
+        events['count'] = np.where(kinds == 0, self.blink_counter[events['stream']],
+                                   np.where(kinds == 1, self.yawn_counter[events['stream']], 0))
+        return rows[hits], events
+
+
+def event_records(events):
+    """EVENT_DTYPE rows as dicts shaped like EventDispatcher records"""
+    records = []
+    for stream, event, timestamp, count in events.tolist():
+        record = {'event': event, 'timestamp': timestamp, 'stream': stream}
+        if event == BLINK:
+            record['blinks'] = count
+        elif event == YAWN:
+            record['yawns'] = count
+        records.append(record)
+    return records
@@ -0,0 +1,108 @@
+"""Micro-benchmark: one scalar detector state per stream vs the batched DrowsinessDetector"""
+import argparse
+import time
+
+import numpy as np
+
+from batched_detector import DrowsinessDetector, event_records
+from detection_events import BLINK, YAWN, DROWSY_START, DROWSY_END
+from drowsiness_window import DrowsinessWindow
+
+
+class ScalarStream:
+    """update_counters() logic for one stream, as the single-stream detector runs it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.blink_counter = self.blink_frame_counter = 0
+        self.yawn_counter = self.yawn_frame_counter = 0
+        self.drowsy_alert = False
+        self.window = DrowsinessWindow()
+
+    def update(self, ear, mar, timestamp, out):
+        blink = yawn = False
+        if ear < 0.25:
+            self.blink_frame_counter += 1
+        else:
+            if self.blink_frame_counter >= 2:
+                self.blink_counter += 1
+                blink = True
+                out.append({'event': BLINK, 'timestamp': timestamp, 'stream': self.stream,
+                            'blinks': self.blink_counter})
+            self.blink_frame_counter = 0
+        if mar > 0.6:
+            self.yawn_frame_counter += 1
+        else:
+            if self.yawn_frame_counter >= 10:
+                self.yawn_counter += 1
+                yawn = True
+                out.append({'event': YAWN, 'timestamp': timestamp, 'stream': self.stream,
+                            'yawns': self.yawn_counter})
+            self.yawn_frame_counter = 0
+        self.window.update(timestamp, ear < 0.25, blink, yawn)
+        was_drowsy = self.drowsy_alert
+        self.drowsy_alert = self.window.drowsy
+        if self.drowsy_alert != was_drowsy:
+            out.append({'event': DROWSY_START if self.drowsy_alert else DROWSY_END, 'timestamp': timestamp,
+                        'stream': self.stream})
+
+
+def synthetic_batches(streams, frames, seed=0):
+    """Per frame: (stream ids, EAR, MAR, timestamps) for every stream, with blinks and yawns mixed in"""
+    rng = np.random.default_rng(seed)
+    ear = 0.3 + 0.03 * rng.standard_normal((frames, streams))
+    ear[rng.random((frames, streams)) < 0.08] = 0.15
+    mar = 0.4 + 0.1 * rng.standard_normal((frames, streams))
+    mar[(np.arange(frames)[:, None] + np.arange(streams) * 37) % 400 < 15] = 0.8
+    ids = np.arange(streams)
+    for frame in range(frames):
+        yield ids, ear[frame], mar[frame], np.full(streams, frame / 30.0) + ids * 1e-3
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batched detector state micro-benchmark')
+    parser.add_argument('--streams', type=int, default=200, help='Streams updated per batch')
+    parser.add_argument('--frames', type=int, default=900, help='Frames per stream')
+    args = parser.parse_args()
+
+    batches = list(synthetic_batches(args.streams, args.frames))
+
+    scalar_streams = [ScalarStream(i) for i in range(args.streams)]
+    expected = []
+    start = time.perf_counter()
+    for ids, ear, mar, timestamps in batches:
+        for i, e, m, t in zip(ids.tolist(), ear.tolist(), mar.tolist(), timestamps.tolist()):
+            scalar_streams[i].update(e, m, t, expected)
+    scalar = time.perf_counter() - start
+
+    detector = DrowsinessDetector(args.streams)
+    events = []
+    start = time.perf_counter()
+    for ids, ear, mar, timestamps in batches:
+        events.append(detector.update(ids, ear, mar, timestamps))
+    batched = time.perf_counter() - start
+
+    # Both must emit the same events in the same order before timing means anything
+    actual = event_records(np.concatenate(events))
+    assert actual == expected, (len(actual), len(expected))
+
+    rows = args.streams * args.frames
+    print(f"📊 Detector state for {args.streams} streams x {args.frames} frames ({len(actual)} events)")
+    print(f"   Scalar per stream: {scalar / rows * 1e6:6.2f} µs per frame")
+    print(f"   Batched:           {batched / rows * 1e6:6.2f} µs per frame ({scalar / batched:.1f}x faster, "
+          f"{batched / args.frames * 1e3:.2f} ms per batch)")
+
+    # Several consecutive frames per stream in one batch must give the same result
+    detector.reset()
+    chunked = []
+    for first in range(0, len(batches), 4):
+        group = batches[first:first + 4]
+        chunked.append(detector.update(*(np.concatenate(column) for column in zip(*group))))
+    chunked = event_records(np.concatenate(chunked))
+    assert sorted(chunked, key=lambda r: (r['timestamp'], r['stream'])) == \
+        sorted(expected, key=lambda r: (r['timestamp'], r['stream']))
+    print("✅ Batched, chunked and scalar updates agree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Measure per-frame allocations, time and peak RSS with and without the buffer pool"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmark_suite import parse_size, peak_rss_mb, synthetic_frames, video_frames
+
+
+class ReplayCapture:
+    """Serve frames from memory with cv2.VideoCapture.read() semantics: allocates unless image= fits"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        source = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        if image is None or image.shape != source.shape:
+            return True, source.copy()
+        np.copyto(image, source)
+        return True, image
+
+
+def run_mode(pooled, frames, count, warmup):
+    """Run capture + get_face_mesh + HUD; returns the measurements for one mode"""
+    import drowsiness_detection_ubuntu as detection
+    from system_stats import EMPTY_STATS
+
+    detection.buffer_pool.enabled = pooled
+    cap = ReplayCapture(frames)
+
+    def step():
+        ret, frame = detection.buffer_pool.read(cap)
+        annotated, ear, blinks, mar, yawns, drowsy = detection.get_face_mesh(frame)
+        detection.draw_hud(annotated, 30.0, EMPTY_STATS, '00:00', 0, blinks, ear, yawns, mar, drowsy)
+
+    for _ in range(warmup):
+        step()
+
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+    frame_ms = float(np.median(times)) * 1000.0
+
+    # Bytes allocated and released again within each frame (allocator churn)
+    allocations_before = detection.buffer_pool.allocations
+    tracemalloc.start()
+    churn = []
+    for _ in range(count):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step()
+        churn.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    return {
+        'mode': 'pooled' if pooled else 'default',
+        'frame_ms': frame_ms,
+        'churn_kb_per_frame': float(np.mean(churn)) / 1024.0,
+        'pool_allocations_during_run': detection.buffer_pool.allocations - allocations_before,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Buffer pool allocation benchmark')
+    parser.add_argument('--image', help='Build frames from this still image (e.g. a face photo)')
+    parser.add_argument('--video', help='Use the first frames of this video instead')
+    parser.add_argument('--size', type=parse_size, default=(640, 480), help='Synthetic frame size (default: 640x480)')
+    parser.add_argument('--frames', type=int, default=200, help='Measured frames per mode (default: 200)')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured frames first (default: 20)')
+    parser.add_argument('--mode', choices=['default', 'pooled'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: one mode per process so peak RSS is not shared
+        frames = list(video_frames(args.video, 8)) if args.video else list(
+            synthetic_frames(8, args.size, args.image))
+        print(json.dumps(run_mode(args.mode == 'pooled', frames, args.frames, args.warmup)))
+        return
+
+    results = []
+    for mode in ('default', 'pooled'):
+        command = [sys.executable, __file__, '--mode', mode, '--frames', str(args.frames),
+                   '--warmup', str(args.warmup), '--size', f'{args.size[0]}x{args.size[1]}']
+        if args.image:
+            command += ['--image', args.image]
+        if args.video:
+            command += ['--video', args.video]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"📊 Buffer pool, {args.frames} frames per mode")
+    print(f"{'mode':<10}{'p50 ms':>10}{'churn KB/frame':>16}{'pool allocs':>13}{'peak RSS MB':>13}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['frame_ms']:>10.2f}{r['churn_kb_per_frame']:>16.0f}"
+              f"{r['pool_allocations_during_run']:>13}{r['peak_rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Benchmark the detection hot path stage by stage, without a camera.
+
+Runs on fixture videos (--video), synthetic frames (optionally built from
+a still image with --image) or any frame source (--source), always unthrottled, and writes per-stage latency percentiles,
+throughput, CPU time per frame and peak RSS as JSON, so runs can be compared
+with --compare. --headless skips the copy/draw/HUD/encode stages the way
+the detector's headless mode does.
+"""
+import argparse
+import contextlib
+import json
+import platform
+import resource
+import sys
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+import drowsiness_detection_ubuntu as detection
+from frame_source import UNTHROTTLED, SyntheticSource, VideoFileSource, open_source, parse_size
+from landmark_math import SUBSET_PAIR_INDEX, compute_aspect_ratios, ear_mar_points
+from system_stats import EMPTY_STATS
+
+STAGES = ['capture', 'bgr2rgb', 'face_mesh', 'ear_mar', 'copy', 'draw_landmarks', 'hud', 'encode', 'total']
+# Stages that do not run in headless mode
+HEADLESS_SKIPPED = {'copy', 'draw_landmarks', 'hud', 'encode'}
+
+
+def source_frames(source, limit=None):
+    """Yield up to limit frames from an open frame source, then release it"""
+    if not source.isOpened():
+        raise FileNotFoundError(str(getattr(source, 'path', source)))
+    count = 0
+    while limit is None or count < limit:
+        ret, frame = source.read()
+        if not ret:
+            break
+        count += 1
+        yield frame
+    source.release()
+
+
+def synthetic_frames(count, size, image_path=None, seed=0):
+    """Yield count BGR frames: a still image (or noise) shifted by a few pixels each frame"""
+    return source_frames(SyntheticSource(size, count=count, image_path=image_path, seed=seed, pacing=UNTHROTTLED))
+
+
+def video_frames(path, limit=None):
+    """Yield frames decoded from a fixture video"""
+    return source_frames(VideoFileSource(path, UNTHROTTLED), limit)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_benchmark(frames, warmup=10, headless=False):
+    """Time every hot-path stage for each frame; returns {stage: [seconds, ...]}, the face count and CPU seconds"""
+    timings = {stage: [] for stage in STAGES}
+    faces = 0
+    cpu_time = 0.0
+    frame_iter = iter(frames)
+    index = 0
+    clock = time.perf_counter
+
+    while True:
+        c0 = time.process_time()  # All threads of the process, including MediaPipe's
+        t0 = clock()
+        frame = next(frame_iter, None)
+        if frame is None:
+            break
+        t1 = clock()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        t2 = clock()
+        results = detection.face_mesh.process(rgb)
+        t3 = clock()
+
+        ear = mar = 0.0
+        face_landmarks = results.multi_face_landmarks[0] if results.multi_face_landmarks else None
+        if face_landmarks is not None:
+            points = ear_mar_points(face_landmarks.landmark)
+            left_ear, right_ear, mar = compute_aspect_ratios(points, SUBSET_PAIR_INDEX).tolist()
+            ear = (left_ear + right_ear) / 2.0
+            detection.update_counters(ear, mar)
+        t4 = clock()
+        if headless:
+            t5 = t6 = t7 = t8 = t4
+        else:
+            annotated = frame.copy()
+            t5 = clock()
+            if face_landmarks is not None:
+                detection.face_mesh.draw_landmarks(annotated, face_landmarks)
+            t6 = clock()
+            detection.draw_hud(annotated, 30.0, EMPTY_STATS, '00:00', 0, detection.blink_counter, ear,
+                               detection.yawn_counter, mar, detection.drowsy_alert)
+            t7 = clock()
+            cv2.imencode('.jpg', annotated)
+            t8 = clock()
+        c1 = time.process_time()
+
+        index += 1
+        if index <= warmup:
+            continue
+        faces += face_landmarks is not None
+        cpu_time += c1 - c0
+        for stage, start, end in zip(STAGES, (t0, t1, t2, t3, t4, t5, t6, t7, t0),
+                                     (t1, t2, t3, t4, t5, t6, t7, t8, t8)):
+            if headless and stage in HEADLESS_SKIPPED:
+                continue
+            timings[stage].append(end - start)
+    return timings, faces, cpu_time
+
+
+def summarize(timings):
+    """Percentiles in milliseconds for every stage"""
+    summary = {}
+    for stage, values in timings.items():
+        if not values:
+            continue
+        ms = np.asarray(values) * 1000.0
+        summary[stage] = {
+            'count': int(ms.size),
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+            'max_ms': float(ms.max()),
+        }
+    return summary
+
+
+def print_report(report, baseline=None):
+    print(f"📊 {report['frames']} frames from {report['source']} ({report['faces']} with a face)")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" + (f"{'Δp50':>11}" if baseline else ''))
+    for stage, s in report['stages'].items():
+        line = f"{stage:<16}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+        if baseline and stage in baseline.get('stages', {}):
+            old = baseline['stages'][stage]['p50_ms']
+            change = (s['p50_ms'] - old) / old * 100.0 if old > 0 else 0.0
+            line += f" {change:>+9.1f}%"
+        print(line)
+    print(f"🚀 Throughput: {report['throughput_fps']:.1f} FPS | 🔧 CPU: {report['cpu_ms_per_frame']:.2f} ms/frame"
+          f" | 💾 Peak RSS: {report['peak_rss_mb']:.1f} MB")
+    if baseline:
+        print(f"   Baseline:   {baseline['throughput_fps']:.1f} FPS | 🔧 CPU: "
+              f"{baseline.get('cpu_ms_per_frame', 0.0):.2f} ms/frame | {baseline['peak_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the drowsiness detection hot path')
+    parser.add_argument('--video', action='append', default=[], help='Fixture video (repeatable)')
+    parser.add_argument('--image', help='Build synthetic frames from this still image (e.g. a face photo)')
+    parser.add_argument('--source', action='append', default=[],
+                        help='Any frame source: video, image directory, synthetic[:WxH][:image], camera (repeatable)')
+    parser.add_argument('--frames', type=int, default=300, help='Frames per source (default: 300)')
+    parser.add_argument('--size', type=parse_size, default=(640, 480), help='Synthetic frame size (default: 640x480)')
+    parser.add_argument('--warmup', type=int, default=10, help='Frames excluded from the statistics (default: 10)')
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file (default: stdout)')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    parser.add_argument('--headless', action='store_true',
+                        help='Skip copy, drawing, HUD and encoding (as the detector does with --headless)')
+    args = parser.parse_args()
+
+    if args.video or args.source:
+        # Every source yields the same number of frames: warmup + timed
+        sources = [(path, video_frames(path, args.frames + args.warmup)) for path in args.video]
+        sources += [(spec, source_frames(open_source(spec, UNTHROTTLED), args.frames + args.warmup))
+                    for spec in args.source]
+    else:
+        label = f"synthetic {args.size[0]}x{args.size[1]}" + (f" from {args.image}" if args.image else '')
+        sources = [(label, synthetic_frames(args.frames + args.warmup, args.size, args.image))]
+
+    timings = {stage: [] for stage in STAGES}
+    faces = 0
+    cpu_time = 0.0
+    for _, frames in sources:
+        detection.reset_counters()
+        detection.reset_tracking()
+        source_timings, source_faces, source_cpu = run_benchmark(frames, args.warmup, args.headless)
+        faces += source_faces
+        cpu_time += source_cpu
+        for stage, values in source_timings.items():
+            timings[stage].extend(values)
+
+    total_time = sum(timings['total'])
+    report = {
+        'source': ', '.join(label for label, _ in sources) + (' (headless)' if args.headless else ''),
+        'frames': len(timings['total']),
+        'faces': faces,
+        'stages': summarize(timings),
+        'throughput_fps': len(timings['total']) / total_time if total_time > 0 else 0.0,
+        'cpu_ms_per_frame': cpu_time * 1000.0 / len(timings['total']) if timings['total'] else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'opencv': cv2.__version__,
+            'mediapipe': mp.__version__,
+            'numpy': np.__version__,
+        },
+        'timestamp': time.time(),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print_report(report, baseline)
+        print(f"💾 Report written to {args.output}")
+    else:
+        if baseline:
+            # stdout carries only the JSON report
+            with contextlib.redirect_stdout(sys.stderr):
+                print_report(report, baseline)
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+
+
+class BufferRing:
+    """Fixed number of reusable arrays handed out round-robin.
+
+    A slot is reused after `slots` more acquisitions, so the ring must be
+    larger than the number of buffers alive at the same time (e.g. frames
+    waiting in pipeline queues). A slot is only reallocated when the
+    requested shape or dtype changes.
+    """
+
+    def __init__(self, slots):
+        self.slots = [None] * max(1, slots)
+        self.index = 0
+        self.allocations = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        buffer = self.slots[self.index]
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype)
+            self.slots[self.index] = buffer
+            self.allocations += 1
+        self.index = (self.index + 1) % len(self.slots)
+        return buffer
+
+
+class ScratchBuffer:
+    """One growable byte buffer viewed as arrays of any shape; valid until the next view()"""
+
+    def __init__(self):
+        self.buffer = np.empty(0, np.uint8)
+        self.allocations = 0
+
+    def view(self, shape):
+        size = int(np.prod(shape))
+        if size > self.buffer.size:
+            self.buffer = np.empty(size, np.uint8)
+            self.allocations += 1
+        return self.buffer[:size].reshape(shape)
+
+
+class BufferPool:
+    """Reused buffers for the per-frame copies in capture and get_face_mesh.
+
+    While disabled every call falls back to the allocating OpenCV/NumPy
+    call, so the default behaviour is unchanged.
+    """
+
+    def __init__(self, frame_slots=2, enabled=False):
+        self.enabled = enabled
+        self.frames = BufferRing(frame_slots)       # Captured frames
+        self.annotated = BufferRing(frame_slots)    # Frames drawn on by get_face_mesh
+        self.rgb = ScratchBuffer()                  # BGR->RGB input for FaceMesh (full frame or crop)
+
+    def resize(self, frame_slots):
+        """Size the rings for the number of frames that can be in flight at once"""
+        self.frames = BufferRing(frame_slots)
+        self.annotated = BufferRing(frame_slots)
+
+    def read(self, cap):
+        """cap.read() into the next pooled frame buffer"""
+        if not self.enabled:
+            return cap.read()
+        buffer = self.frames.slots[self.frames.index]
+        ret, frame = cap.read() if buffer is None else cap.read(image=buffer)
+        if ret and frame is not buffer:
+            # First frame or a resolution change: OpenCV allocated the array, keep it
+            self.frames.slots[self.frames.index] = frame
+            self.frames.allocations += 1
+        self.frames.index = (self.frames.index + 1) % len(self.frames.slots)
+        return ret, frame
+
+    def to_rgb(self, image, code):
+        """cv2.cvtColor into the scratch buffer (valid until the next call)"""
+        if not self.enabled:
+            return cv2.cvtColor(image, code)
+        return cv2.cvtColor(image, code, dst=self.rgb.view(image.shape))
+
+    def copy(self, image):
+        """image.copy() into the next pooled annotation buffer"""
+        if not self.enabled:
+            return image.copy()
+        buffer = self.annotated.acquire(image.shape, image.dtype)
+        np.copyto(buffer, image)
+        return buffer
+
+    @property
+    def allocations(self):
+        return self.frames.allocations + self.annotated.allocations + self.rgb.allocations
+
+
+class PooledCapture:
+    """Wrap a cv2.VideoCapture so read() fills pooled buffers; everything else is passed through"""
+
+    def __init__(self, cap, pool):
+        self.cap = cap
+        self.pool = pool
+
+    def read(self):
+        return self.pool.read(self.cap)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
@@ -0,0 +1,193 @@
+"""Shared camera discovery: concurrent probes with timeouts and a last-known-good device cache"""
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+DEV_ROOT = '/dev'
+SYSFS_ROOT = '/sys/class/video4linux'
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'drowsiness_detection', 'camera.json')
+
+# Indices tried where /dev/video* nodes cannot be listed (10 = OBS Virtual Camera)
+FALLBACK_INDICES = list(range(11))
+
+CameraInfo = namedtuple('CameraInfo', ['index', 'path', 'name', 'identity', 'width', 'height', 'fps',
+                                       'backend', 'readable', 'probe_time'])
+
+
+def video_nodes():
+    """Existing /dev/videoN nodes as (N, path), sorted by N"""
+    nodes = []
+    for path in glob.glob(os.path.join(DEV_ROOT, 'video*')):
+        match = re.fullmatch(r'video(\d+)', os.path.basename(path))
+        if match:
+            nodes.append((int(match.group(1)), path))
+    return sorted(nodes)
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def sysfs_identity(index):
+    """Stable identity of /dev/videoN: driver name, USB vendor:product and the bus path it sits on"""
+    node = os.path.join(SYSFS_ROOT, f'video{index}')
+    if not os.path.isdir(node):
+        return ''
+    name = _read(os.path.join(node, 'name'))
+    device = os.path.realpath(os.path.join(node, 'device'))
+    # USB interface -> parent device holds idVendor/idProduct
+    usb = os.path.dirname(device)
+    vendor = _read(os.path.join(usb, 'idVendor'))
+    product = _read(os.path.join(usb, 'idProduct'))
+    stream = _read(os.path.join(node, 'index'))  # 0 = capture node, 1 = UVC metadata node
+    return '|'.join([name, f'{vendor}:{product}', device.replace('/sys/devices/', ''), stream])
+
+
+def candidate_sources():
+    """Indices worth probing: the existing video nodes on Linux, 0-10 elsewhere"""
+    if sys.platform.startswith('linux'):
+        # Missing indices are never opened: those are the probes that block for seconds
+        return [index for index, _ in video_nodes()]
+    return FALLBACK_INDICES
+
+
+def probe_camera(source, read_frame=True, backend=cv2.CAP_ANY):
+    """Open one camera and return its CameraInfo, or None when it cannot be opened"""
+    start = time.time()
+    cap = cv2.VideoCapture(source, backend)
+    try:
+        if not cap.isOpened():
+            return None
+        readable = False
+        if read_frame:
+            ret, frame = cap.read()
+            readable = bool(ret and frame is not None)
+        index = source if isinstance(source, int) else None
+        path = os.path.join(DEV_ROOT, f'video{source}') if index is not None else str(source)
+        return CameraInfo(
+            index, path, _read(os.path.join(SYSFS_ROOT, f'video{index}', 'name')) if index is not None else '',
+            sysfs_identity(index) if index is not None else '',
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            cap.get(cv2.CAP_PROP_FPS), cap.getBackendName(), readable, time.time() - start)
+    finally:
+        cap.release()
+
+
+def probe_cameras(sources=None, timeout=3.0, read_frame=True, backend=cv2.CAP_ANY):
+    """Probe all sources concurrently; returns the CameraInfo of every camera that opened, in source order.
+
+    Each probe runs on a daemon thread: one still running after timeout
+    seconds is abandoned and cannot stall startup or interpreter exit.
+    """
+    sources = candidate_sources() if sources is None else list(sources)
+    if not sources:
+        return []
+    results = {}
+
+    def run(source):
+        try:
+            results[source] = probe_camera(source, read_frame, backend)
+        except Exception:
+            results[source] = None
+
+    threads = [threading.Thread(target=run, args=(source,), name=f'camera-probe-{source}', daemon=True)
+               for source in sources]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    cameras = []
+    for source, thread in zip(sources, threads):
+        thread.join(max(deadline - time.monotonic(), 0.0))
+        if thread.is_alive():
+            print(f"⏱️  Camera {source} did not answer within {timeout:.1f}s, skipped")
+        elif results.get(source) is not None:
+            cameras.append(results[source])
+    return cameras
+
+
+class CameraCache:
+    """Last known-good camera, keyed by its /dev/video node and sysfs identity"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self):
+        """Return the cached camera index if that device is still present, following renumbering"""
+        entry = self.load()
+        if not entry:
+            return None
+        identity = entry.get('identity')
+        if not identity:
+            # No sysfs identity (e.g. not Linux): trust the index only if its node still exists
+            index = entry.get('index')
+            return index if os.path.exists(os.path.join(DEV_ROOT, f'video{index}')) else None
+        for index, _ in video_nodes():
+            if sysfs_identity(index) == identity:
+                return index
+        return None
+
+    def store(self, info):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        entry = {'index': info.index, 'path': info.path, 'identity': info.identity, 'name': info.name,
+                 'width': info.width, 'height': info.height, 'time': time.time()}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self.path)
+
+    def invalidate(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def find_camera(preferred=(0, 1, 2, 10), use_cache=True, timeout=3.0, cache=None):
+    """Return (index, from_cache) for the camera to use, or (None, False).
+
+    A cached camera whose sysfs identity still matches is returned without
+    opening it; opening it is the caller's next step anyway, and the caller
+    should call CameraCache.invalidate() and retry with use_cache=False if
+    that fails. Otherwise every candidate is probed concurrently and the
+    first readable one, in preferred order, is cached.
+    """
+    cache = cache or CameraCache()
+    if use_cache:
+        index = cache.lookup()
+        if index is not None:
+            return index, True
+
+    cameras = [info for info in probe_cameras(timeout=timeout) if info.readable]
+    if not cameras:
+        return None, False
+    rank = {index: i for i, index in enumerate(preferred)}
+    best = min(cameras, key=lambda info: (rank.get(info.index, len(rank)), info.index))
+    cache.store(best)
+    return best.index, False
+
+
+def confirm_camera(index, frame_shape, cache=None):
+    """Record the camera as known-good once it delivered a frame (this is what verifies a cached pick)"""
+    height, width = frame_shape[:2]
+    info = CameraInfo(index, os.path.join(DEV_ROOT, f'video{index}'),
+                      _read(os.path.join(SYSFS_ROOT, f'video{index}', 'name')), sysfs_identity(index),
+                      width, height, 0.0, '', True, 0.0)
+    (cache or CameraCache()).store(info)
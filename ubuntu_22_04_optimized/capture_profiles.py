@@ -0,0 +1,274 @@
+"""Capture format negotiation: pick the lowest-latency pixel format / resolution / FPS / buffer size a camera really delivers.
+
+Setting width, height and FPS alone leaves most USB cameras on YUYV,
+which at 640x480 is often limited to 15 FPS by USB bandwidth, and on the
+driver's default of several queued buffers, each one a frame of lag.
+negotiate() tries each candidate profile, reads back what the driver
+accepted, measures the frame rate and the queued frames, and keeps the
+best one. ProfileCache remembers it per device so later starts only
+re-apply and verify it.
+"""
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+
+import cv2
+
+from camera_discovery import CACHE_PATH, sysfs_identity
+from frame_source import CameraSource
+
+PROFILE_CACHE_PATH = os.path.join(os.path.dirname(CACHE_PATH), 'capture_profiles.json')
+
+FORMATS = ('MJPG', 'YUYV')
+BUFFER_SIZES = (1, 2)
+# Tried when no format reaches the target FPS at the target size; the HUD switches to its compact layout below 300 rows
+FALLBACK_SIZES = ((320, 240),)
+UNMET_RETRY_AFTER = 7 * 24 * 3600  # Seconds before a camera that missed the target is measured again
+
+CaptureProfile = namedtuple('CaptureProfile', ['fourcc', 'width', 'height', 'fps', 'buffer_size'])
+
+# applied: the profile the driver reports after set(); queued: frames it had buffered while idle
+ProfileResult = namedtuple('ProfileResult', ['requested', 'applied', 'measured_fps', 'queued', 'latency_ms',
+                                             'accepted'])
+
+
+def fourcc_code(text):
+    return cv2.VideoWriter_fourcc(*text)
+
+
+def fourcc_text(value):
+    """FOURCC string of a CAP_PROP_FOURCC value ('' if the backend does not report it)"""
+    code = int(value)
+    if code <= 0:
+        return ''
+    return ''.join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip('\x00 ')
+
+
+def candidate_profiles(width=640, height=480, fps=30, formats=FORMATS, buffer_sizes=BUFFER_SIZES,
+                       fallback_sizes=FALLBACK_SIZES):
+    """Profiles to try, most preferred first: every format and buffer size at the target, then smaller sizes"""
+    sizes = [(width, height)] + [size for size in fallback_sizes if size[0] * size[1] < width * height]
+    return [CaptureProfile(fourcc, w, h, fps, buffer_size)
+            for w, h in sizes for fourcc in formats for buffer_size in buffer_sizes]
+
+
+def apply_profile(cap, profile):
+    """Request a profile and return the CaptureProfile the driver reports back"""
+    # V4L2 picks the frame sizes and rates of the pixel format: set it first
+    cap.set(cv2.CAP_PROP_FOURCC, fourcc_code(profile.fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile.width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile.height)
+    cap.set(cv2.CAP_PROP_FPS, profile.fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, profile.buffer_size)
+    return CaptureProfile(fourcc_text(cap.get(cv2.CAP_PROP_FOURCC)),
+                          int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                          cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_BUFFERSIZE)))
+
+
+def matches(applied, requested):
+    """True if the driver took the format and size (FPS is judged by measurement, buffer size may be unreported)"""
+    return ((not applied.fourcc or applied.fourcc == requested.fourcc)
+            and (applied.width, applied.height) == (requested.width, requested.height))
+
+
+def queued_frames(cap, interval, probes=6):
+    """Frames the driver had buffered: after idling, reads that return at once are stale frames"""
+    time.sleep(interval * (probes + 2))
+    queued = 0
+    for _ in range(probes):
+        start = time.perf_counter()
+        ret, _ = cap.read()
+        if not ret or time.perf_counter() - start > interval / 4:
+            break
+        queued += 1
+    return queued
+
+
+def measure_profile(cap, requested, frames=30, warmup=5, min_fps_ratio=0.9):
+    """Apply a profile, check what the camera delivers and return its ProfileResult"""
+    applied = apply_profile(cap, requested)
+    for _ in range(warmup):
+        ret, frame = cap.read()
+        if not ret:
+            return ProfileResult(requested, applied, 0.0, 0, float('inf'), False)
+    height, width = frame.shape[:2]
+    start = time.perf_counter()
+    for _ in range(frames):
+        ret, _ = cap.read()
+        if not ret:
+            return ProfileResult(requested, applied, 0.0, 0, float('inf'), False)
+    measured_fps = frames / max(time.perf_counter() - start, 1e-6)
+    interval = 1.0 / measured_fps
+    queued = queued_frames(cap, interval)
+    # A frame waits for the ones queued ahead of it plus its own transfer
+    latency_ms = (queued + 1) * interval * 1000.0
+    accepted = (matches(applied, requested) and (width, height) == (requested.width, requested.height)
+                and measured_fps >= requested.fps * min_fps_ratio)
+    return ProfileResult(requested, applied, measured_fps, queued, latency_ms, accepted)
+
+
+def negotiate(cap, candidates, exhaustive=False, report=None):
+    """Measure candidates in order and return the best accepted ProfileResult.
+
+    Profiles at the first candidate's (target) size beat fallback sizes;
+    then fewer queued frames win, then candidate order. Stops at the first
+    accepted target-size profile without queued frames unless exhaustive,
+    and skips the fallback sizes once a target-size profile was accepted.
+    Falls back to the fastest profile when none reaches its target FPS;
+    returns None if none delivered frames at all.
+    """
+    if not candidates:
+        return None
+    target_size = (candidates[0].width, candidates[0].height)
+    results = []
+    for profile in candidates:
+        at_target = (profile.width, profile.height) == target_size
+        if not at_target and not exhaustive and any(result.accepted for result in results):
+            break
+        result = measure_profile(cap, profile)
+        results.append(result)
+        if report is not None:
+            report(result)
+        if result.accepted and at_target and result.queued == 0 and not exhaustive:
+            break
+    ranked = [(index, result) for index, result in enumerate(results) if result.accepted]
+    if ranked:
+        return min(ranked, key=lambda item: ((item[1].requested.width, item[1].requested.height) != target_size,
+                                             item[1].queued, item[0]))[1]
+    delivered = [result for result in results if result.measured_fps > 0]
+    return max(delivered, key=lambda result: result.measured_fps) if delivered else None
+
+
+def device_key(device):
+    """Cache key of a camera: its sysfs identity when it has one, so renumbered devices keep their profile"""
+    if isinstance(device, int) or str(device).isdigit():
+        return sysfs_identity(int(device)) or f'video{device}'
+    return str(device)
+
+
+class ProfileCache:
+    """Negotiated profiles, keyed by device and target (e.g. '640x480@30')"""
+
+    def __init__(self, path=PROFILE_CACHE_PATH):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _key(device, target):
+        return f"{device_key(device)}#{target.width}x{target.height}@{target.fps:g}"
+
+    def lookup(self, device, target):
+        """(CaptureProfile, target_met, stored_at) of the cached profile, or None"""
+        entry = self.load().get(self._key(device, target))
+        if not entry:
+            return None
+        return CaptureProfile(**entry['profile']), entry.get('target_met', True), entry.get('time', 0.0)
+
+    def _write(self, entries):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def store(self, device, target, result):
+        entries = self.load()
+        entries[self._key(device, target)] = {'profile': result.requested._asdict(),
+                                              'measured_fps': result.measured_fps,
+                                              'latency_ms': result.latency_ms, 'target_met': result.accepted,
+                                              'time': time.time()}
+        self._write(entries)
+
+    def invalidate(self, device, target):
+        entries = self.load()
+        if entries.pop(self._key(device, target), None) is not None:
+            self._write(entries)
+
+
+def configure_capture(cap, device, width=640, height=480, fps=30, renegotiate=False, cache=None):
+    """Put a camera on its best capture profile; returns (CaptureProfile applied, from_cache, target_met).
+
+    A cached profile is re-applied and only verified by reading back the
+    format and size; if the driver no longer takes it, the profiles are
+    negotiated again. A camera that misses the target FPS with every profile
+    gets its fastest one cached as well, and is only measured again after
+    UNMET_RETRY_AFTER seconds. If no profile delivers frames at all, the
+    plain width/height/FPS request is restored and (None, False, False)
+    returned.
+    """
+    cache = cache or ProfileCache()
+    target = CaptureProfile('', width, height, fps, 0)
+    cached = None if renegotiate else cache.lookup(device, target)
+    if cached is not None:
+        profile, target_met, stored_at = cached
+        if target_met or time.time() - stored_at < UNMET_RETRY_AFTER:
+            applied = apply_profile(cap, profile)
+            ret, frame = cap.read()
+            if ret and matches(applied, profile) and frame.shape[1::-1] == (profile.width, profile.height):
+                return applied, True, target_met
+        cache.invalidate(device, target)
+
+    result = negotiate(cap, candidate_profiles(width, height, fps))
+    if result is None:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        return None, False, False
+    applied = apply_profile(cap, result.requested)
+    cache.store(device, target, result)
+    return applied, False, result.accepted
+
+
+def describe(profile):
+    fourcc = profile.fourcc or 'driver default'
+    buffers = f", {profile.buffer_size} buffer(s)" if profile.buffer_size > 0 else ''
+    return f"{fourcc} {profile.width}x{profile.height}@{profile.fps:g}{buffers}"
+
+
+def print_result(result):
+    status = '✅' if result.accepted else '❌'
+    print(f"{status} {describe(result.requested):<32} → {describe(result.applied):<32} "
+          f"{result.measured_fps:5.1f} FPS, {result.queued} queued, ~{result.latency_ms:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the lowest-latency capture profile of a camera')
+    parser.add_argument('--device', default='0', help='Camera index or /dev/video* path (default: 0)')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--all', action='store_true', help='Measure every candidate instead of stopping at the first good one')
+    parser.add_argument('--no-save', action='store_true', help='Do not store the result in the profile cache')
+    args = parser.parse_args()
+
+    device = int(args.device) if args.device.isdigit() else args.device
+    cap = CameraSource(device)
+    if not cap.isOpened():
+        print(f"❌ Could not open camera {args.device}")
+        return
+    try:
+        print(f"🎛️  Negotiating {args.width}x{args.height}@{args.fps:g} on {args.device}...")
+        result = negotiate(cap, candidate_profiles(args.width, args.height, args.fps), args.all, print_result)
+    finally:
+        cap.release()
+    if result is None:
+        print("❌ The camera delivered no frames")
+        return
+    print(f"🏁 Best: {describe(result.requested)} ({result.measured_fps:.1f} FPS, ~{result.latency_ms:.0f} ms)")
+    if not result.accepted:
+        print("⚠️  No profile reached the target FPS at the requested size; the fastest one is used")
+    if not args.no_save:
+        ProfileCache().store(device, CaptureProfile('', args.width, args.height, args.fps, 0), result)
+        print(f"💾 Saved to {PROFILE_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
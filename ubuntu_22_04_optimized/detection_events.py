@@ -0,0 +1,43 @@
+import json
+import sys
+import time
+
+# Event names emitted by the detector
+BLINK = 'blink'
+YAWN = 'yawn'
+DROWSY_START = 'drowsy_start'
+DROWSY_END = 'drowsy_end'
+
+
+class EventDispatcher:
+    """Fan detector events out to callbacks; emitting with no listeners is a no-op"""
+
+    def __init__(self):
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Register callback(record), called with a dict per event"""
+        self.listeners.append(callback)
+        return callback
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def emit(self, event, timestamp=None, **fields):
+        if not self.listeners:
+            return
+        record = {'event': event, 'timestamp': time.time() if timestamp is None else timestamp}
+        record.update(fields)
+        for callback in self.listeners:
+            callback(record)
+
+
+class JsonLinesWriter:
+    """Event listener writing one JSON object per line (stdout by default)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def __call__(self, record):
+        self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
@@ -1,20 +1,35 @@
 import cv2
 import sys, time
-import mediapipe as mp
-import numpy as np
 from collections import deque
 import os
 import psutil  # For system monitoring
 import platform
-import subprocess
+import argparse
+import contextlib
+import threading
+from frame_pipeline import create_pipeline, add_pipeline_arguments
+from frame_source import CameraSource, open_source, add_source_arguments
+from landmark_math import SUBSET_PAIR_INDEX, compute_aspect_ratios, ear_mar_points
+from system_stats import SystemStatsSampler
+from roi_tracking import FaceRoiTracker, crop_transform
+from frame_scheduler import AdaptiveInferenceScheduler, LandmarkPropagator
+from hot_path_metrics import metrics, MetricsServer
+from buffer_pool import BufferPool, PooledCapture
+from drowsiness_window import DrowsinessWindow
+from frame_log import FrameLogWriter
+from snapshot_writer import SnapshotWriter, SNAPSHOT_FORMATS
+from startup import BackgroundFaceMesh, StartupTimer
+from camera_discovery import CameraCache, find_camera, confirm_camera
+from detection_events import EventDispatcher, JsonLinesWriter, BLINK, YAWN, DROWSY_START, DROWSY_END
+from hud_overlay import HudOverlay
+from power_governor import PowerGovernor, GovernedCapture, TierLog, describe, print_change
+from capture_profiles import configure_capture, describe as describe_profile
 
 # Optimized for Ubuntu 22.04 LTS
-mp_drawing = mp.solutions.drawing_utils
-mp_face_mesh = mp.solutions.face_mesh
-
-# Ubuntu optimized settings
-drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-face_mesh = mp_face_mesh.FaceMesh(
+# Ubuntu optimized settings. MediaPipe is imported and the model built and
+# warmed up on a background thread once face_mesh.start() is called (main()
+# does that first thing); process() waits for it.
+face_mesh = BackgroundFaceMesh(
     static_image_mode=False,
     max_num_faces=1,  # Detect 1 face for better performance
     refine_landmarks=True,  # Enable for better accuracy on Ubuntu
@@ -22,13 +37,12 @@ face_mesh = mp_face_mesh.FaceMesh(
     min_tracking_confidence=0.5
 )
 
-# Eye landmark indices (optimized)
-LEFT_EYE_POINTS = [33, 160, 158, 133, 153, 144]
-RIGHT_EYE_POINTS = [362, 385, 387, 263, 373, 380]
-
 # Mouth landmarks for yawn detection
 MOUTH_POINTS = [61, 84, 17, 314, 405, 320, 307, 375, 321, 308, 324, 318]
 
+# Time from process start to imports done, camera open, model ready, first frame and first EAR/MAR
+startup = StartupTimer()
+
 # Blink detection variables
 EYE_AR_THRESH = 0.25
 EYE_AR_CONSEC_FRAMES = 2
@@ -44,13 +58,55 @@ yawn_frame_counter = 0
 # Drowsiness detection
 DROWSY_BLINK_THRESH = 15  # Blinks per minute threshold
 DROWSY_YAWN_THRESH = 3    # Yawns per minute threshold
+PERCLOS_THRESH = 0.15     # Fraction of frames with closed eyes
+DROWSY_WINDOW = 60.0      # Seconds the blink/yawn rates are measured over
+PERCLOS_WINDOW = 60.0     # Seconds PERCLOS is measured over
 drowsy_alert = False
+drowsiness_window = DrowsinessWindow(DROWSY_BLINK_THRESH, DROWSY_YAWN_THRESH, PERCLOS_THRESH,
+                                     DROWSY_WINDOW, PERCLOS_WINDOW)
 
 # Performance monitoring
 fps_deque = deque(maxlen=30)
-cpu_usage = 0
-memory_usage = 0
-gpu_temp = 0
+
+# ROI-cropped inference around the previous face position (enabled with --roi-tracking)
+roi_tracker = FaceRoiTracker()
+
+# Adaptive frame skipping with optical-flow propagation in between (enabled with --adaptive-skip)
+frame_scheduler = AdaptiveInferenceScheduler(ear_thresh=EYE_AR_THRESH)
+landmark_propagator = LandmarkPropagator()
+
+# Reused frame, RGB and annotation buffers (enabled with --buffer-pool)
+buffer_pool = BufferPool()
+
+# Per-frame records in a memory-mapped ring file (enabled with --frame-log)
+frame_log = None
+
+# Blink/yawn/drowsy events for listeners (JSON lines on stdout with --headless)
+events = EventDispatcher()
+
+# HUD text composited from a cached layer; fast-changing values refresh at --hud-fps
+hud = HudOverlay(refresh_hz=10.0)
+hud.add('title', (10,25), 0.5, (0,255,0), text='Ubuntu 22.04 - Drowsiness Detection')
+hud.add('performance', (10,45), 0.4, (0,255,0))
+hud.add('runtime', (10,65), 0.4, (0,255,0))
+hud.add('temps', (10,85), 0.4, (0,255,255))
+hud.add('blinks', (10,110), 0.7, (255,0,255), thickness=2)
+hud.add('ear', (10,135), 0.5, (255,255,0))
+hud.add('yawns', (10,160), 0.7, (0,255,255), thickness=2)
+hud.add('mar', (10,185), 0.5, (255,255,0))
+hud.add('rates', (10,285), 0.45, (255,255,0))
+hud.add('blink_detected', (10,210), 0.6, (0,0,255), thickness=2)
+hud.add('yawn_detected', (10,235), 0.6, (255,0,0), thickness=2)
+hud.add('alert', (10,260), 0.8, (0,0,255), thickness=3)
+hud.add('help', (10,470), 0.35, (0,255,0), text='ESC=quit | S=save | R=reset | D=toggle alerts')
+HUD_ROWS = {name: sprite.org[1] for name, sprite in hud.sprites.items() if name != 'help'}
+hud_shape = None
+
+# Rows for frames under 300 pixels high (the governor's eco/minimum tiers capture 240 rows):
+# title and runtime are hidden, everything else is packed above the help line
+HUD_COMPACT_ROWS = {'performance': 15, 'temps': 30, 'blinks': 52, 'ear': 70, 'yawns': 92, 'mar': 110,
+                    'blink_detected': 132, 'yawn_detected': 154, 'alert': 182}
+HUD_HIDDEN_COMPACT = ('title', 'runtime')
 
 # Ubuntu 22.04 specific optimizations
 os.environ['OPENCV_LOG_LEVEL'] = 'ERROR'  # Reduce OpenCV logging
@@ -78,244 +134,543 @@ def get_system_info():
     except:
         return "Ubuntu 22.04", "Unknown CPU", 4, "Unknown"
 
-def calculate_eye_aspect_ratio(eye_points, landmarks):
-    """Calculate the eye aspect ratio (EAR) for blink detection"""
-    points = []
-    for point_idx in eye_points:
-        x = landmarks[point_idx].x
-        y = landmarks[point_idx].y
-        points.append([x, y])
+def update_counters(avg_ear, mar, timestamp=None):
+    """Advance the blink/yawn state machines and the drowsiness windows by one frame"""
+    global blink_counter, blink_frame_counter, yawn_counter, yawn_frame_counter
+    if timestamp is None:
+        timestamp = time.time()
+    blink = yawn = False
     
-    points = np.array(points)
+    # Check for blink
+    if avg_ear < EYE_AR_THRESH:
+        blink_frame_counter += 1
+    else:
+        if blink_frame_counter >= EYE_AR_CONSEC_FRAMES:
+            blink_counter += 1
+            blink = True
+            events.emit(BLINK, timestamp, blinks=blink_counter, frames=blink_frame_counter)
+        blink_frame_counter = 0
     
-    # Calculate distances
-    A = np.linalg.norm(points[1] - points[5])
-    B = np.linalg.norm(points[2] - points[4])
-    C = np.linalg.norm(points[0] - points[3])
+    # Check for yawn
+    if mar > MOUTH_AR_THRESH:
+        yawn_frame_counter += 1
+    else:
+        if yawn_frame_counter >= YAWN_CONSEC_FRAMES:
+            yawn_counter += 1
+            yawn = True
+            events.emit(YAWN, timestamp, yawns=yawn_counter, frames=yawn_frame_counter)
+        yawn_frame_counter = 0
     
-    ear = (A + B) / (2.0 * C)
-    return ear
+    # Check for drowsiness over the recent window (rates, not session totals)
+    drowsiness_window.update(timestamp, avg_ear < EYE_AR_THRESH, blink, yawn)
+    update_alert(timestamp)
 
-def calculate_mouth_aspect_ratio(landmarks):
-    """Calculate the mouth aspect ratio (MAR) for yawn detection"""
-    mouth_indices = [61, 84, 17, 314, 405, 320, 307, 375]
-    mouth_points = []
-    
-    for point_idx in mouth_indices:
-        x = landmarks[point_idx].x
-        y = landmarks[point_idx].y
-        mouth_points.append([x, y])
-    
-    mouth_points = np.array(mouth_points)
-    
-    # Calculate distances
-    A = np.linalg.norm(mouth_points[1] - mouth_points[7])
-    B = np.linalg.norm(mouth_points[2] - mouth_points[6])
-    C = np.linalg.norm(mouth_points[3] - mouth_points[5])
-    D = np.linalg.norm(mouth_points[0] - mouth_points[4])
-    
-    mar = (A + B + C) / (3.0 * D)
-    return mar
+def face_lost(timestamp):
+    """Advance the drowsiness windows on a frame without a face, so the alert does not stick while nobody is seen"""
+    drowsiness_window.expire(timestamp)
+    update_alert(timestamp)
 
-def get_face_mesh(image):
-    global blink_counter, blink_frame_counter, yawn_counter, yawn_frame_counter, drowsy_alert
+def update_alert(timestamp):
+    """Re-evaluate the drowsiness alert from the windows and emit DROWSY_START/DROWSY_END when it changes"""
+    global drowsy_alert
+    was_drowsy = drowsy_alert
+    drowsy_alert = drowsiness_window.drowsy
+    if drowsy_alert != was_drowsy:
+        events.emit(DROWSY_START if drowsy_alert else DROWSY_END, timestamp,
+                    blinks_per_minute=drowsiness_window.blinks_per_minute,
+                    yawns_per_minute=drowsiness_window.yawns_per_minute,
+                    perclos=drowsiness_window.perclos)
+
+def log_frame(timestamp, left_ear, right_ear, mar, face_present, inferred=True):
+    """Append this frame's metrics and detector state to the frame log, if one is open"""
+    if frame_log is not None:
+        frame_log.append(timestamp, left_ear, right_ear, mar, face_present, drowsy_alert, blink_counter,
+                         yawn_counter, blink_frame_counter, yawn_frame_counter, drowsiness_window.perclos,
+                         inferred)
+
+def get_face_mesh(image, annotate=True, timestamp=None):
+    """Run detection on one frame; with annotate=False nothing is copied or drawn and None replaces the image"""
+    metrics.inc('frames')
+    if timestamp is None:
+        timestamp = time.time()
+
+    # Between inferences, estimate EAR/MAR by propagating the last landmarks
+    if not frame_scheduler.should_infer():
+        with metrics.span('propagate'):
+            ratios = landmark_propagator.propagate(image)
+        if ratios is not None:
+            metrics.inc('inference_skips')
+            left_ear, right_ear, mar = ratios
+            avg_ear = (left_ear + right_ear) / 2.0
+            frame_scheduler.record(avg_ear, inferred=False)
+            
+            annotated_image = None
+            if annotate:
+                with metrics.span('copy'):
+                    annotated_image = buffer_pool.copy(image)
+                with metrics.span('draw_landmarks'):
+                    for x, y in landmark_propagator.points:
+                        cv2.circle(annotated_image, (int(x), int(y)), 1, (0, 255, 255), -1)
+            
+            update_counters(avg_ear, mar, timestamp)
+            log_frame(timestamp, left_ear, right_ear, mar, True, inferred=False)
+            return annotated_image, avg_ear, blink_counter, mar, yawn_counter, drowsy_alert
+        frame_scheduler.force_inference()
     
-    # Process with MediaPipe
-    results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    # Process with MediaPipe (only the face region when ROI tracking has a lock)
+    inference_start = time.perf_counter()
+    roi = roi_tracker.crop_region(image.shape)
+    with metrics.span('inference'):
+        if roi is None:
+            results = face_mesh.process(buffer_pool.to_rgb(image, cv2.COLOR_BGR2RGB))
+        else:
+            x0, y0, x1, y1 = roi
+            results = face_mesh.process(buffer_pool.to_rgb(image[y0:y1, x0:x1], cv2.COLOR_BGR2RGB))
+    roi_tracker.update(results, roi, image.shape)
+    inference_time = time.perf_counter() - inference_start
 
     if not results.multi_face_landmarks:
-        return image, 0, 0, 0, 0, drowsy_alert
+        metrics.inc('face_lost_frames')
+        if frame_scheduler.enabled:
+            frame_scheduler.record(0, True, inference_time)
+            landmark_propagator.reset()
+        face_lost(timestamp)
+        log_frame(timestamp, 0, 0, 0, False)
+        return (image if annotate else None), 0, 0, 0, 0, drowsy_alert
     
-    annotated_image = image.copy()
+    annotated_image = None
+    if annotate:
+        with metrics.span('copy'):
+            annotated_image = buffer_pool.copy(image)
+
+    # Landmarks from a cropped inference are relative to the crop: draw them
+    # onto the crop view and map them for EAR/MAR
+    mesh_canvas = annotated_image
+    transform = None
+    if roi is not None:
+        if annotate:
+            mesh_canvas = annotated_image[y0:y1, x0:x1]
+        transform = crop_transform(roi, image.shape)
     
     for face_landmarks in results.multi_face_landmarks:
         # Draw face mesh
-        mp_drawing.draw_landmarks(
-            image=annotated_image,
-            landmark_list=face_landmarks,
-            connections=mp_face_mesh.FACEMESH_CONTOURS,
-            landmark_drawing_spec=drawing_spec,
-            connection_drawing_spec=drawing_spec)
-        
-        # Calculate eye aspect ratios
-        left_ear = calculate_eye_aspect_ratio(LEFT_EYE_POINTS, face_landmarks.landmark)
-        right_ear = calculate_eye_aspect_ratio(RIGHT_EYE_POINTS, face_landmarks.landmark)
-        avg_ear = (left_ear + right_ear) / 2.0
-        
-        # Calculate mouth aspect ratio
-        mar = calculate_mouth_aspect_ratio(face_landmarks.landmark)
+        if annotate:
+            with metrics.span('draw_landmarks'):
+                face_mesh.draw_landmarks(mesh_canvas, face_landmarks)
         
-        # Check for blink
-        if avg_ear < EYE_AR_THRESH:
-            blink_frame_counter += 1
-        else:
-            if blink_frame_counter >= EYE_AR_CONSEC_FRAMES:
-                blink_counter += 1
-            blink_frame_counter = 0
-        
-        # Check for yawn
-        if mar > MOUTH_AR_THRESH:
-            yawn_frame_counter += 1
-        else:
-            if yawn_frame_counter >= YAWN_CONSEC_FRAMES:
-                yawn_counter += 1
-            yawn_frame_counter = 0
+        # Calculate eye and mouth aspect ratios in one vectorized pass
+        with metrics.span('ear_mar'):
+            points = ear_mar_points(face_landmarks.landmark, transform)
+            left_ear, right_ear, mar = compute_aspect_ratios(points, SUBSET_PAIR_INDEX).tolist()
+            avg_ear = (left_ear + right_ear) / 2.0
         
-        # Check for drowsiness (simplified logic)
-        drowsy_alert = (blink_counter > DROWSY_BLINK_THRESH) or (yawn_counter > DROWSY_YAWN_THRESH)
+        if frame_scheduler.enabled:
+            frame_scheduler.record(avg_ear, True, inference_time)
+            landmark_propagator.set_landmarks(image, points)
         
+        update_counters(avg_ear, mar, timestamp)
+        log_frame(timestamp, left_ear, right_ear, mar, True)
         return annotated_image, avg_ear, blink_counter, mar, yawn_counter, drowsy_alert
     
     return annotated_image, 0, blink_counter, 0, yawn_counter, drowsy_alert
 
-def get_system_stats():
-    """Get system performance stats"""
-    try:
-        cpu_usage = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
-        memory_usage = memory.percent
-        
-        # Try to get GPU temperature (NVIDIA)
-        try:
-            gpu_temp = subprocess.check_output(['nvidia-smi', '--query-gpu=temperature.gpu', '--format=csv,noheader,nounits']).decode().strip()
-            gpu_temp = int(gpu_temp)
-        except:
-            gpu_temp = 0
-            
-        return cpu_usage, memory_usage, gpu_temp
-    except:
-        return 0.0, 0.0, 0
+def process_ratios(ratios, timestamp=None):
+    """Blink/yawn/drowsiness update from precomputed (left EAR, right EAR, MAR), e.g. cached landmarks.
+
+    ratios is None for a frame without a face. No inference runs; returns
+    (avg_ear, blink_counter, mar, yawn_counter, drowsy_alert) like get_face_mesh.
+    """
+    metrics.inc('frames')
+    if timestamp is None:
+        timestamp = time.time()
+    if ratios is None:
+        metrics.inc('face_lost_frames')
+        face_lost(timestamp)
+        log_frame(timestamp, 0, 0, 0, False)
+        return 0, blink_counter, 0, yawn_counter, drowsy_alert
+    left_ear, right_ear, mar = ratios
+    avg_ear = (left_ear + right_ear) / 2.0
+    update_counters(avg_ear, mar, timestamp)
+    log_frame(timestamp, left_ear, right_ear, mar, True)
+    return avg_ear, blink_counter, mar, yawn_counter, drowsy_alert
+
+def reset_counters():
+    """Reset blink/yawn counters and the drowsiness state"""
+    global blink_counter, blink_frame_counter, yawn_counter, yawn_frame_counter, drowsy_alert
+    blink_counter = 0
+    blink_frame_counter = 0
+    yawn_counter = 0
+    yawn_frame_counter = 0
+    drowsy_alert = False
+    drowsiness_window.reset()
+
+def reset_tracking():
+    """Forget everything carried over from previous frames (e.g. when switching videos)"""
+    face_mesh.reset()
+    roi_tracker.reset()
+    frame_scheduler.reset()
+    landmark_propagator.reset()
+
+def draw_hud(annotated, avg_fps, stats, runtime_str, camera_index, blinks, ear, yawns, mar, show_alert):
+    """Draw the performance and detection overlay onto the frame (text is re-rasterized only when it changes)"""
+    # System and ratio readouts are re-formatted at the HUD refresh rate, not every frame
+    if hud.due():
+        hud.set('performance', f'FPS: {avg_fps:.1f} | CPU: {stats.cpu_usage:.1f}% | RAM: {stats.memory_usage:.1f}%')
+        hud.set('runtime', f'Runtime: {runtime_str} | Camera: {camera_index}')
+        temps = []
+        if stats.soc_temp > 0:
+            temps.append(f'SoC Temp: {stats.soc_temp:.0f}°C')
+        if stats.gpu_temp > 0:
+            temps.append(f'GPU Temp: {stats.gpu_temp}°C')
+        hud.set('temps', ' | '.join(temps) or None)
+        hud.set('ear', f'EAR: {ear:.3f}')
+        hud.set('mar', f'MAR: {mar:.3f}')
+        hud.set('rates', f'Blinks/min: {drowsiness_window.blinks_per_minute:.0f} | Yawns/min: {drowsiness_window.yawns_per_minute:.0f} | PERCLOS: {drowsiness_window.perclos:.0%}')
 
-def find_best_camera():
-    """Find the best available camera for Ubuntu"""
+    # Counters and visual indicators follow every frame
+    hud.set('blinks', f'Blinks: {blinks}')
+    hud.set('yawns', f'Yawns: {yawns}')
+    hud.set('blink_detected', 'BLINK DETECTED!' if ear > 0 and ear < EYE_AR_THRESH else None)
+    hud.set('yawn_detected', 'YAWN DETECTED!' if mar > MOUTH_AR_THRESH else None)
+    hud.set('alert', '⚠️  DROWSINESS ALERT!' if show_alert else None)
+    if annotated.shape != hud_shape:
+        layout_hud(annotated.shape)
+
+    # Drowsiness alert frame goes under the text, as before
+    if show_alert:
+        cv2.rectangle(annotated, (5, 5), (annotated.shape[1]-5, annotated.shape[0]-5), (0,0,255), 3)
+    hud.draw(annotated)
+
+def layout_hud(shape):
+    """Place the HUD rows for a frame size (called again whenever the capture resolution changes)"""
+    global hud_shape
+    hud_shape = shape
+    height, width = shape[:2]
+    compact = height < 300
+    rows = dict(HUD_COMPACT_ROWS, rates=height-26) if compact else HUD_ROWS
+    for name, y in rows.items():
+        hud.move(name, (10,y))
+    for name in HUD_HIDDEN_COMPACT:
+        hud.show(name, not compact)
+    hud.move('help', (10,height-10))
+    hud.fit(width)
+
+def find_best_camera(use_cache=True):
+    """Find the best available camera for Ubuntu; returns (index, from_cache)"""
     print("🔍 Scanning for available cameras...")
-    
-    # Common camera indices to try
-    camera_indices = [0, 1, 2, 10]  # Include 10 for OBS Virtual Camera
-    
-    for idx in camera_indices:
-        print(f"Trying camera index {idx}...")
-        cap = cv2.VideoCapture(idx)
-        if cap.isOpened():
-            # Test if we can read a frame
-            ret, frame = cap.read()
-            if ret and frame is not None:
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                print(f"✅ Camera {idx} working: {width}x{height}")
-                cap.release()
-                return idx
+    start = time.time()
+    # Preferred order: built-in, USB cameras, then 10 for OBS Virtual Camera
+    camera_index, from_cache = find_camera(preferred=(0, 1, 2, 10), use_cache=use_cache)
+    if camera_index is not None:
+        source = "cached" if from_cache else "probed"
+        print(f"✅ Camera {camera_index} ({source} in {time.time() - start:.2f}s)")
+    return camera_index, from_cache
+
+def main():
+    startup.mark('imports')
+    # Load the model while the arguments are parsed and the camera is found and opened
+    face_mesh.start()
+    parser = argparse.ArgumentParser(description='Ubuntu 22.04 Driver Drowsiness Detection')
+    add_pipeline_arguments(parser)
+    add_source_arguments(parser)
+    parser.add_argument('--roi-tracking', action='store_true',
+                        help='Run FaceMesh on a crop around the previous face position')
+    parser.add_argument('--adaptive-skip', action='store_true',
+                        help='Run FaceMesh every Nth frame and track eye/mouth landmarks in between')
+    parser.add_argument('--max-interval', type=int, default=4,
+                        help='Largest N for --adaptive-skip (default: 4)')
+    parser.add_argument('--target-fps', type=float, default=30.0,
+                        help='Frame rate budget for --adaptive-skip (default: 30)')
+    parser.add_argument('--stats-interval', type=float, default=1.0,
+                        help='Seconds between CPU/RAM/temperature samples (default: 1.0)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve per-stage timings and counters as Prometheus text on 127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-socket',
+                        help='Serve the same metrics on this Unix socket instead of HTTP')
+    parser.add_argument('--buffer-pool', action='store_true',
+                        help='Reuse preallocated frame, RGB and annotation buffers instead of allocating per frame')
+    parser.add_argument('--frame-log',
+                        help='Record every frame into this memory-mapped ring file (read with frame_log.py)')
+    parser.add_argument('--frame-log-hours', type=float, default=8.0,
+                        help='Hours of 30 FPS frames the ring file keeps (default: 8, about 35 MB)')
+    parser.add_argument('--snapshot-dir', default='.',
+                        help='Directory for saved frames (default: current directory)')
+    parser.add_argument('--snapshot-format', choices=SNAPSHOT_FORMATS, default='jpg',
+                        help='Image format for saved frames (default: jpg)')
+    parser.add_argument('--jpeg-quality', type=int, default=90, help='JPEG quality 0-100 (default: 90)')
+    parser.add_argument('--png-compression', type=int, default=3, help='PNG compression 0-9 (default: 3)')
+    parser.add_argument('--auto-capture', action='store_true',
+                        help='Save an evidence frame whenever the drowsiness alert goes off')
+    parser.add_argument('--auto-capture-interval', type=float, default=10.0,
+                        help='Minimum seconds between automatic captures (default: 10)')
+    parser.add_argument('--hud-fps', type=float, default=10.0,
+                        help='How often FPS/CPU/EAR/MAR readouts on the HUD refresh; 0 = every frame (default: 10)')
+    parser.add_argument('--governor', action='store_true',
+                        help='Step resolution, FPS, refine_landmarks and inference cadence down when the SoC runs hot')
+    parser.add_argument('--hot-temp', type=float, default=75.0,
+                        help='SoC temperature (°C) at which --governor lowers quality; it steps back up 10°C below (default: 75)')
+    parser.add_argument('--min-inference-fps', type=float, default=5.0,
+                        help='FaceMesh runs per second --governor never goes below (default: 5)')
+    parser.add_argument('--governor-log',
+                        help='Append every --governor tier change to this file as a JSON line')
+    parser.add_argument('--capture-profile', choices=['auto', 'basic'], default='auto',
+                        help='auto: negotiate pixel format, FPS and buffer size per camera (cached); '
+                             'basic: only request 640x480@30 (default: auto)')
+    parser.add_argument('--renegotiate', action='store_true',
+                        help='Ignore the cached capture profile and measure the candidates again')
+    parser.add_argument('--headless', action='store_true',
+                        help='No window or drawing; blink/yawn/drowsy events go to stdout as JSON lines')
+    args = parser.parse_args()
+    roi_tracker.enabled = args.roi_tracking
+    frame_scheduler.enabled = args.adaptive_skip
+    frame_scheduler.max_interval = args.max_interval
+    frame_scheduler.frame_budget = 1.0 / args.target_fps
+    hud.refresh_hz = args.hud_fps
+    if args.buffer_pool:
+        buffer_pool.enabled = True
+        # Enough slots for every frame that can be in flight at once
+        buffer_pool.resize(2 * args.queue_size + 4 if args.pipelined else 2)
+
+    if args.headless:
+        # stdout carries only the event stream; status messages move to stderr
+        events.add_listener(JsonLinesWriter(sys.stdout))
+        with contextlib.redirect_stdout(sys.stderr):
+            run(args)
+    else:
+        run(args)
+
+def run(args):
+    """Open the camera and run the detection loop until ESC (or Ctrl+C when headless)"""
+    global frame_log
+    # Print system information
+    print("🐧 Ubuntu 22.04 Driver Drowsiness Detection System")
+    print("=" * 60)
+
+    ubuntu_ver, cpu_info, cpu_cores, total_mem = get_system_info()
+    print(f"🖥️  System: {ubuntu_ver}")
+    print(f"🔧 CPU: {cpu_cores} cores")
+    print(f"💾 Memory: {total_mem}")
+    print("=" * 60)
+
+    # Initialize camera (or the recorded/synthetic source given with --source)
+    if args.source is not None:
+        camera_index, from_cache = args.source, False
+        cap = open_source(args.source, args.pacing, args.fps, args.loop)
+        if not cap.isOpened():
+            print(f"❌ Could not open source {args.source}")
+            sys.exit(1)
+    else:
+        print("🔍 Initializing camera for Ubuntu...")
+        camera_index, from_cache = find_best_camera()
+        cap = CameraSource(camera_index) if camera_index is not None else None
+        if from_cache and not cap.isOpened():
+            # The cached device is gone or busy: forget it and probe everything
+            print(f"⚠️  Cached camera {camera_index} did not open, rescanning...")
             cap.release()
-        print(f"❌ Camera {idx} not available")
-    
-    return None
-
-# Print system information
-print("🐧 Ubuntu 22.04 Driver Drowsiness Detection System")
-print("=" * 60)
-
-ubuntu_ver, cpu_info, cpu_cores, total_mem = get_system_info()
-print(f"🖥️  System: {ubuntu_ver}")
-print(f"🔧 CPU: {cpu_cores} cores")
-print(f"💾 Memory: {total_mem}")
-print("=" * 60)
-
-# Initialize camera
-print("🔍 Initializing camera for Ubuntu...")
-camera_index = find_best_camera()
-
-if camera_index is None:
-    print("❌ No cameras found! Please check:")
-    print("1. Camera is connected and working")
-    print("2. Camera permissions are granted")
-    print("3. No other application is using the camera")
-    print("4. Try: sudo usermod -a -G video $USER (then logout/login)")
-    sys.exit(1)
-
-cap = cv2.VideoCapture(camera_index)
-
-# Set camera properties for optimal performance
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
-
-print(f"✅ Using camera {camera_index}")
-print("🚗 Ubuntu Drowsiness Detection Started!")
-print("Press ESC to quit, S to save, R to reset counters, D to toggle drowsiness alerts")
-
-font = cv2.FONT_HERSHEY_SIMPLEX
-start_time = time.time()
-drowsiness_alerts_enabled = True
-
-while cap.isOpened():
-    s = time.time()
-    ret, img = cap.read()  
-    if ret == False:
-        print('❌ Camera Read Error')    
-        sys.exit(0)
-        
-    annotated, ear, blinks, mar, yawns, is_drowsy = get_face_mesh(img)
-    e = time.time()
-    fps = 1 / (e - s)
-    fps_deque.append(fps)
-    avg_fps = sum(fps_deque) / len(fps_deque) if fps_deque else 0
-    
-    # Get system stats
-    cpu_usage, memory_usage, gpu_temp = get_system_stats()
-    
-    # Calculate runtime
-    runtime = time.time() - start_time
-    runtime_str = f"{int(runtime//60):02d}:{int(runtime%60):02d}"
-    
-    # Add system performance info
-    cv2.putText(annotated, f'Ubuntu 22.04 - Drowsiness Detection', (10,25), font, fontScale = 0.5,  color = (0,255,0), thickness = 1)
-    cv2.putText(annotated, f'FPS: {avg_fps:.1f} | CPU: {cpu_usage:.1f}% | RAM: {memory_usage:.1f}%', (10,45), font, fontScale = 0.4,  color = (0,255,0), thickness = 1)
-    cv2.putText(annotated, f'Runtime: {runtime_str} | Camera: {camera_index}', (10,65), font, fontScale = 0.4,  color = (0,255,0), thickness = 1)
-    
-    if gpu_temp > 0:
-        cv2.putText(annotated, f'GPU Temp: {gpu_temp}°C', (10,85), font, fontScale = 0.4,  color = (0,255,255), thickness = 1)
-    
-    # Add detection info
-    cv2.putText(annotated, f'Blinks: {blinks}', (10,110), font, fontScale = 0.7,  color = (255,0,255), thickness = 2)
-    cv2.putText(annotated, f'EAR: {ear:.3f}', (10,135), font, fontScale = 0.5,  color = (255,255,0), thickness = 1)
-    cv2.putText(annotated, f'Yawns: {yawns}', (10,160), font, fontScale = 0.7,  color = (0,255,255), thickness = 2)
-    cv2.putText(annotated, f'MAR: {mar:.3f}', (10,185), font, fontScale = 0.5,  color = (255,255,0), thickness = 1)
-    
-    # Visual indicators
-    if ear > 0 and ear < EYE_AR_THRESH:
-        cv2.putText(annotated, 'BLINK DETECTED!', (10,210), font, fontScale = 0.6,  color = (0,0,255), thickness = 2)
-    
-    if mar > MOUTH_AR_THRESH:
-        cv2.putText(annotated, 'YAWN DETECTED!', (10,235), font, fontScale = 0.6,  color = (255,0,0), thickness = 2)
-    
-    # Drowsiness alert
-    if is_drowsy and drowsiness_alerts_enabled:
-        cv2.putText(annotated, '⚠️  DROWSINESS ALERT!', (10,260), font, fontScale = 0.8,  color = (0,0,255), thickness = 3)
-        cv2.rectangle(annotated, (5, 5), (annotated.shape[1]-5, annotated.shape[0]-5), (0,0,255), 3)
-    
-    cv2.putText(annotated, 'ESC=quit | S=save | R=reset | D=toggle alerts', (10,annotated.shape[0]-10), font, fontScale = 0.35,  color = (0,255,0), thickness = 1)
-    
-    cv2.imshow('Ubuntu 22.04 - Drowsiness Detection', annotated)
-    key = cv2.waitKey(1)
-    if key == 27:   #ESC
-        break
-    elif key == ord('s') or key == ord('S'):  # Save frame
-        filename = f'ubuntu_capture_{int(time.time())}.jpg'
-        cv2.imwrite(filename, annotated)
-        print(f"📸 Saved frame as {filename}")
-    elif key == ord('r') or key == ord('R'):  # Reset counters
-        blink_counter = 0
-        yawn_counter = 0
-        start_time = time.time()
-        print(f"🔄 Counters reset - Blinks: 0, Yawns: 0")
-    elif key == ord('d') or key == ord('D'):  # Toggle drowsiness alerts
-        drowsiness_alerts_enabled = not drowsiness_alerts_enabled
-        status = "enabled" if drowsiness_alerts_enabled else "disabled"
-        print(f"🔔 Drowsiness alerts {status}")
-
-cap.release()
-cv2.destroyAllWindows()
-face_mesh.close()
-print(f"✅ Ubuntu application closed successfully!")
-print(f"📊 Final Stats - Runtime: {runtime_str}, Blinks: {blink_counter}, Yawns: {yawn_counter}")
-print(f"📈 Average FPS: {avg_fps:.1f} | Peak CPU: {max(fps_deque) if fps_deque else 0:.1f}%") 
\ No newline at end of file
+            CameraCache().invalidate()
+            camera_index, from_cache = find_best_camera(use_cache=False)
+            cap = CameraSource(camera_index) if camera_index is not None else None
+
+    if camera_index is not None and cap.isOpened():
+        startup.mark('camera_open')
+
+    if camera_index is None:
+        print("❌ No cameras found! Please check:")
+        print("1. Camera is connected and working")
+        print("2. Camera permissions are granted")
+        print("3. No other application is using the camera")
+        print("4. Try: sudo usermod -a -G video $USER (then logout/login)")
+        sys.exit(1)
+
+    # Set camera properties for optimal performance (recorded sources ignore them)
+    if cap.live and args.capture_profile == 'auto':
+        # Pixel format, FPS and driver buffers are negotiated once per camera and cached
+        profile, cached, target_met = configure_capture(cap, camera_index, 640, 480, 30,
+                                                        renegotiate=args.renegotiate)
+        if profile is None:
+            print("⚠️  No capture profile delivered frames, requesting 640x480@30")
+        else:
+            print(f"🎛️  Capture profile: {describe_profile(profile)} ({'cached' if cached else 'negotiated'})")
+            if not target_met:
+                print("⚠️  The camera does not reach 30 FPS at 640x480; using its fastest profile")
+    else:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        cap.set(cv2.CAP_PROP_FPS, 30)
+    if buffer_pool.enabled:
+        cap = PooledCapture(cap, buffer_pool)
+
+    governor = None
+    if args.governor:
+        governor = PowerGovernor(hot_temp=args.hot_temp, cool_temp=args.hot_temp - 10.0,
+                                 min_inference_fps=args.min_inference_fps)
+        governor.add_listener(print_change)
+        if args.governor_log:
+            governor.add_listener(TierLog(args.governor_log))
+        # Resolution/FPS changes are applied by whichever thread reads the frames
+        cap = GovernedCapture(cap)
+        user_cadence = (frame_scheduler.enabled, frame_scheduler.max_interval)
+        print(f"🌡️  Power governor: {describe(governor.tier)}, steps down at {args.hot_temp:.0f}°C")
+
+    def apply_tier(tier):
+        cap.request(tier)
+        # The new model loads in the background; frames keep using the old one until it is ready
+        face_mesh.reconfigure(refine_landmarks=tier.refine_landmarks)
+        if tier.max_interval > 1:
+            frame_scheduler.enabled = True
+            frame_scheduler.max_interval = max(tier.max_interval, user_cadence[1] if user_cadence[0] else 1)
+        else:
+            frame_scheduler.enabled, frame_scheduler.max_interval = user_cadence
+        print(f"   Now running {describe(tier)}")
+
+    if cap.live:
+        print(f"✅ Using camera {camera_index}")
+    else:
+        print(f"🎞️  Using source {camera_index} ({cap.pacing}, {cap.fps:.1f} FPS)")
+    if args.pipelined:
+        print(f"🧵 Pipelined mode: queue size {args.queue_size}, policy {args.drop_policy}")
+    print("🚗 Ubuntu Drowsiness Detection Started!")
+    if args.headless:
+        print("🕶️  Headless mode: press Ctrl+C to quit")
+    else:
+        print("Press ESC to quit, S to save, R to reset counters, D to toggle drowsiness alerts")
+
+    start_time = time.time()
+    drowsiness_alerts_enabled = True
+    runtime_str = "00:00"
+    avg_fps = 0
+
+    metrics_server = None
+    if args.metrics_port is not None or args.metrics_socket:
+        metrics.enabled = True
+        try:
+            metrics_server = MetricsServer(port=args.metrics_port, socket_path=args.metrics_socket).start()
+        except OSError as e:
+            print(f"❌ Metrics endpoint: {e}")
+            sys.exit(1)
+        print(f"📡 Metrics endpoint: {metrics_server.address}")
+
+    if args.frame_log:
+        frame_log = FrameLogWriter(args.frame_log, int(args.frame_log_hours * 3600 * 30))
+        print(f"📼 Frame log: {args.frame_log} ({frame_log.capacity} frames)")
+
+    snapshots = SnapshotWriter(args.snapshot_dir, args.snapshot_format, args.jpeg_quality,
+                               args.png_compression, auto_interval=args.auto_capture_interval).start()
+    was_drowsy = False
+
+    # The stats feed the HUD and the governor, so headless mode without --governor never starts the sampler
+    stats_sampler = SystemStatsSampler(args.stats_interval)
+    if not args.headless or governor is not None:
+        stats_sampler.start()
+    frame_shape = [None]
+    def process_frame(frame, timestamp):
+        startup.mark('first_frame')
+        if frame.shape != frame_shape[0]:
+            # New capture resolution (governor tier change): tracked positions are in old pixels
+            if frame_shape[0] is not None:
+                roi_tracker.reset()
+                landmark_propagator.reset()
+                frame_scheduler.force_inference()
+            frame_shape[0] = frame.shape
+        return get_face_mesh(frame, annotate=not args.headless, timestamp=timestamp)
+
+    # Each frame is processed with its capture timestamp (media time for recorded sources)
+    frames = create_pipeline(cap, process_frame, args.pipelined, args.queue_size, args.drop_policy,
+                             with_timestamp=True)
+
+    # Only a discovered camera is remembered for the next start
+    camera_confirmed = args.source is not None
+    try:
+        for item in frames:
+            if not camera_confirmed:
+                # First frame arrived: remember this camera for the next start
+                threading.Thread(target=confirm_camera, args=(camera_index, item.frame.shape), daemon=True).start()
+                camera_confirmed = True
+            annotated, ear, blinks, mar, yawns, is_drowsy = item.result
+            if ear > 0 and 'first_metrics' not in startup.marks:
+                startup.mark('model_ready', face_mesh.ready_time)
+                startup.mark('first_metrics')
+                startup.report(face_mesh)
+            fps = 1 / item.frame_time if item.frame_time > 0 else 0
+            fps_deque.append(fps)
+            metrics.observe('frame', item.frame_time)
+            avg_fps = sum(fps_deque) / len(fps_deque) if fps_deque else 0
+
+            # Calculate runtime
+            runtime = time.time() - start_time
+            runtime_str = f"{int(runtime//60):02d}:{int(runtime%60):02d}"
+
+            # Evidence frame when the alert goes off (the raw frame when nothing is drawn)
+            if args.auto_capture and is_drowsy and not was_drowsy:
+                filename = snapshots.auto_capture(item.frame if args.headless else annotated)
+                if filename:
+                    print(f"📸 Drowsiness evidence queued as {filename}")
+            was_drowsy = is_drowsy
+            if governor is not None:
+                tier = governor.update(stats_sampler.snapshot)
+                if tier is not None:
+                    apply_tier(tier)
+            if args.headless:
+                continue
+
+            # Latest system stats from the background sampler (never blocks)
+            stats = stats_sampler.snapshot
+
+            with metrics.span('hud'):
+                draw_hud(annotated, avg_fps, stats, runtime_str, camera_index, blinks, ear, yawns, mar,
+                         is_drowsy and drowsiness_alerts_enabled)
+
+            with metrics.span('display'):
+                cv2.imshow('Ubuntu 22.04 - Drowsiness Detection', annotated)
+                key = cv2.waitKey(1)
+            if key == 27:   #ESC
+                break
+            elif key == ord('s') or key == ord('S'):  # Save frame (encoded and written in the background)
+                filename = snapshots.save(annotated)
+                if filename:
+                    print(f"📸 Saving frame as {filename}")
+                else:
+                    print(f"⚠️  Snapshot dropped, writer queue full ({snapshots.queue_depth} pending)")
+            elif key == ord('r') or key == ord('R'):  # Reset counters
+                reset_counters()
+                start_time = time.time()
+                hud.invalidate()
+                print(f"🔄 Counters reset - Blinks: 0, Yawns: 0")
+            elif key == ord('d') or key == ord('D'):  # Toggle drowsiness alerts
+                drowsiness_alerts_enabled = not drowsiness_alerts_enabled
+                status = "enabled" if drowsiness_alerts_enabled else "disabled"
+                print(f"🔔 Drowsiness alerts {status}")
+    except KeyboardInterrupt:
+        pass
+
+    if 'first_metrics' not in startup.marks:
+        # No face was ever found: still show how far startup got
+        if face_mesh.ready:
+            startup.mark('model_ready', face_mesh.ready_time)
+        startup.report(face_mesh)
+    frames.stop()
+    stats_sampler.stop()
+    snapshots.stop()
+    if snapshots.saved or snapshots.dropped or snapshots.failed:
+        print(f"📸 Snapshots: {snapshots.saved} saved, {snapshots.dropped} dropped (queue full), "
+              f"{snapshots.failed} failed, {snapshots.write_time * 1000.0 / max(1, snapshots.saved):.1f} ms per write")
+    if metrics_server is not None:
+        metrics_server.stop()
+    if frame_log is not None:
+        frame_log.close()
+        frame_log = None
+    if frames.read_failed:
+        print('❌ Camera Read Error' if cap.live else f'🏁 End of source ({cap.frames_read} frames)')
+    cap.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+    face_mesh.close()
+    if frame_scheduler.enabled:
+        total = frame_scheduler.inferences + frame_scheduler.skips
+        print(f"⏭️  FaceMesh ran on {frame_scheduler.inferences}/{total} frames")
+    print(f"✅ Ubuntu application closed successfully!")
+    print(f"📊 Final Stats - Runtime: {runtime_str}, Blinks: {blink_counter}, Yawns: {yawn_counter}")
+    print(f"📈 Average FPS: {avg_fps:.1f} | Peak CPU: {max(fps_deque) if fps_deque else 0:.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+class SlidingWindow:
+    """Timestamped integer samples in a fixed-size ring, covering the last `window` seconds.
+
+    add() and expiry are O(1) amortized and memory never grows: when the
+    ring is full the oldest sample is dropped, so capacity must cover the
+    most samples expected inside one window.
+    """
+
+    def __init__(self, window, capacity):
+        self.window = window
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.values = [0] * capacity
+        self.head = 0     # Index of the oldest sample
+        self.size = 0
+        self.total = 0    # Sum of the values currently in the window
+
+    def _drop_oldest(self):
+        self.total -= self.values[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
+
+    def add(self, timestamp, value=1):
+        if self.size == self.capacity:
+            self._drop_oldest()
+        index = (self.head + self.size) % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+        self.size += 1
+        self.total += value
+        self.expire(timestamp)
+
+    def expire(self, now):
+        cutoff = now - self.window
+        while self.size and self.times[self.head] <= cutoff:
+            self._drop_oldest()
+
+    def reset(self):
+        self.head = self.size = self.total = 0
+
+
+class DrowsinessWindow:
+    """Blinks/min, yawns/min and PERCLOS over trailing time windows.
+
+    Rates are normalized by the full window length, so they ramp up over
+    the first window of a session instead of spiking on the first blink.
+    PERCLOS is the fraction of face frames with the eyes closed.
+    """
+
+    def __init__(self, blink_thresh=15, yawn_thresh=3, perclos_thresh=0.15,
+                 event_window=60.0, perclos_window=60.0, max_fps=60):
+        self.blink_thresh = blink_thresh        # Blinks per minute
+        self.yawn_thresh = yawn_thresh          # Yawns per minute
+        self.perclos_thresh = perclos_thresh    # Fraction of eye-closed frames
+        self.min_perclos_frames = 30            # Frames needed before PERCLOS can raise the alert
+        self.blinks = SlidingWindow(event_window, capacity=int(event_window * 4) + 16)
+        self.yawns = SlidingWindow(event_window, capacity=int(event_window) + 16)
+        self.eyes_closed = SlidingWindow(perclos_window, capacity=int(perclos_window * max_fps))
+
+    def update(self, timestamp, eyes_closed, blink=False, yawn=False):
+        """Add one face frame (and a blink/yawn that completed on it)"""
+        self.eyes_closed.add(timestamp, int(eyes_closed))
+        if blink:
+            self.blinks.add(timestamp)
+        else:
+            self.blinks.expire(timestamp)
+        if yawn:
+            self.yawns.add(timestamp)
+        else:
+            self.yawns.expire(timestamp)
+
+    def expire(self, timestamp):
+        """Age the windows without adding a frame (no face): the rates decay while the driver is not seen"""
+        self.eyes_closed.expire(timestamp)
+        self.blinks.expire(timestamp)
+        self.yawns.expire(timestamp)
+
+    @property
+    def blinks_per_minute(self):
+        return self.blinks.size * 60.0 / self.blinks.window
+
+    @property
+    def yawns_per_minute(self):
+        return self.yawns.size * 60.0 / self.yawns.window
+
+    @property
+    def perclos(self):
+        return self.eyes_closed.total / self.eyes_closed.size if self.eyes_closed.size else 0.0
+
+    @property
+    def drowsy(self):
+        return (self.blinks_per_minute > self.blink_thresh or self.yawns_per_minute > self.yawn_thresh
+                or (self.eyes_closed.size >= self.min_perclos_frames and self.perclos > self.perclos_thresh))
+
+    def reset(self):
+        self.blinks.reset()
+        self.yawns.reset()
+        self.eyes_closed.reset()
@@ -0,0 +1,192 @@
+"""Fixed-size, memory-mapped ring file of per-frame detector records.
+
+The detector writes each frame with a plain memory store (no write() or
+fsync on the hot path; the kernel flushes dirty pages). Any other process
+can open the same file with FrameLogReader and get time ranges back as
+NumPy views into the mapping.
+"""
+import argparse
+import os
+
+import numpy as np
+
+MAGIC = b'DROWSYLG'
+VERSION = 1
+HEADER_SIZE = 64
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('capacity', '<u8'),
+    ('count', '<u8'),       # Records ever written; the next one goes to slot count % capacity
+])
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('left_ear', '<f4'),
+    ('right_ear', '<f4'),
+    ('mar', '<f4'),
+    ('perclos', '<f4'),
+    ('blinks', '<u4'),
+    ('yawns', '<u4'),
+    ('blink_frames', '<u2'),  # Consecutive eye-closed frames so far
+    ('yawn_frames', '<u2'),   # Consecutive mouth-open frames so far
+    ('face_present', 'u1'),
+    ('drowsy', 'u1'),
+    ('inferred', 'u1'),       # 0 when the frame was served by landmark propagation
+    ('_pad', 'u1'),
+])
+
+
+def _map(path, mode):
+    header = np.memmap(path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+    if header['magic'][0] != MAGIC or header['version'][0] != VERSION:
+        raise ValueError(f"{path} is not a frame log")
+    if header['record_size'][0] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} was written with a different record layout")
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode=mode, offset=HEADER_SIZE,
+                        shape=(int(header['capacity'][0]),))
+    return header, records
+
+
+class FrameLogWriter:
+    """Append one record per frame into the ring, overwriting the oldest once it is full.
+
+    Timestamps in the ring are kept in increasing order, since readers
+    binary-search them. An existing log of the same size and layout is
+    continued. But when a frame is older than the newest record (a replay
+    starting at media time 0 after a live session, or a clock without RTC
+    stepping back at NTP sync), the current log is moved to <path>.prev and
+    a new one is started.
+    """
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.restarts = 0
+        self._open()
+
+    def _open(self):
+        expected_size = HEADER_SIZE + self.capacity * RECORD_DTYPE.itemsize
+        if not (os.path.exists(self.path) and os.path.getsize(self.path) == expected_size):
+            with open(self.path, 'wb') as f:
+                f.truncate(expected_size)
+            header = np.memmap(self.path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+            header[0] = (MAGIC, VERSION, RECORD_DTYPE.itemsize, self.capacity, 0)
+            header.flush()
+            del header
+        self.header, self.records = _map(self.path, 'r+')
+        self.count = int(self.header['count'][0])
+        self.last_timestamp = (float(self.records['timestamp'][(self.count - 1) % self.capacity])
+                               if self.count else -np.inf)
+
+    def _restart(self, timestamp):
+        print(f"⚠️  Frame log: time went back from {self.last_timestamp:.3f} to {timestamp:.3f}, "
+              f"previous log kept as {self.path}.prev")
+        self.close()
+        os.replace(self.path, self.path + '.prev')
+        self.restarts += 1
+        self._open()
+
+    def append(self, timestamp, left_ear, right_ear, mar, face_present, drowsy, blinks, yawns,
+               blink_frames=0, yawn_frames=0, perclos=0.0, inferred=True):
+        if timestamp < self.last_timestamp:
+            self._restart(timestamp)
+        self.records[self.count % self.capacity] = (
+            timestamp, left_ear, right_ear, mar, perclos, blinks, yawns,
+            min(blink_frames, 65535), min(yawn_frames, 65535), face_present, drowsy, inferred, 0)
+        # Publish the record only after it is complete
+        self.count += 1
+        self.header['count'][0] = self.count
+        self.last_timestamp = timestamp
+
+    def flush(self):
+        """Ask the kernel to write dirty pages now (never needed for other readers)"""
+        self.records.flush()
+        self.header.flush()
+
+    def close(self):
+        self.flush()
+        del self.records, self.header
+
+
+class FrameLogReader:
+    """Read-only view of a frame log, safe to use while the detector is writing.
+
+    Views returned by segments(), range_views() and time_range() point into
+    the live ring: once the writer wraps around, later appends overwrite
+    them in place. Copy what must outlive the next pass over the ring. A
+    reader that was opened before the writer restarted keeps reading
+    <path>.prev.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header, self.records = _map(path, 'r')
+        self.capacity = len(self.records)
+
+    def segments(self):
+        """Oldest-to-newest views covering every valid record (one, or two when the ring wrapped)"""
+        count = int(self.header['count'][0])
+        # The oldest slot may be being overwritten right now, so it is skipped once the ring is full
+        size = min(count, self.capacity - 1)
+        start = (count - size) % self.capacity
+        end = start + size
+        if end <= self.capacity:
+            return [self.records[start:end]]
+        return [self.records[start:], self.records[:end - self.capacity]]
+
+    def range_views(self, start_time, end_time):
+        """Zero-copy views of the records with start_time <= timestamp < end_time, oldest first"""
+        views = []
+        for segment in self.segments():
+            timestamps = segment['timestamp']
+            lo, hi = np.searchsorted(timestamps, [start_time, end_time])
+            if hi > lo:
+                views.append(segment[lo:hi])
+        return views
+
+    def time_range(self, start_time, end_time):
+        """Records in the range as one array: a view when possible, a copy when it spans the wrap point"""
+        views = self.range_views(start_time, end_time)
+        if not views:
+            return np.empty(0, RECORD_DTYPE)
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+    def latest(self, seconds):
+        """Records from the last `seconds` seconds of the log"""
+        segments = self.segments()
+        if not len(segments[-1]):
+            return np.empty(0, RECORD_DTYPE)
+        newest = float(segments[-1]['timestamp'][-1])
+        return self.time_range(newest - seconds, np.inf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the end of a frame log')
+    parser.add_argument('path', help='Frame log file written with --frame-log')
+    parser.add_argument('--seconds', type=float, default=60.0, help='How far back to look (default: 60)')
+    args = parser.parse_args()
+
+    reader = FrameLogReader(args.path)
+    records = reader.latest(args.seconds)
+    total = int(reader.header['count'][0])
+    print(f"📼 {args.path}: {total} frames written, ring holds {reader.capacity}")
+    if not len(records):
+        print("No records yet")
+        return
+    face = records['face_present'].astype(bool)
+    span = records['timestamp'][-1] - records['timestamp'][0]
+    print(f"⏱️  Last {span:.1f}s: {len(records)} frames, face in {face.mean():.0%}")
+    if face.any():
+        ear = (records['left_ear'][face] + records['right_ear'][face]) / 2.0
+        print(f"👁️  EAR mean {ear.mean():.3f} (min {ear.min():.3f}) | MAR max {records['mar'][face].max():.3f}")
+    print(f"😴 Blinks +{int(records['blinks'][-1]) - int(records['blinks'][0])}, "
+          f"Yawns +{int(records['yawns'][-1]) - int(records['yawns'][0])}, "
+          f"drowsy in {records['drowsy'].astype(bool).mean():.0%} of frames, "
+          f"PERCLOS now {records['perclos'][-1]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
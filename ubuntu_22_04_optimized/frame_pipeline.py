@@ -0,0 +1,223 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from hot_path_metrics import metrics
+
+# Queue overflow policies
+DROP_OLDEST = 'drop-oldest'  # Discard the queued frame, keep the newest one
+DROP_NEWEST = 'drop-newest'  # Discard the incoming frame, keep what is queued
+BLOCK = 'block'              # Wait for the consumer (no frames are dropped)
+DROP_POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+
+# One processed frame handed to the render stage.
+# frame_time is the time since the previous output, so 1 / frame_time is the
+# real output rate including rendering and imshow in both modes.
+PipelineFrame = namedtuple('PipelineFrame', ['frame', 'result', 'capture_time', 'frame_time'])
+
+_STOP = object()
+
+
+def capture_time(cap):
+    """Timestamp of the frame just read: the source's own (see frame_source), else the wall clock"""
+    timestamp = getattr(cap, 'timestamp', None)
+    return time.time() if timestamp is None else timestamp
+
+
+class FrameQueue:
+    """Bounded queue between two pipeline stages with a configurable overflow policy"""
+
+    def __init__(self, maxsize=1, policy=DROP_OLDEST):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self.policy = policy
+        self.dropped = 0
+
+    def put(self, item, stop_event):
+        """Add an item, applying the overflow policy when the queue is full"""
+        while not stop_event.is_set():
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                metrics.inc('dropped_frames')
+                return False
+            if self.policy == DROP_OLDEST:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                    metrics.inc('dropped_frames')
+                except queue.Empty:
+                    pass
+            else:
+                time.sleep(0.001)
+        return False
+
+    def put_stop(self):
+        """Wake the consumer up so it can exit, even when the queue is full"""
+        while True:
+            try:
+                self._queue.put_nowait(_STOP)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=0.1):
+        """Return the next item, None on timeout or _STOP when the producer finished"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class SequentialPipeline:
+    """Original single-loop behaviour: read, process and hand over one frame at a time"""
+
+    def __init__(self, cap, process_frame, with_timestamp=False):
+        self.cap = cap
+        self.process_frame = process_frame
+        self.with_timestamp = with_timestamp
+        self.read_failed = False
+        self.dropped_frames = 0
+
+    def __iter__(self):
+        last_output = time.time()
+        while self.cap.isOpened():
+            with metrics.span('capture'):
+                ret, frame = self.cap.read()
+            if not ret:
+                self.read_failed = True
+                return
+            timestamp = capture_time(self.cap)
+            result = self.process_frame(frame, timestamp) if self.with_timestamp else self.process_frame(frame)
+            now = time.time()
+            frame_time = now - last_output
+            last_output = now
+            yield PipelineFrame(frame, result, timestamp, frame_time)
+
+    def stop(self):
+        pass
+
+
+class ThreadedPipeline:
+    """Capture and inference run on their own threads, rendering stays on the caller's thread.
+
+    The stages are joined by bounded queues, so throughput is set by the
+    slowest stage instead of the sum of all stages. With the default
+    one-slot drop-oldest capture queue the inference stage always works on
+    the latest camera frame.
+    """
+
+    def __init__(self, cap, process_frame, queue_size=1, drop_policy=DROP_OLDEST, with_timestamp=False):
+        self.cap = cap
+        self.process_frame = process_frame
+        self.with_timestamp = with_timestamp
+        self.capture_queue = FrameQueue(queue_size, drop_policy)
+        self.output_queue = FrameQueue(queue_size, drop_policy)
+        self.read_failed = False
+        self.error = None
+        self._stop_event = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='inference', daemon=True),
+        ]
+        self._started = False
+
+    @property
+    def dropped_frames(self):
+        return self.capture_queue.dropped + self.output_queue.dropped
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def _capture_loop(self):
+        try:
+            while not self._stop_event.is_set() and self.cap.isOpened():
+                with metrics.span('capture'):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    self.read_failed = True
+                    break
+                self.capture_queue.put((frame, capture_time(self.cap)), self._stop_event)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.capture_queue.put_stop()
+
+    def _inference_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                item = self.capture_queue.get()
+                if item is None:
+                    continue
+                if item is _STOP:
+                    break
+                frame, timestamp = item
+                if self.with_timestamp:
+                    result = self.process_frame(frame, timestamp)
+                else:
+                    result = self.process_frame(frame)
+                self.output_queue.put((frame, result, timestamp), self._stop_event)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.output_queue.put_stop()
+
+    def __iter__(self):
+        self.start()
+        last_output = time.time()
+        while True:
+            item = self.output_queue.get()
+            if item is None:
+                continue
+            if item is _STOP:
+                break
+            frame, result, timestamp = item
+            now = time.time()
+            frame_time = now - last_output
+            last_output = now
+            yield PipelineFrame(frame, result, timestamp, frame_time)
+
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout=2.0):
+        """Stop the worker threads; call before releasing the capture device"""
+        self._stop_event.set()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout)
+
+
+def create_pipeline(cap, process_frame, pipelined=False, queue_size=1, drop_policy=DROP_OLDEST,
+                    with_timestamp=False):
+    """Build the frame source for the main loop; with_timestamp passes each frame's capture time to process_frame"""
+    if pipelined:
+        return ThreadedPipeline(cap, process_frame, queue_size, drop_policy, with_timestamp)
+    return SequentialPipeline(cap, process_frame, with_timestamp)
+
+
+def add_pipeline_arguments(parser):
+    """Register the pipeline command line options on an argparse parser"""
+    parser.add_argument('--pipelined', action='store_true',
+                        help='Run capture, inference and rendering as separate pipeline stages')
+    parser.add_argument('--queue-size', type=int, default=1,
+                        help='Frames buffered between pipeline stages (default: 1)')
+    parser.add_argument('--drop-policy', choices=DROP_POLICIES, default=DROP_OLDEST,
+                        help='What to do when a stage queue is full (default: drop-oldest)')
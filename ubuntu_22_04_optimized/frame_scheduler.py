@@ -0,0 +1,124 @@
+import math
+
+import cv2
+import numpy as np
+
+from landmark_math import SUBSET_PAIR_INDEX, compute_aspect_ratios
+
+
+class AdaptiveInferenceScheduler:
+    """Decide on which frames FaceMesh runs; the frames in between are propagated.
+
+    The inference interval N grows by one after every inference while the
+    eyes are steady, up to max_interval, and is never allowed below the
+    number of frames one inference takes at the target frame rate. It drops
+    straight back to 1 (inference on every frame) during a possible blink:
+    EAR near the blink threshold or changing quickly.
+    """
+
+    def __init__(self, target_fps=30.0, max_interval=4, ear_thresh=0.25, ear_margin=0.05,
+                 ear_velocity=0.02, enabled=False):
+        self.frame_budget = 1.0 / target_fps  # Seconds per output frame
+        self.max_interval = max_interval      # Upper bound for N
+        self.ear_thresh = ear_thresh          # Blink threshold (EYE_AR_THRESH)
+        self.ear_margin = ear_margin          # EAR this close to the threshold counts as a possible blink
+        self.ear_velocity = ear_velocity      # EAR change per frame that counts as a possible blink
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.interval = 1
+        self.frames_since_inference = 0
+        self.inference_time = 0.0             # Exponential moving average, seconds
+        self.last_ear = None
+        self.inferences = 0
+        self.skips = 0
+
+    def should_infer(self):
+        """True when FaceMesh must run on this frame"""
+        return not self.enabled or self.frames_since_inference + 1 >= self.interval
+
+    def force_inference(self):
+        """Run FaceMesh on the next frame (e.g. propagation failed or the face was lost)"""
+        self.interval = 1
+
+    def record(self, ear, inferred, inference_time=None):
+        """Update the interval from this frame's EAR (0 when no face was found)"""
+        if inferred:
+            self.inferences += 1
+            self.frames_since_inference = 0
+            if inference_time is not None:
+                self.inference_time = inference_time if self.inference_time == 0 else (
+                    0.8 * self.inference_time + 0.2 * inference_time)
+        else:
+            self.skips += 1
+            self.frames_since_inference += 1
+
+        if ear <= 0:
+            self.last_ear = None
+            self.interval = 1
+            return
+
+        velocity = abs(ear - self.last_ear) if self.last_ear is not None else 0.0
+        self.last_ear = ear
+        if ear < self.ear_thresh + self.ear_margin or velocity >= self.ear_velocity:
+            self.interval = 1
+        elif inferred:
+            budget_interval = math.ceil(self.inference_time / self.frame_budget) if self.inference_time else 1
+            self.interval = min(self.max_interval, max(self.interval + 1, budget_interval))
+
+
+class LandmarkPropagator:
+    """Move the EAR/MAR landmark subset between inferences with sparse (Lucas-Kanade) optical flow.
+
+    Only a padded box around the tracked points is converted to grayscale.
+    """
+
+    def __init__(self, margin=24, min_tracked=0.9):
+        self.margin = margin            # Pixels around the tracked points that are converted/searched
+        self.min_tracked = min_tracked  # Fraction of points that must be found to trust the result
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+        self.reset()
+
+    def reset(self):
+        self.points = None       # (20, 2) float32 pixel coordinates
+        self.prev_gray = None
+        self.box = None          # (x0, y0, x1, y1) of prev_gray in the frame
+
+    def _box(self, frame_shape):
+        height, width = frame_shape[:2]
+        (x0, y0), (x1, y1) = self.points.min(axis=0), self.points.max(axis=0)
+        return (max(0, int(x0) - self.margin), max(0, int(y0) - self.margin),
+                min(width, int(x1) + self.margin + 1), min(height, int(y1) + self.margin + 1))
+
+    def set_landmarks(self, image, points):
+        """Start tracking from an inference: points are full-frame normalized (20, 3) EAR/MAR landmarks"""
+        height, width = image.shape[:2]
+        self.points = np.ascontiguousarray(points[:, :2] * (width, height), dtype=np.float32)
+        self.box = self._box(image.shape)
+        x0, y0, x1, y1 = self.box
+        self.prev_gray = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+
+    def propagate(self, image):
+        """Return (left_ear, right_ear, mar) estimated for this frame, or None when tracking failed"""
+        if self.points is None:
+            return None
+        x0, y0, x1, y1 = self.box
+        gray = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        if gray.shape != self.prev_gray.shape:
+            self.reset()
+            return None
+
+        origin = np.array([x0, y0], dtype=np.float32)
+        local = (self.points - origin).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, local, None, **self.lk_params)
+        if moved is None or status.mean() < self.min_tracked:
+            self.reset()
+            return None
+
+        self.points = moved.reshape(-1, 2) + origin
+        self.prev_gray = gray
+        height, width = image.shape[:2]
+        ratios = compute_aspect_ratios(self.points / (width, height), SUBSET_PAIR_INDEX)
+        return tuple(ratios.tolist())
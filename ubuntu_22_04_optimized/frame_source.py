@@ -0,0 +1,250 @@
+"""Frame sources: cameras, video files, image directories and synthetic frames behind one interface.
+
+Every source reads like cv2.VideoCapture (isOpened/read/get/set/release)
+and sets .timestamp to the capture time of the frame it just returned.
+Cameras are stamped with the wall clock. Recorded and synthetic sources
+are stamped with their media time: with REALTIME pacing it starts at the
+wall-clock time the source was opened and frames are released at the
+source FPS; with UNTHROTTLED pacing frames come as fast as they can be
+read and timestamps start at 0, so two runs see exactly the same input.
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Pacing modes for recorded and synthetic sources
+REALTIME = 'realtime'         # Release frames at the source FPS (replay)
+UNTHROTTLED = 'unthrottled'   # As fast as possible (benchmarks, CI, batch runs)
+PACING_MODES = [REALTIME, UNTHROTTLED]
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SYNTHETIC = 'synthetic'
+
+
+class FrameSource:
+    """Base class: subclasses implement _grab(image) returning (frame, media_seconds) or None"""
+
+    live = False
+
+    def __init__(self, fps=30.0, pacing=REALTIME, loop=False):
+        if pacing not in PACING_MODES:
+            raise ValueError(f"Unknown pacing: {pacing}")
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.pacing = pacing
+        self.loop = loop
+        self.timestamp = None       # Capture time of the last frame returned by read()
+        self.frames_read = 0
+        self.width = self.height = 0
+        self._opened = True
+        self._clock_start = None
+        self._loop_offset = 0.0     # Media time added per completed loop
+        self.start_time = 0.0
+
+    def isOpened(self):
+        return self._opened
+
+    def _grab(self, image):
+        raise NotImplementedError
+
+    def _rewind(self):
+        return False
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        grabbed = self._grab(image)
+        if grabbed is None and self.loop and self.frames_read and self._rewind():
+            self._loop_offset = self.timestamp - self.start_time + 1.0 / self.fps
+            grabbed = self._grab(image)
+        if grabbed is None:
+            return False, None
+        frame, position = grabbed
+        if self._clock_start is None:
+            self._clock_start = time.time()
+            self.start_time = self._clock_start if self.pacing == REALTIME else 0.0
+        position += self._loop_offset
+        if self.pacing == REALTIME:
+            delay = self._clock_start + position - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self.timestamp = self.start_time + position
+        self.frames_read += 1
+        self.height, self.width = frame.shape[:2]
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frames_read)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._opened = False
+
+
+class CameraSource(FrameSource):
+    """A live device: camera index, /dev/video* path or stream URL, stamped with the wall clock"""
+
+    live = True
+
+    def __init__(self, device, backend=cv2.CAP_ANY):
+        super().__init__()
+        self.device = device
+        self.cap = cv2.VideoCapture(device, backend)
+        self._opened = self.cap.isOpened()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if ret:
+            self.timestamp = time.time()
+            self.frames_read += 1
+        return ret, frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """A recorded video, stamped with frame index / file FPS"""
+
+    def __init__(self, path, pacing=REALTIME, loop=False):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS), pacing, loop)
+        self._opened = self.cap.isOpened()
+        self._index = 0
+
+    def _grab(self, image):
+        ret, frame = self.cap.read(image)
+        if not ret:
+            return None
+        position = self._index / self.fps
+        self._index += 1
+        return frame, position
+
+    def _rewind(self):
+        self._index = 0
+        return self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Image files of a directory in name order, played at a fixed FPS"""
+
+    def __init__(self, directory, fps=30.0, pacing=REALTIME, loop=False):
+        super().__init__(fps, pacing, loop)
+        self.directory = directory
+        self.files = sorted(f for f in glob.glob(os.path.join(directory, '*'))
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self._opened = bool(self.files)
+        self._index = 0
+
+    def _grab(self, image):
+        while self._index < len(self.files):
+            frame = cv2.imread(self.files[self._index])
+            position = self._index / self.fps
+            self._index += 1
+            if frame is not None:
+                return frame, position
+        return None
+
+    def _rewind(self):
+        self._index = 0
+        return True
+
+
+class SyntheticSource(FrameSource):
+    """Deterministic frames: a still image (or blurred noise) shifted by a few pixels each frame"""
+
+    def __init__(self, size=(640, 480), fps=30.0, count=None, image_path=None, seed=0,
+                 pacing=REALTIME, loop=False):
+        super().__init__(fps, pacing, loop)
+        width, height = size
+        if image_path:
+            base = cv2.imread(image_path)
+            if base is None:
+                raise FileNotFoundError(image_path)
+            self.base = cv2.resize(base, (width, height))
+        else:
+            rng = np.random.default_rng(seed)
+            self.base = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+        self.count = count
+        self._index = 0
+
+    def _grab(self, image):
+        if self.count is not None and self._index >= self.count:
+            return None
+        frame = np.roll(self.base, (self._index % 8) - 4, axis=1)
+        position = self._index / self.fps
+        self._index += 1
+        return frame, position
+
+    def _rewind(self):
+        self._index = 0
+        return True
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def open_source(spec, pacing=REALTIME, fps=None, loop=False, count=None):
+    """Open a source from its command line form.
+
+    0, 1, ...                  camera index
+    /dev/video2, rtsp://...    device path or stream URL
+    path/to/drive.mp4          video file
+    path/to/frames/            directory of images (played at --fps, default 30)
+    synthetic[:WxH][:image]    generated frames, e.g. synthetic:1280x720:face.png
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if spec.startswith('/dev/') or '://' in spec:
+        return CameraSource(spec)
+    if spec == SYNTHETIC or spec.startswith(SYNTHETIC + ':'):
+        size, image_path = (640, 480), None
+        for part in spec.split(':')[1:]:
+            if part[:1].isdigit() and 'x' in part:
+                size = parse_size(part)
+            elif part:
+                image_path = part
+        return SyntheticSource(size, fps or 30.0, count, image_path, pacing=pacing, loop=loop)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps or 30.0, pacing, loop)
+    return VideoFileSource(spec, pacing, loop)
+
+
+def add_source_arguments(parser):
+    """Register the frame source command line options on an argparse parser"""
+    parser.add_argument('--source',
+                        help='Camera index, /dev/video* path, video file, image directory or synthetic[:WxH][:image] '
+                             '(default: find a camera)')
+    parser.add_argument('--pacing', choices=PACING_MODES, default=REALTIME,
+                        help='Recorded/synthetic sources: play at their FPS or as fast as possible (default: realtime)')
+    parser.add_argument('--fps', type=float, help='Frame rate for image directories and synthetic sources (default: 30)')
+    parser.add_argument('--loop', action='store_true', help='Restart recorded and synthetic sources at the end')
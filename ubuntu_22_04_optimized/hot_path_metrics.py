@@ -0,0 +1,219 @@
+import bisect
+import os
+import socketserver
+import stat
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+# Counters exported by the detector
+COUNTERS = {
+    'frames': 'Frames handed to the detector',
+    'dropped_frames': 'Frames dropped by full pipeline queues',
+    'face_lost_frames': 'Frames where no face was found',
+    'inference_skips': 'Frames served by landmark propagation instead of FaceMesh',
+    'snapshots_saved': 'Snapshots written by the background writer',
+    'snapshots_dropped': 'Snapshots dropped because the writer queue was full',
+}
+
+
+class StreamingHistogram:
+    """Fixed-bucket latency histogram: O(1) memory however many samples are observed"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            if seen + bucket_count >= rank and bucket_count > 0:
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return lower
+
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class HotPathMetrics:
+    """Per-stage timing histograms and event counters for the main loop.
+
+    While disabled, span() hands out a shared no-op context manager and
+    inc() returns immediately, so instrumented code costs next to nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, StreamingHistogram())
+        return histogram
+
+    def span(self, stage):
+        """Context manager timing one stage of the current frame"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self._histogram(stage))
+
+    def observe(self, stage, seconds):
+        """Record a duration measured elsewhere (e.g. the pipeline's frame time)"""
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def inc(self, counter, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set_gauge(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self.gauges[name] = value
+
+    def snapshot(self):
+        """Copies of the histograms ((buckets, counts, sum) per stage), counters and gauges, taken under the lock"""
+        with self._lock:
+            histograms = {stage: (histogram.buckets, list(histogram.counts), histogram.sum)
+                          for stage, histogram in self.histograms.items()}
+            return histograms, dict(self.counters), dict(self.gauges)
+
+    def render_prometheus(self, prefix='drowsiness'):
+        """Return all metrics in the Prometheus text exposition format"""
+        histograms, counters, gauges = self.snapshot()
+        lines = [f'# HELP {prefix}_stage_seconds Time spent in each hot-path stage',
+                 f'# TYPE {prefix}_stage_seconds histogram']
+        for stage, (buckets, counts, total) in sorted(histograms.items()):
+            cumulative = 0
+            for upper, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{upper}"}} {cumulative}')
+            # Count from the copied buckets, so +Inf and _count always agree with them
+            count = cumulative + counts[-1]
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        for name, value in sorted(counters.items()):
+            lines.append(f'# HELP {prefix}_{name}_total {COUNTERS.get(name, name)}')
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+
+        for name, value in sorted(gauges.items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared instance used by the detector, the pipeline and the metrics endpoint
+metrics = HotPathMetrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the console
+
+
+class _UnixMetricsHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.wfile.write(self.server.registry.render_prometheus().encode())
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+
+class MetricsServer:
+    """Serve metrics as Prometheus text over local HTTP or a Unix socket, on a daemon thread"""
+
+    def __init__(self, registry=metrics, port=None, socket_path=None, host='127.0.0.1'):
+        if socket_path:
+            if os.path.lexists(socket_path):
+                if not _is_socket(socket_path):
+                    raise FileExistsError(f"{socket_path} exists and is not a socket")
+                # Left behind by an earlier run
+                os.unlink(socket_path)
+            self.server = socketserver.ThreadingUnixStreamServer(socket_path, _UnixMetricsHandler)
+            self.address = socket_path
+        else:
+            self.server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            self.address = f'http://{host}:{self.server.server_address[1]}/metrics'
+        self.server.daemon_threads = True
+        self.server.registry = registry
+        self.socket_path = socket_path
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path and _is_socket(self.socket_path):
+            os.unlink(self.socket_path)
@@ -0,0 +1,210 @@
+"""Cached HUD text: lines are rasterized only when their string changes and composited from a cached layer"""
+import math
+import time
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+BAND_GAP = 32    # Rows between two sprites below which they share one copy band
+
+
+def _overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1] and a[2] < b[3] and b[2] < a[3]
+
+
+class TextSprite:
+    """One line of text drawn with cv2.putText into a mask only when the string changes.
+
+    putText's default 8-connected lines are not anti-aliased, so copying
+    the color through the mask gives exactly the pixels putText would have
+    drawn on the frame (except where the text is cut by the frame edge).
+    Only the bounding box of the glyphs is touched. Text wider than
+    max_width is drawn at a smaller font scale so it fits.
+    """
+
+    def __init__(self, org, font_scale, color, thickness=1, font=FONT):
+        self.org = org
+        self.font_scale = font_scale
+        self.color = color
+        self.thickness = thickness
+        self.font = font
+        self.text = None
+        self.max_width = None
+        self.visible = True
+        self.renders = 0
+        self._mask = None
+        self._patch = None       # Solid color the size of the mask
+        self._offset = (0, 0)    # Top-left of the mask relative to org
+
+    def update(self, text, force=False):
+        """Set the displayed text (None hides the sprite); returns True if it had to be re-rasterized"""
+        if text == self.text and not force:
+            return False
+        self.text = text
+        self._mask = self._patch = None
+        if text:
+            font_scale = self.font_scale
+            (width, height), baseline = cv2.getTextSize(text, self.font, font_scale, self.thickness)
+            if self.max_width and width > self.max_width:
+                font_scale *= self.max_width / width
+                (width, height), baseline = cv2.getTextSize(text, self.font, font_scale, self.thickness)
+            pad = 2 * self.thickness + 2
+            canvas = np.zeros((height + baseline + 2 * pad, width + 2 * pad), np.uint8)
+            cv2.putText(canvas, text, (pad, height + pad), self.font, font_scale, 255, self.thickness)
+            x, y, w, h = cv2.boundingRect(canvas)
+            if w and h:
+                self._mask = canvas[y:y + h, x:x + w].copy()
+                self._patch = np.empty((h, w, 3), np.uint8)
+                self._patch[:] = self.color
+                self._offset = (x - pad, y - height - pad)
+            self.renders += 1
+        return True
+
+    def bounds(self, shape):
+        """(top, bottom, left, right) of the glyphs clipped to a frame of this shape, or None"""
+        if self._mask is None or not self.visible:
+            return None
+        x0, y0 = self.org[0] + self._offset[0], self.org[1] + self._offset[1]
+        h, w = self._mask.shape
+        top, bottom = max(y0, 0), min(y0 + h, shape[0])
+        left, right = max(x0, 0), min(x0 + w, shape[1])
+        if right <= left or bottom <= top:
+            return None
+        return top, bottom, left, right
+
+    def draw(self, frame, mask=None):
+        """Paint the text onto frame (and into mask, if given)"""
+        bounds = self.bounds(frame.shape)
+        if bounds is None:
+            return
+        top, bottom, left, right = bounds
+        x0, y0 = self.org[0] + self._offset[0], self.org[1] + self._offset[1]
+        glyphs = self._mask[top - y0:bottom - y0, left - x0:right - x0]
+        cv2.copyTo(self._patch[top - y0:bottom - y0, left - x0:right - x0], glyphs, frame[top:bottom, left:right])
+        if mask is not None:
+            region = mask[top:bottom, left:right]
+            cv2.bitwise_or(region, glyphs, dst=region)
+
+
+class HudOverlay:
+    """Named TextSprites composed into one cached layer.
+
+    Only sprites whose text changed (and sprites overlapping them) are
+    repainted into the layer. draw() copies the layer into the frame with
+    one masked cv2.copyTo per band of rows the HUD covers, so a frame whose
+    texts did not change costs no text rasterization at all.
+
+    refresh_hz limits how often the caller re-formats fast-changing values
+    (FPS, CPU, EAR, ...): due() turns True at most that often, independent
+    of the video frame rate. 0 refreshes on every frame.
+    """
+
+    def __init__(self, refresh_hz=10.0):
+        self.sprites = {}
+        self.refresh_hz = refresh_hz
+        self._last_refresh = -math.inf
+        self._layer = None
+        self._mask = None
+        self._bands = []
+        self._stale = {}         # Sprite name -> box it covered in the layer before it changed
+        self._painted = {}       # Sprite name -> box it covers in the layer now
+
+    @property
+    def refresh_hz(self):
+        return self._refresh_hz
+
+    @refresh_hz.setter
+    def refresh_hz(self, value):
+        self._refresh_hz = value
+        self.refresh_interval = 1.0 / value if value and value > 0 else 0.0
+
+    def add(self, name, org, font_scale, color, thickness=1, text=None):
+        sprite = TextSprite(org, font_scale, color, thickness)
+        sprite.update(text)
+        self.sprites[name] = sprite
+        self._stale.setdefault(name, None)
+        return sprite
+
+    def set(self, name, text):
+        changed = self.sprites[name].update(text)
+        if changed:
+            self._stale.setdefault(name, self._painted.get(name))
+        return changed
+
+    def move(self, name, org):
+        sprite = self.sprites[name]
+        if sprite.org != org:
+            self._stale.setdefault(name, self._painted.get(name))
+            sprite.org = org
+
+    def show(self, name, visible=True):
+        """Hide or show a sprite without forgetting its text"""
+        sprite = self.sprites[name]
+        if sprite.visible != visible:
+            self._stale.setdefault(name, self._painted.get(name))
+            sprite.visible = visible
+
+    def fit(self, width, margin=10):
+        """Shrink the lines that would run past the right edge of frames this wide"""
+        for name, sprite in self.sprites.items():
+            max_width = max(width - sprite.org[0] - margin, 1)
+            if sprite.max_width != max_width:
+                sprite.max_width = max_width
+                self._stale.setdefault(name, self._painted.get(name))
+                sprite.update(sprite.text, force=True)
+
+    def due(self, now=None):
+        """True when the throttled values should be re-formatted now"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_refresh >= self.refresh_interval:
+            self._last_refresh = now
+            return True
+        return False
+
+    def invalidate(self):
+        """Make the next due() call return True (e.g. after a counter reset)"""
+        self._last_refresh = -math.inf
+
+    @property
+    def renders(self):
+        return sum(sprite.renders for sprite in self.sprites.values())
+
+    def _repaint(self, shape):
+        if self._layer is None or self._layer.shape != shape:
+            self._layer = np.zeros(shape, np.uint8)
+            self._mask = np.zeros(shape[:2], np.uint8)
+            self._painted = {}
+            self._stale = dict.fromkeys(self.sprites)
+        dirty = [box for box in self._stale.values() if box is not None]
+        for top, bottom, left, right in dirty:
+            self._layer[top:bottom, left:right] = 0
+            self._mask[top:bottom, left:right] = 0
+        # In drawing order, repaint changed sprites and every sprite touching a repainted area
+        for name, sprite in self.sprites.items():
+            box = self._painted.get(name)
+            if name not in self._stale and (box is None or not any(_overlaps(box, d) for d in dirty)):
+                continue
+            sprite.draw(self._layer, self._mask)
+            box = sprite.bounds(shape)
+            if box is None:
+                self._painted.pop(name, None)
+            else:
+                self._painted[name] = box
+                dirty.append(box)
+        self._stale = {}
+
+        # Merge the rows of nearby sprites so each band is copied with one call
+        bands = []
+        for top, bottom, _, _ in sorted(self._painted.values()):
+            if bands and top <= bands[-1][1] + BAND_GAP:
+                bands[-1][1] = max(bands[-1][1], bottom)
+            else:
+                bands.append([top, bottom])
+        self._bands = bands
+
+    def draw(self, frame):
+        if self._stale or self._layer is None or self._layer.shape != frame.shape:
+            self._repaint(frame.shape)
+        for top, bottom in self._bands:
+            cv2.copyTo(self._layer[top:bottom], self._mask[top:bottom], frame[top:bottom])
@@ -0,0 +1,252 @@
+"""On-disk cache of FaceMesh landmarks for recorded videos.
+
+An entry holds every landmark of every frame plus a face-present mask for
+one video, keyed by the SHA-256 of the video content and the FaceMesh
+settings. Landmarks are appended in fixed-size chunks while the video is
+processed and read back through a memory map one chunk at a time, so an
+entry never has to fit in RAM. The cache is capped in bytes; the least
+recently used entries are evicted first.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Optional: POSIX file locks for the shared hash index
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'drowsiness_detection', 'landmarks')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+CHUNK_FRAMES = 1024
+FORMAT_VERSION = 1
+
+LANDMARKS_FILE = 'landmarks.f32'
+PRESENT_FILE = 'present.u8'
+META_FILE = 'meta.json'
+HASH_INDEX = 'hashes.json'
+HASH_INDEX_LOCK = 'hashes.lock'
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file's content, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Hold an exclusive lock on path (a no-op where fcntl is missing)"""
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _current_stamp(stamp):
+    """True if the file a hash index stamp names still exists with the same size and mtime"""
+    path, size, mtime_ns = stamp.rsplit('|', 2)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return f'{stat.st_size}|{stat.st_mtime_ns}' == f'{size}|{mtime_ns}'
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class LandmarkWriter:
+    """Append one frame's landmarks (or None) at a time; nothing is visible in the cache until commit()"""
+
+    def __init__(self, cache, key, landmark_count, fps, settings, chunk_frames=CHUNK_FRAMES):
+        self.cache = cache
+        self.key = key
+        self.fps = fps
+        self.settings = settings
+        self.landmark_count = landmark_count
+        self.frames = 0
+        self.path = os.path.join(cache.directory, f'{key}.{os.getpid()}.tmp')
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path)
+        self._landmarks_file = open(os.path.join(self.path, LANDMARKS_FILE), 'wb')
+        self._present_file = open(os.path.join(self.path, PRESENT_FILE), 'wb')
+        self._chunk = np.zeros((chunk_frames, landmark_count, 3), np.float32)
+        self._present = np.zeros(chunk_frames, np.uint8)
+        self._fill = 0
+
+    def append(self, landmarks):
+        """landmarks is a (landmark_count, 3) array, or None when no face was found"""
+        if landmarks is None:
+            self._chunk[self._fill] = 0.0
+            self._present[self._fill] = 0
+        else:
+            self._chunk[self._fill] = landmarks
+            self._present[self._fill] = 1
+        self._fill += 1
+        self.frames += 1
+        if self._fill == len(self._present):
+            self._flush()
+
+    def _flush(self):
+        self._landmarks_file.write(self._chunk[:self._fill].tobytes())
+        self._present_file.write(self._present[:self._fill].tobytes())
+        self._fill = 0
+
+    def commit(self):
+        """Publish the entry, then evict old entries if the cache is over its size cap"""
+        self._flush()
+        self._landmarks_file.close()
+        self._present_file.close()
+        _write_json(os.path.join(self.path, META_FILE), {
+            'version': FORMAT_VERSION, 'frames': self.frames, 'landmarks': self.landmark_count,
+            'fps': self.fps, 'settings': self.settings, 'created': time.time()})
+        final = os.path.join(self.cache.directory, self.key)
+        try:
+            os.replace(self.path, final)
+        except OSError:
+            # Another process cached the same video first
+            shutil.rmtree(self.path, ignore_errors=True)
+        self.cache.evict(keep=self.key)
+
+    def abort(self):
+        self._landmarks_file.close()
+        self._present_file.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class LandmarkReader:
+    """Memory-mapped view of one cache entry"""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.frames = meta['frames']
+        self.landmark_count = meta['landmarks']
+        self.fps = meta['fps']
+        if self.frames:
+            self.landmarks = np.memmap(os.path.join(path, LANDMARKS_FILE), np.float32, 'r',
+                                       shape=(self.frames, self.landmark_count, 3))
+            self.present = np.memmap(os.path.join(path, PRESENT_FILE), np.uint8, 'r', shape=(self.frames,))
+        else:
+            self.landmarks = np.zeros((0, self.landmark_count, 3), np.float32)
+            self.present = np.zeros(0, np.uint8)
+
+    def chunks(self, chunk_frames=CHUNK_FRAMES):
+        """Yield (first_frame, landmarks, present) views of at most chunk_frames frames"""
+        for start in range(0, self.frames, chunk_frames):
+            end = min(start + chunk_frames, self.frames)
+            yield start, self.landmarks[start:end], self.present[start:end].astype(bool)
+
+
+class LandmarkCache:
+    """Directory of landmark entries with a size-capped LRU policy (an entry's meta.json mtime is its last use)"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def content_hash(self, video_path):
+        """File content hash, remembered per (path, size, mtime) so unchanged videos are hashed once"""
+        stat = os.stat(video_path)
+        stamp = f'{os.path.realpath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}'
+        digest = (_read_json(os.path.join(self.directory, HASH_INDEX)) or {}).get(stamp)
+        if digest is None:
+            # Hash outside the lock; only the read-modify-write of the index is serialized
+            digest = file_digest(video_path)
+            with self._hash_index() as index:
+                index[stamp] = digest
+        return digest
+
+    @contextlib.contextmanager
+    def _hash_index(self):
+        """The hash index as a dict, locked against other processes and written back pruned"""
+        index_path = os.path.join(self.directory, HASH_INDEX)
+        with _locked(os.path.join(self.directory, HASH_INDEX_LOCK)):
+            index = _read_json(index_path) or {}
+            yield index
+            # Stamps of deleted or modified videos never match again
+            _write_json(index_path, {stamp: digest for stamp, digest in index.items() if _current_stamp(stamp)})
+
+    def key(self, video_path, settings):
+        """Cache key for a video processed with the given FaceMesh settings"""
+        settings_digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+        return f'{self.content_hash(video_path)[:32]}-{settings_digest[:16]}'
+
+    def open(self, key):
+        """Reader for a cached entry (and mark it as used), or None on a miss"""
+        path = os.path.join(self.directory, key)
+        meta_path = os.path.join(path, META_FILE)
+        meta = _read_json(meta_path)
+        if not meta or meta.get('version') != FORMAT_VERSION:
+            return None
+        os.utime(meta_path)
+        return LandmarkReader(path, meta)
+
+    def writer(self, key, landmark_count, fps, settings, chunk_frames=CHUNK_FRAMES):
+        return LandmarkWriter(self, key, landmark_count, fps, settings, chunk_frames)
+
+    def entries(self):
+        """(last_used, bytes, key) of every committed entry"""
+        entries = []
+        for key in os.listdir(self.directory):
+            path = os.path.join(self.directory, key)
+            meta_path = os.path.join(path, META_FILE)
+            if key.endswith('.tmp') or not os.path.isfile(meta_path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+                entries.append((os.path.getmtime(meta_path), size, key))
+            except OSError:
+                continue    # Evicted by another process meanwhile
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits max_bytes; returns the evicted keys"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            total -= size
+            evicted.append(key)
+        if evicted:
+            # Forget the hashes of videos that no longer have any entry
+            cached = {key.split('-')[0] for _, _, key in self.entries()}
+            with self._hash_index() as index:
+                for stamp in [stamp for stamp, digest in index.items() if digest[:32] not in cached]:
+                    del index[stamp]
+        return evicted
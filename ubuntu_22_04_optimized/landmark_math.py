@@ -0,0 +1,83 @@
+import numpy as np
+
+# Eye landmark indices (same points as the original EAR calculation)
+LEFT_EYE_POINTS = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE_POINTS = [362, 385, 387, 263, 373, 380]
+
+# Mouth landmarks used by the MAR calculation
+MAR_MOUTH_POINTS = [61, 84, 17, 314, 405, 320, 307, 375]
+
+# Every distance used by EAR/MAR as a (from, to) landmark pair:
+#   0-2: left eye  A, B (vertical) and C (horizontal)
+#   3-5: right eye A, B (vertical) and C (horizontal)
+#   6-9: mouth     A, B, C (vertical) and D (horizontal)
+PAIR_INDEX = np.array([
+    [160, 158, 33, 385, 387, 362, 84, 17, 314, 61],
+    [144, 153, 133, 380, 373, 263, 375, 307, 320, 405],
+], dtype=np.intp)
+
+# Weights that sum the numerator distances of each ratio, and the
+# denominator distance / scale of each ratio (EAR: 2*C, MAR: 3*D)
+RATIO_NUMERATOR = np.zeros((PAIR_INDEX.shape[1], 3))
+RATIO_NUMERATOR[[0, 1], 0] = 1.0
+RATIO_NUMERATOR[[3, 4], 1] = 1.0
+RATIO_NUMERATOR[[6, 7, 8], 2] = 1.0
+RATIO_DENOMINATOR = np.array([2, 5, 9], dtype=np.intp)
+RATIO_SCALE = np.array([2.0, 2.0, 3.0])
+
+# Unique landmarks needed for EAR/MAR and the pair table remapped onto them,
+# so a frame only has to read these points out of the protobuf list
+EAR_MAR_LANDMARKS = np.unique(PAIR_INDEX)
+SUBSET_PAIR_INDEX = np.searchsorted(EAR_MAR_LANDMARKS, PAIR_INDEX)
+_EAR_MAR_LANDMARK_LIST = EAR_MAR_LANDMARKS.tolist()
+
+
+def landmarks_to_array(landmarks, indices=None):
+    """Convert a MediaPipe landmark list into a contiguous float32 (N, 3) array.
+
+    indices optionally selects a subset of landmarks (in that order).
+    """
+    if indices is None:
+        indices = range(len(landmarks))
+    values = []
+    for i in indices:
+        landmark = landmarks[i]
+        values += (landmark.x, landmark.y, landmark.z)
+    return np.array(values, dtype=np.float32).reshape(-1, 3)
+
+
+def compute_aspect_ratios(points, pair_index=PAIR_INDEX):
+    """Compute [left EAR, right EAR, MAR] with one gather and one distance op.
+
+    points is a (..., N, 3) or (..., N, 2) array, so a single frame or a whole
+    time series can be processed at once. Returns a (..., 3) float64 array.
+    """
+    diff = points[..., pair_index[0], :2] - points[..., pair_index[1], :2]
+    d = np.sqrt(np.square(diff, dtype=np.float64).sum(axis=-1))
+    return (d @ RATIO_NUMERATOR) / (d[..., RATIO_DENOMINATOR] * RATIO_SCALE)
+
+
+def compute_ear_mar(points, pair_index=PAIR_INDEX):
+    """Return (left_ear, right_ear, mar) arrays for a (..., N, 3) landmark array"""
+    ratios = compute_aspect_ratios(points, pair_index)
+    return ratios[..., 0], ratios[..., 1], ratios[..., 2]
+
+
+def ear_mar_points(landmarks, transform=None):
+    """Read only the EAR_MAR_LANDMARKS points out of a landmark list as a float32 (20, 3) array.
+
+    transform is an optional (scale, offset) pair mapping the landmark x/y
+    into full-frame normalized coordinates (see roi_tracking.crop_transform).
+    """
+    points = landmarks_to_array(landmarks, _EAR_MAR_LANDMARK_LIST)
+    if transform is not None:
+        scale, offset = transform
+        points[:, :2] = points[:, :2] * scale + offset
+    return points
+
+
+def extract_ear_mar(landmarks, transform=None):
+    """Per-frame helper: return (left_ear, right_ear, mar) floats for a landmark list"""
+    points = ear_mar_points(landmarks, transform)
+    left_ear, right_ear, mar = compute_aspect_ratios(points, SUBSET_PAIR_INDEX).tolist()
+    return left_ear, right_ear, mar
@@ -0,0 +1,329 @@
+"""Glass-to-alert latency harness: how long from the eyes closing to the alert going out, without a camera.
+
+Frames come from a face photo with scripted eye closures (--image) or from
+a recording (--source), released in real time like a camera and stamped
+with their injection time. Each frame is followed through capture, the
+pipeline queue, face_mesh.process, the blink/drowsiness state update and
+the JSON alert output, and the latency distribution of every stage is
+reported. With --slo-ms the exit code says whether the alert latency
+target holds, so runs can be tracked across releases (--compare).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+import drowsiness_detection_ubuntu as detection
+from benchmark_suite import peak_rss_mb, summarize
+from detection_events import BLINK, DROWSY_START
+from frame_pipeline import add_pipeline_arguments, create_pipeline
+from frame_source import REALTIME, FrameSource, open_source
+from landmark_math import compute_ear_mar, landmarks_to_array
+
+# FaceMesh eye contours, painted over to make a closed-eyes frame
+LEFT_EYE_CONTOUR = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
+RIGHT_EYE_CONTOUR = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
+
+FRAME_STAGES = ['capture', 'queue', 'face_mesh', 'state_update', 'handoff', 'total']
+
+
+def face_ratios(image, face_mesh):
+    """(landmarks, average EAR) of the face in a still image, or (None, None)"""
+    results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        return None, None
+    points = landmarks_to_array(results.multi_face_landmarks[0].landmark)
+    left_ear, right_ear, _ = compute_ear_mar(points)
+    return points, float(left_ear + right_ear) / 2.0
+
+
+def close_eyes(image):
+    """Paint both eyes over with the surrounding skin and draw a lid line; returns (closed frame, open EAR, closed EAR)"""
+    with mp.solutions.face_mesh.FaceMesh(static_image_mode=True, refine_landmarks=True) as face_mesh:
+        points, open_ear = face_ratios(image, face_mesh)
+        if points is None:
+            raise ValueError("no face found in the image")
+        height, width = image.shape[:2]
+        mask = np.zeros((height, width), np.uint8)
+        contours = []
+        for contour in (LEFT_EYE_CONTOUR, RIGHT_EYE_CONTOUR):
+            pixels = (points[contour, :2] * (width, height)).astype(np.int32)
+            contours.append(pixels)
+            cv2.fillPoly(mask, [cv2.convexHull(pixels)], 255)
+        closed = cv2.inpaint(image, cv2.dilate(mask, np.ones((7, 7), np.uint8)), 5, cv2.INPAINT_TELEA)
+        for pixels in contours:
+            # Contour points 0 and 8 are the eye corners
+            cv2.line(closed, tuple(map(int, pixels[0])), tuple(map(int, pixels[8])), (40, 40, 60), 2)
+        _, closed_ear = face_ratios(closed, face_mesh)
+    return closed, open_ear, closed_ear
+
+
+class ScriptedEyesSource(FrameSource):
+    """A face photo replayed in trials: eyes open for `lead` seconds, closed for `closure`, open for `tail`.
+
+    script is (trial, eyes_closed) of the frame read last.
+    """
+
+    def __init__(self, open_frame, closed_frame, trials=10, lead=3.0, closure=2.0, tail=1.5, fps=30.0,
+                 pacing=REALTIME):
+        super().__init__(fps, pacing)
+        self.frames = (open_frame, closed_frame)
+        self.trial_frames = round((lead + closure + tail) * self.fps)
+        self.closed_frames = (round(lead * self.fps), round((lead + closure) * self.fps))
+        self.count = trials * self.trial_frames
+        self.script = None
+        self._index = 0
+
+    def _grab(self, image):
+        if self._index >= self.count:
+            return None
+        trial, offset = divmod(self._index, self.trial_frames)
+        closed = self.closed_frames[0] <= offset < self.closed_frames[1]
+        # Shift by a few pixels like SyntheticSource, so the frames are never identical
+        frame = np.roll(self.frames[closed], (self._index % 8) - 4, axis=1)
+        position = self._index / self.fps
+        self._index += 1
+        self.script = (trial, closed)
+        return frame, position
+
+
+class StampedCapture:
+    """Capture wrapper recording, per frame timestamp, when the frame was injected and when read() returned it"""
+
+    def __init__(self, cap, records):
+        self.cap = cap
+        self.records = records
+
+    def read(self, *args):
+        ret, frame = self.cap.read(*args)
+        if ret:
+            trial, closed = getattr(self.cap, 'script', None) or (None, None)
+            self.records[self.cap.timestamp] = {'injected': self.cap.timestamp, 'captured': time.time(),
+                                                'trial': trial, 'closed': closed, 'events': []}
+        return ret, frame
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def run_harness(cap, args):
+    """Run the detector over the source; returns the per-frame records in injection order"""
+    records = {}
+    cap = StampedCapture(cap, records)
+    current = {'record': None, 'trial': None}
+
+    # Time face_mesh.process and the alert output of every frame
+    process = detection.face_mesh.process
+
+    def timed_process(image):
+        record = current['record']
+        record['face_mesh_start'] = time.time()
+        results = process(image)
+        record['face_mesh_end'] = time.time()
+        return results
+    detection.face_mesh.process = timed_process
+
+    sink = open(args.event_log or os.devnull, 'w')
+
+    def on_event(event):
+        emitted = time.time()
+        sink.write(json.dumps(event) + '\n')
+        sink.flush()
+        current['record']['events'].append((event['event'], emitted, time.time()))
+    detection.events.add_listener(on_event)
+
+    def process_frame(frame, timestamp):
+        record = records[timestamp]
+        record['process_start'] = time.time()
+        current['record'] = record
+        if record['trial'] != current['trial']:
+            # Every trial starts from a clean detector state
+            detection.reset_counters()
+            current['trial'] = record['trial']
+        result = detection.get_face_mesh(frame, annotate=not args.headless, timestamp=timestamp)
+        record['process_end'] = time.time()
+        return result
+
+    frames = create_pipeline(cap, process_frame, args.pipelined, args.queue_size, args.drop_policy,
+                             with_timestamp=True)
+    try:
+        for item in frames:
+            records[item.capture_time]['delivered'] = time.time()
+    finally:
+        frames.stop()
+        cap.release()
+        detection.events.remove_listener(on_event)
+        detection.face_mesh.process = process
+        sink.close()
+    return [records[key] for key in sorted(records)], getattr(frames, 'dropped_frames', 0)
+
+
+def analyze(records):
+    """Stage timings per frame, glass-to-alert per event and reaction times per scripted trial"""
+    stages = {stage: [] for stage in FRAME_STAGES}
+    glass_to_alert = {}
+    alert_output = []
+    onsets, reopens, trials, alerted = {}, {}, set(), set()
+    reactions = {DROWSY_START: [], BLINK: []}
+    for record in records:
+        if record['trial'] is not None:
+            trials.add(record['trial'])
+            if record['closed']:
+                onsets.setdefault(record['trial'], record['injected'])
+            elif record['trial'] in onsets:
+                reopens.setdefault(record['trial'], record['injected'])
+        # Events are written when the frame is processed, even if the frame is never displayed
+        for event, emitted, written in record['events']:
+            alert_output.append(written - emitted)
+            glass_to_alert.setdefault(event, []).append(written - record['injected'])
+            trial = record['trial']
+            if event == DROWSY_START and trial in onsets and trial not in alerted:
+                # Only the first alert after the eyes closed counts for a trial
+                alerted.add(trial)
+                reactions[DROWSY_START].append(written - onsets[trial])
+            elif event == BLINK and trial in reopens and record['injected'] >= reopens[trial]:
+                reactions[BLINK].append(written - reopens[trial])
+
+        if 'delivered' not in record:
+            continue    # Dropped by the pipeline: no display latency
+        stages['capture'].append(record['captured'] - record['injected'])
+        stages['queue'].append(record['process_start'] - record['captured'])
+        if 'face_mesh_start' in record:
+            stages['face_mesh'].append(record['face_mesh_end'] - record['process_start'])
+            stages['state_update'].append(record['process_end'] - record['face_mesh_end'])
+        else:
+            # Propagated frame: no inference, only tracking and the state update
+            stages['state_update'].append(record['process_end'] - record['process_start'])
+        stages['handoff'].append(record['delivered'] - record['process_end'])
+        stages['total'].append(record['delivered'] - record['injected'])
+
+    stages['alert_output'] = alert_output
+    return {
+        'stages': summarize(stages),
+        'glass_to_alert': summarize(glass_to_alert),
+        'reaction': summarize({name: values for name, values in reactions.items() if values}),
+        'trials': len(trials),
+        'missed_alerts': len(set(onsets) - alerted),
+    }
+
+
+def print_report(report, baseline=None):
+    def table(title, section, baseline_section):
+        if not section:
+            return
+        print(f"{title:<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}" +
+              (f"{'Δp99':>11}" if baseline_section is not None else ''))
+        for name, s in section.items():
+            line = f"{name:<16}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}"
+            if baseline_section and name in baseline_section and baseline_section[name]['p99_ms'] > 0:
+                old = baseline_section[name]['p99_ms']
+                line += f" {(s['p99_ms'] - old) / old * 100.0:>+9.1f}%"
+            print(line)
+
+    print(f"⏱️  {report['frames']} frames from {report['source']} ({report['mode']}), "
+          f"{report['dropped_frames']} dropped")
+    table('stage', report['stages'], baseline.get('stages', {}) if baseline else None)
+    table('glass-to-alert', report['glass_to_alert'], baseline.get('glass_to_alert', {}) if baseline else None)
+    if report['trials']:
+        table('reaction', report['reaction'], baseline.get('reaction', {}) if baseline else None)
+        print(f"   drowsy_start: eyes closing → alert written | blink: eyes reopening → blink written | "
+              f"{report['missed_alerts']}/{report['trials']} trials without an alert")
+
+
+def check_slo(report, slo_ms):
+    """The alert latency the SLO applies to: eyes closing → alert (scripted) or frame → alert (replay)"""
+    section = report['reaction'] if report['trials'] else report['glass_to_alert']
+    if DROWSY_START not in section:
+        return False, "no drowsiness alert was raised"
+    p99 = section[DROWSY_START]['p99_ms']
+    if report['missed_alerts']:
+        return False, f"{report['missed_alerts']} trial(s) without an alert"
+    if p99 > slo_ms:
+        return False, f"p99 {p99:.0f} ms > {slo_ms:.0f} ms"
+    return True, f"p99 {p99:.0f} ms <= {slo_ms:.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure glass-to-alert latency without a camera')
+    parser.add_argument('--image', help='Face photo: eyes are closed in scripted trials')
+    parser.add_argument('--source', help='Recording (or image directory) replayed in real time instead')
+    parser.add_argument('--trials', type=int, default=10, help='Scripted eye closures (default: 10)')
+    parser.add_argument('--lead', type=float, default=3.0, help='Seconds of open eyes before each closure (default: 3)')
+    parser.add_argument('--closure', type=float, default=2.0, help='Seconds the eyes stay closed (default: 2)')
+    parser.add_argument('--tail', type=float, default=1.5, help='Seconds of open eyes after each closure (default: 1.5)')
+    parser.add_argument('--fps', type=float, default=30.0, help='Injection frame rate for --image (default: 30)')
+    add_pipeline_arguments(parser)
+    parser.add_argument('--headless', action='store_true', help='Skip the annotated copy, as the detector does headless')
+    parser.add_argument('--adaptive-skip', action='store_true', help='Run with the adaptive inference scheduler')
+    parser.add_argument('--roi-tracking', action='store_true', help='Run with ROI-cropped inference')
+    parser.add_argument('--event-log', help='Write the alert JSON lines here (default: discarded)')
+    parser.add_argument('--slo-ms', type=float,
+                        help='Fail (exit 1) when the p99 alert latency exceeds this or a trial raised no alert')
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    args = parser.parse_args()
+
+    if args.image:
+        image = cv2.imread(args.image)
+        if image is None:
+            print(f"❌ Could not read {args.image}")
+            sys.exit(1)
+        closed, open_ear, closed_ear = close_eyes(image)
+        if closed_ear is None or closed_ear >= detection.EYE_AR_THRESH:
+            print(f"❌ Could not make a closed-eyes frame from {args.image} (EAR {closed_ear})")
+            sys.exit(1)
+        print(f"👁️  Scripted eyes: EAR {open_ear:.3f} open, {closed_ear:.3f} closed")
+        cap = ScriptedEyesSource(image, closed, args.trials, args.lead, args.closure, args.tail, args.fps)
+        label = f"{args.image} x{args.trials} trials"
+    elif args.source:
+        cap = open_source(args.source, REALTIME)
+        if not cap.isOpened():
+            print(f"❌ Could not open {args.source}")
+            sys.exit(1)
+        label = args.source
+    else:
+        print("❌ Give a face photo (--image) or a recording (--source)")
+        sys.exit(1)
+
+    detection.roi_tracker.enabled = args.roi_tracking
+    detection.frame_scheduler.enabled = args.adaptive_skip
+    detection.face_mesh.wait()
+    detection.reset_counters()
+
+    records, dropped = run_harness(cap, args)
+    mode = 'pipelined' if args.pipelined else 'sequential'
+    mode += ', headless' if args.headless else ''
+    mode += ', adaptive skip' if args.adaptive_skip else ''
+    mode += ', ROI' if args.roi_tracking else ''
+    report = dict(analyze(records), source=label, mode=mode, frames=len(records), dropped_frames=dropped,
+                  peak_rss_mb=peak_rss_mb(), timestamp=time.time(), environment={
+                      'python': platform.python_version(),
+                      'machine': platform.machine(),
+                      'opencv': cv2.__version__,
+                      'mediapipe': mp.__version__,
+                  })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+    if args.slo_ms is not None:
+        ok, detail = check_slo(report, args.slo_ms)
+        print(f"{'✅' if ok else '❌'} Alert latency SLO: {detail}")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
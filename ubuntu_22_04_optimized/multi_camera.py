@@ -0,0 +1,292 @@
+"""Watch several camera streams from one host: one detector process per stream"""
+import argparse
+import contextlib
+import multiprocessing
+import queue
+import sys
+import time
+from collections import namedtuple
+
+from detection_events import JsonLinesWriter
+from frame_source import PACING_MODES, UNTHROTTLED, open_source
+
+# Message kinds sent from a worker to the supervisor: (kind, stream_id, payload)
+STATS = 'stats'
+EVENT = 'event'
+DONE = 'done'
+
+END_OF_STREAM = 'end of stream'
+
+# Supervisor-side view of one stream
+StreamHealth = namedtuple('StreamHealth', [
+    'stream', 'source', 'status', 'fps', 'busy_ms', 'frames', 'face_ratio',
+    'blinks', 'yawns', 'drowsy', 'events', 'restarts', 'last_seen', 'reason'])
+
+
+def _stream_worker(stream_id, source, out_queue, stop_event, options):
+    """Run the detector on one stream; only compact stats and event records leave the process"""
+    import cv2
+    cv2.setNumThreads(1)
+    # Every worker process imports its own copy: own FaceMesh, counters and trackers
+    import drowsiness_detection_ubuntu as detection
+    # The model loads in the background while the source is opened
+    detection.face_mesh.start()
+    detection.roi_tracker.enabled = options.get('roi_tracking', False)
+    detection.frame_scheduler.enabled = options.get('adaptive_skip', False)
+    detection.events.add_listener(lambda record: out_queue.put((EVENT, stream_id, record)))
+    report_interval = options.get('report_interval', 1.0)
+
+    reason = END_OF_STREAM
+    cap = open_source(source, options.get('pacing', UNTHROTTLED), loop=options.get('loop', False))
+    if not cap.isOpened():
+        out_queue.put((DONE, stream_id, 'could not open source'))
+        return
+    detection.face_mesh.wait()
+
+    frames = face_frames = window_frames = 0
+    busy = total_busy = 0.0
+    ear = mar = 0.0
+    blinks = yawns = 0
+    drowsy = False
+    started = last_report = time.time()
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                if cap.live:
+                    # A camera or stream that stops delivering has failed; only recordings end
+                    reason = 'camera read failed'
+                break
+            start = time.perf_counter()
+            _, ear, blinks, mar, yawns, drowsy = detection.get_face_mesh(frame, annotate=False,
+                                                                         timestamp=cap.timestamp)
+            elapsed = time.perf_counter() - start
+            busy += elapsed
+            total_busy += elapsed
+            frames += 1
+            window_frames += 1
+            face_frames += ear > 0
+
+            now = time.time()
+            if now - last_report >= report_interval:
+                out_queue.put((STATS, stream_id, {
+                    'timestamp': now,
+                    'frames': frames,
+                    'face_frames': face_frames,
+                    'fps': window_frames / (now - last_report),
+                    'busy_ms': busy * 1000.0 / window_frames,
+                    'ear': ear,
+                    'mar': mar,
+                    'blinks': detection.blink_counter,
+                    'yawns': detection.yawn_counter,
+                    'drowsy': drowsy,
+                }))
+                window_frames = 0
+                busy = 0.0
+                last_report = now
+    except Exception as e:
+        reason = f'{type(e).__name__}: {e}'
+    finally:
+        cap.release()
+        detection.face_mesh.close()
+        # Final record: averages over the whole run
+        now = time.time()
+        out_queue.put((STATS, stream_id, {
+            'timestamp': now, 'frames': frames, 'face_frames': face_frames,
+            'fps': frames / (now - started) if now > started else 0.0,
+            'busy_ms': total_busy * 1000.0 / frames if frames else 0.0, 'ear': ear, 'mar': mar,
+            'blinks': detection.blink_counter, 'yawns': detection.yawn_counter, 'drowsy': drowsy,
+        }))
+        out_queue.put((DONE, stream_id, reason))
+
+
+class CameraSupervisor:
+    """Start one detector process per stream and collect their stats and events.
+
+    A stream that sends nothing for stale_after seconds is reported as stale.
+    With restart enabled, a stream that fails (anything but the end of a
+    video file) is started again, up to max_restarts times.
+    """
+
+    def __init__(self, sources, report_interval=1.0, stale_after=10.0, restart=False, max_restarts=3,
+                 roi_tracking=False, adaptive_skip=False, on_event=None, pacing=UNTHROTTLED, loop=False):
+        self.sources = list(sources)
+        self.stale_after = stale_after
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.on_event = on_event
+        self.options = {'report_interval': report_interval, 'roi_tracking': roi_tracking,
+                        'adaptive_skip': adaptive_skip, 'pacing': pacing, 'loop': loop}
+        # spawn: MediaPipe graphs must not be inherited through fork
+        self._context = multiprocessing.get_context('spawn')
+        self._queue = self._context.Queue()
+        self._stop_event = self._context.Event()
+        self._processes = {}
+        self._stats = {}
+        self._state = {}
+
+    def start(self):
+        for stream_id, source in enumerate(self.sources):
+            self._state[stream_id] = {'status': 'starting', 'restarts': 0, 'events': 0,
+                                      'last_seen': time.time(), 'reason': ''}
+            self._stats[stream_id] = {}
+            self._spawn(stream_id)
+        return self
+
+    def _spawn(self, stream_id):
+        process = self._context.Process(
+            target=_stream_worker, name=f'camera-{stream_id}',
+            args=(stream_id, self.sources[stream_id], self._queue, self._stop_event, self.options),
+            daemon=True)
+        process.start()
+        self._processes[stream_id] = process
+
+    @property
+    def running(self):
+        return any(state['status'] in ('starting', 'running', 'stale') for state in self._state.values())
+
+    def poll(self, timeout=0.5):
+        """Handle every message waiting from the workers, blocking up to timeout for the first one"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                kind, stream_id, payload = self._queue.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            self._handle(kind, stream_id, payload)
+        self._check_processes()
+
+    def _handle(self, kind, stream_id, payload):
+        state = self._state[stream_id]
+        state['last_seen'] = time.time()
+        if kind == STATS:
+            self._stats[stream_id] = payload
+            if state['status'] in ('starting', 'stale'):
+                state['status'] = 'running'
+        elif kind == EVENT:
+            state['events'] += 1
+            if self.on_event is not None:
+                self.on_event(dict(payload, stream=stream_id, source=str(self.sources[stream_id])))
+        elif kind == DONE:
+            state['reason'] = payload
+            state['status'] = 'finished' if payload == END_OF_STREAM else 'failed'
+            self._processes[stream_id].join(1.0)
+            if state['status'] == 'failed' and self.restart and state['restarts'] < self.max_restarts \
+                    and not self._stop_event.is_set():
+                state['restarts'] += 1
+                state['status'] = 'starting'
+                self._spawn(stream_id)
+
+    def _check_processes(self):
+        now = time.time()
+        for stream_id, state in self._state.items():
+            if state['status'] not in ('starting', 'running', 'stale'):
+                continue
+            process = self._processes[stream_id]
+            if not process.is_alive() and self._queue.empty():
+                # Killed without a DONE message (e.g. a crash inside a native library)
+                self._handle(DONE, stream_id, f'worker exited with code {process.exitcode}')
+            elif now - state['last_seen'] > self.stale_after:
+                state['status'] = 'stale'
+
+    def health(self):
+        """Return a StreamHealth row per stream"""
+        rows = []
+        for stream_id, source in enumerate(self.sources):
+            state, stats = self._state[stream_id], self._stats[stream_id]
+            frames = stats.get('frames', 0)
+            rows.append(StreamHealth(
+                stream_id, str(source), state['status'], stats.get('fps', 0.0), stats.get('busy_ms', 0.0),
+                frames, stats.get('face_frames', 0) / frames if frames else 0.0,
+                stats.get('blinks', 0), stats.get('yawns', 0), stats.get('drowsy', False),
+                state['events'], state['restarts'], state['last_seen'], state['reason']))
+        return rows
+
+    def stop(self, timeout=3.0):
+        self._stop_event.set()
+        deadline = time.time() + timeout
+        while any(p.is_alive() for p in self._processes.values()) and time.time() < deadline:
+            # Keep draining so workers blocked on a full queue can exit
+            self.poll(0.1)
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+            process.join(1.0)
+
+
+def print_health(rows):
+    print(f"{'#':<3}{'source':<24}{'status':<10}{'fps':>7}{'busy ms':>9}{'frames':>8}{'face':>6}"
+          f"{'blinks':>8}{'yawns':>7}{'drowsy':>8}{'restarts':>10}")
+    for row in rows:
+        print(f"{row.stream:<3}{row.source[-23:]:<24}{row.status:<10}{row.fps:>7.1f}{row.busy_ms:>9.1f}"
+              f"{row.frames:>8}{row.face_ratio:>6.0%}{row.blinks:>8}{row.yawns:>7}"
+              f"{('YES' if row.drowsy else 'no'):>8}{row.restarts:>10}")
+        if row.status == 'failed':
+            print(f"   ❌ {row.reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run drowsiness detection on several camera streams')
+    parser.add_argument('sources', nargs='+',
+                        help='Camera indices, device paths, video files, stream URLs, image directories or synthetic')
+    parser.add_argument('--pacing', choices=PACING_MODES, default=UNTHROTTLED,
+                        help='Recorded/synthetic sources: play at their FPS or as fast as possible (default: unthrottled)')
+    parser.add_argument('--loop', action='store_true', help='Restart recorded and synthetic sources at the end')
+    parser.add_argument('--report-interval', type=float, default=5.0,
+                        help='Seconds between health reports (default: 5)')
+    parser.add_argument('--stale-after', type=float, default=10.0,
+                        help='Mark a stream stale after this many seconds without data (default: 10)')
+    parser.add_argument('--restart', action='store_true', help='Restart streams whose worker failed')
+    parser.add_argument('--events', help='Append blink/yawn/drowsy events as JSON lines to this file ("-" for stdout)')
+    parser.add_argument('--roi-tracking', action='store_true',
+                        help='Run FaceMesh on a crop around the previous face position')
+    parser.add_argument('--adaptive-skip', action='store_true',
+                        help='Run FaceMesh every Nth frame and track eye/mouth landmarks in between')
+    args = parser.parse_args()
+
+    event_file = None
+    on_event = None
+    if args.events:
+        event_file = sys.stdout if args.events == '-' else open(args.events, 'a')
+        on_event = JsonLinesWriter(event_file)
+
+    if event_file is sys.stdout:
+        # stdout carries only the event stream; health reports move to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            supervise(args, on_event)
+    else:
+        supervise(args, on_event)
+    if event_file is not None and event_file is not sys.stdout:
+        event_file.close()
+
+
+def supervise(args, on_event):
+    """Run the streams until they all end (or Ctrl+C), printing health reports"""
+    print(f"📹 Starting {len(args.sources)} stream worker(s)... (Ctrl+C to stop)")
+    supervisor = CameraSupervisor(args.sources, stale_after=args.stale_after, restart=args.restart,
+                                  roi_tracking=args.roi_tracking, adaptive_skip=args.adaptive_skip,
+                                  on_event=on_event, pacing=args.pacing, loop=args.loop).start()
+    start = time.time()
+    last_report = start
+    try:
+        while supervisor.running:
+            supervisor.poll(0.5)
+            if time.time() - last_report >= args.report_interval:
+                last_report = time.time()
+                print(f"📊 Health after {last_report - start:.0f}s")
+                print_health(supervisor.health())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+    rows = supervisor.health()
+    elapsed = time.time() - start
+    total_frames = sum(row.frames for row in rows)
+    print("📊 Final report")
+    print_health(rows)
+    print(f"🚀 {total_frames} frames from {len(rows)} stream(s) in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed > 0 else 0:.1f} FPS overall)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Thermal/power governor: steps capture and inference quality down when the SoC runs hot, back up when it cools.
+
+Built for a Raspberry Pi on vehicle power: it reads the hottest thermal
+zone, CPU load and the firmware throttling flags, and moves between
+quality tiers with hysteresis (separate hot/cool thresholds, a hold time
+before each step and a minimum dwell per tier) so it does not oscillate.
+"""
+import json
+import threading
+from collections import namedtuple
+
+import cv2
+
+from system_stats import CURRENT_FLAGS, FREQUENCY_CAPPED, SOFT_TEMP_LIMIT, THROTTLED, UNDER_VOLTAGE, read_throttled
+
+# max_interval: run FaceMesh at least every Nth frame (landmarks are propagated in between)
+QualityTier = namedtuple('QualityTier', ['name', 'width', 'height', 'fps', 'refine_landmarks', 'max_interval'])
+
+TIERS = [
+    QualityTier('full', 640, 480, 30, True, 1),
+    QualityTier('balanced', 640, 480, 24, False, 2),
+    QualityTier('eco', 424, 240, 20, False, 3),
+    QualityTier('minimum', 320, 240, 15, False, 3),
+]
+
+TierChange = namedtuple('TierChange', ['timestamp', 'previous', 'tier', 'direction', 'reason', 'soc_temp', 'cpu_usage'])
+
+
+def inference_rate(tier):
+    """Lowest FaceMesh runs per second a tier allows"""
+    return tier.fps / tier.max_interval
+
+
+class PowerGovernor:
+    """Pick a QualityTier from SystemStats samples.
+
+    update() is cheap enough for every frame: it only does work when the
+    stats sampler has published a new sample, and returns the new tier when
+    it changes (None otherwise). Tiers whose inference rate would fall below
+    min_inference_fps are never used.
+    """
+
+    def __init__(self, tiers=TIERS, hot_temp=75.0, cool_temp=65.0, critical_temp=80.0,
+                 high_cpu=90.0, low_cpu=60.0, step_down_after=5.0, step_up_after=30.0, min_dwell=10.0,
+                 min_inference_fps=5.0, watch_throttling=True):
+        self.tiers = [tier for tier in tiers if inference_rate(tier) >= min_inference_fps] or list(tiers[:1])
+        self.hot_temp = hot_temp            # °C at which quality steps down
+        self.cool_temp = cool_temp          # °C below which it may step back up
+        self.critical_temp = critical_temp  # °C that drops straight to the lowest tier (Pi firmware throttles at 80-85)
+        self.high_cpu = high_cpu
+        self.low_cpu = low_cpu
+        self.step_down_after = step_down_after  # Seconds of pressure before stepping down
+        self.step_up_after = step_up_after      # Seconds of headroom before stepping up
+        self.min_dwell = min_dwell              # Seconds at a tier before the next non-critical change
+        self.watch_throttling = watch_throttling
+        self.index = 0
+        self.changes = []
+        self.listeners = []
+        self._last_sample = None
+        self._pressure_since = None
+        self._headroom_since = None
+        self._changed_at = None
+
+    @property
+    def tier(self):
+        return self.tiers[self.index]
+
+    def add_listener(self, callback):
+        """Register callback(TierChange), called on every tier change"""
+        self.listeners.append(callback)
+        return callback
+
+    def _flags(self):
+        if not self.watch_throttling:
+            return 0
+        flags = read_throttled()
+        if flags is None:
+            # Not a Raspberry Pi: stop looking
+            self.watch_throttling = False
+            return 0
+        # Only the live conditions: the sticky "has occurred" bits would block stepping up until reboot
+        return flags & CURRENT_FLAGS
+
+    def update(self, stats, now=None):
+        if stats.timestamp == self._last_sample or not stats.timestamp:
+            return None
+        self._last_sample = stats.timestamp
+        now = stats.timestamp if now is None else now
+        flags = self._flags()
+
+        reasons = []
+        if stats.soc_temp >= self.hot_temp:
+            reasons.append(f'SoC {stats.soc_temp:.0f}°C')
+        if stats.cpu_usage >= self.high_cpu:
+            reasons.append(f'CPU {stats.cpu_usage:.0f}%')
+        if flags & (THROTTLED | FREQUENCY_CAPPED | SOFT_TEMP_LIMIT):
+            reasons.append('firmware throttling')
+        if flags & UNDER_VOLTAGE:
+            reasons.append('under-voltage')
+        headroom = (not flags and stats.soc_temp <= self.cool_temp and stats.cpu_usage <= self.low_cpu)
+
+        self._pressure_since = (self._pressure_since or now) if reasons else None
+        self._headroom_since = (self._headroom_since or now) if headroom else None
+        settled = self._changed_at is None or now - self._changed_at >= self.min_dwell
+        lowest = len(self.tiers) - 1
+
+        if stats.soc_temp >= self.critical_temp and self.index < lowest:
+            return self._change(lowest, now, f'critical SoC {stats.soc_temp:.0f}°C', stats)
+        if reasons and self.index < lowest and settled and now - self._pressure_since >= self.step_down_after:
+            return self._change(self.index + 1, now, ', '.join(reasons), stats)
+        if headroom and self.index > 0 and settled and now - self._headroom_since >= self.step_up_after:
+            return self._change(self.index - 1, now,
+                                f'cooled to {stats.soc_temp:.0f}°C, CPU {stats.cpu_usage:.0f}%', stats)
+        return None
+
+    def _change(self, index, now, reason, stats):
+        direction = 'down' if index > self.index else 'up'
+        change = TierChange(now, self.tier.name, self.tiers[index].name, direction, reason,
+                            stats.soc_temp, stats.cpu_usage)
+        self.index = index
+        self._changed_at = now
+        self._pressure_since = self._headroom_since = None
+        self.changes.append(change)
+        for callback in self.listeners:
+            callback(change)
+        return self.tier
+
+
+class TierLog:
+    """Tier change listener writing one JSON object per change to a file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, change):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(change._asdict()) + '\n')
+
+
+class GovernedCapture:
+    """Capture wrapper that applies a tier's resolution and FPS on the thread that reads frames.
+
+    request() may be called from any thread; the cap.set() calls run just
+    before the next read(), so they never race the capture thread.
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def request(self, tier):
+        with self._lock:
+            self._pending = tier
+
+    def read(self, *args):
+        if self._pending is not None:
+            with self._lock:
+                tier, self._pending = self._pending, None
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, tier.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, tier.height)
+            self.cap.set(cv2.CAP_PROP_FPS, tier.fps)
+        return self.cap.read(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def describe(tier):
+    detail = 'refined' if tier.refine_landmarks else '468 landmarks'
+    cadence = f', FaceMesh every ≤{tier.max_interval} frames' if tier.max_interval > 1 else ''
+    return f"{tier.name} ({tier.width}x{tier.height}@{tier.fps}, {detail}{cadence})"
+
+
+def print_change(change):
+    """Tier change listener printing one status line"""
+    arrow = '⬇️' if change.direction == 'down' else '⬆️'
+    print(f"🌡️  {arrow} Quality {change.previous} → {change.tier}: {change.reason}")
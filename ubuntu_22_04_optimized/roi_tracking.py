@@ -0,0 +1,109 @@
+import numpy as np
+
+from landmark_math import landmarks_to_array
+
+# Face outline landmarks, enough to bound the whole face (the points of
+# mp.solutions.face_mesh.FACEMESH_FACE_OVAL, listed so MediaPipe is not imported here)
+FACE_OVAL_POINTS = [10, 21, 54, 58, 67, 93, 103, 109, 127, 132, 136, 148, 149, 150, 152, 162, 172, 176,
+                    234, 251, 284, 288, 297, 323, 332, 338, 356, 361, 365, 377, 378, 379, 389, 397, 400, 454]
+
+
+def crop_transform(roi, frame_shape):
+    """Return (scale, offset) mapping crop-normalized x/y to full-frame normalized x/y"""
+    height, width = frame_shape[:2]
+    x0, y0, x1, y1 = roi
+    scale = np.array([(x1 - x0) / width, (y1 - y0) / height], dtype=np.float32)
+    offset = np.array([x0 / width, y0 / height], dtype=np.float32)
+    return scale, offset
+
+
+def map_points(points, roi, frame_shape):
+    """Map a (..., N, 3) crop-normalized landmark array to full-frame coordinates (returns a copy)"""
+    if roi is None:
+        return points
+    scale, offset = crop_transform(roi, frame_shape)
+    mapped = np.array(points, dtype=np.float32)
+    mapped[..., :2] = mapped[..., :2] * scale + offset
+    mapped[..., 2] *= scale[0]
+    return mapped
+
+
+class FaceRoiTracker:
+    """Crop inference to a padded region around the face found in the previous frame.
+
+    Only the crop is colour-converted and sent to FaceMesh. The landmarks
+    FaceMesh returns are then normalized to the crop: draw them onto the
+    crop view of the frame and pass crop_transform() to the EAR/MAR code,
+    which gives the same values as full-frame mode without rewriting all
+    478 protobuf landmarks. When the face is lost the next frame falls back
+    to the full image.
+
+    The crop is only re-centred when the face drifts out of its inner area,
+    which keeps the coordinate frame stable for FaceMesh's own tracking.
+    Switching to a new crop invalidates that tracking for one frame, so a
+    crop is kept for max_misses frames without a face (letting FaceMesh
+    re-detect inside it) before falling back to the full frame.
+    """
+
+    def __init__(self, padding=0.5, min_size=128, recenter_margin=0.15, max_misses=2, enabled=False):
+        self.padding = padding                  # Extra border around the face box, relative to its size
+        self.min_size = min_size                # Smallest crop side in pixels
+        self.recenter_margin = recenter_margin  # Face may drift this close (relative) to the crop edge
+        self.max_misses = max_misses            # Frames without a face before using the full frame again
+        self.enabled = enabled
+        self.roi = None                         # (x0, y0, x1, y1) in full-frame pixels
+        self.misses = 0
+
+    def reset(self):
+        self.roi = None
+        self.misses = 0
+
+    def crop_region(self, frame_shape):
+        """Return the (x0, y0, x1, y1) crop for the next inference, or None for the full frame"""
+        if not self.enabled or self.roi is None:
+            return None
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = self.roi
+        # A crop covering (nearly) the whole frame saves nothing
+        if (x1 - x0) * (y1 - y0) >= 0.9 * width * height:
+            return None
+        return self.roi
+
+    def update(self, results, roi, frame_shape):
+        """Choose the next crop from the results of an inference on roi (None = full frame)"""
+        if not self.enabled:
+            return
+        if not results.multi_face_landmarks:
+            if roi is not None and self.misses < self.max_misses:
+                self.misses += 1
+            else:
+                self.roi = None
+                self.misses = 0
+            return
+        self.misses = 0
+
+        height, width = frame_shape[:2]
+        outline = landmarks_to_array(results.multi_face_landmarks[0].landmark, FACE_OVAL_POINTS)
+        points = map_points(outline, roi, frame_shape)[:, :2] * (width, height)
+        bx0, by0 = points.min(axis=0)
+        bx1, by1 = points.max(axis=0)
+
+        if self.roi is not None and self._inside(self.roi, (bx0, by0, bx1, by1)):
+            return
+        self.roi = self._padded_box(bx0, by0, bx1, by1, width, height)
+
+    def _inside(self, roi, box):
+        """True when the face box still sits inside the inner area of the current crop"""
+        x0, y0, x1, y1 = roi
+        mx = (x1 - x0) * self.recenter_margin
+        my = (y1 - y0) * self.recenter_margin
+        bx0, by0, bx1, by1 = box
+        return bx0 >= x0 + mx and by0 >= y0 + my and bx1 <= x1 - mx and by1 <= y1 - my
+
+    def _padded_box(self, bx0, by0, bx1, by1, width, height):
+        side = max(bx1 - bx0, by1 - by0) * (1.0 + 2.0 * self.padding)
+        side = int(min(max(side, self.min_size), width, height))
+        cx, cy = (bx0 + bx1) / 2.0, (by0 + by1) / 2.0
+        x0 = int(np.clip(cx - side / 2.0, 0, width - side))
+        y0 = int(np.clip(cy - side / 2.0, 0, height - side))
+        return (x0, y0, x0 + side, y0 + side)
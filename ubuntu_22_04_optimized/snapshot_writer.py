@@ -0,0 +1,102 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from buffer_pool import BufferRing
+from hot_path_metrics import metrics
+
+SNAPSHOT_FORMATS = ['jpg', 'png']
+
+
+class SnapshotWriter:
+    """Encode and write snapshots on a background thread.
+
+    save() copies the frame into a reused buffer and returns immediately.
+    When the bounded queue is full the snapshot is dropped and counted
+    instead of stalling the frame loop. auto_capture() is the rate-limited
+    variant used for evidence frames when the drowsiness alert goes off.
+    """
+
+    def __init__(self, directory='.', image_format='jpg', jpeg_quality=90, png_compression=3,
+                 max_queue=8, auto_interval=10.0):
+        if image_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown snapshot format: {image_format}")
+        self.directory = directory
+        self.image_format = image_format
+        if image_format == 'jpg':
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+        else:
+            self.params = [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+        self.auto_interval = auto_interval    # Minimum seconds between automatic captures
+        self.last_auto = None
+        self.saved = 0
+        self.dropped = 0
+        self.failed = 0
+        self.write_time = 0.0                 # Total seconds spent encoding and writing
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        # Every queued frame plus the one being encoded needs its own buffer
+        self._buffers = BufferRing(max(1, max_queue) + 2)
+        self._thread = threading.Thread(target=self._run, name='snapshots', daemon=True)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread.start()
+        return self
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def save(self, image, prefix='ubuntu_capture'):
+        """Queue a copy of image; returns the file name, or None when the queue was full"""
+        now = time.time()
+        filename = os.path.join(self.directory, f'{prefix}_{int(now)}_{int(now * 1000) % 1000:03d}.{self.image_format}')
+        # Only this thread adds items, so a queue that is not full now still has room below
+        if self._queue.full():
+            self.dropped += 1
+            metrics.inc('snapshots_dropped')
+            return None
+        buffer = self._buffers.acquire(image.shape, image.dtype)
+        np.copyto(buffer, image)
+        self._queue.put_nowait((filename, buffer))
+        metrics.set_gauge('snapshot_queue_depth', self._queue.qsize())
+        return filename
+
+    def auto_capture(self, image, prefix='drowsy'):
+        """save() unless an automatic capture happened less than auto_interval seconds ago"""
+        now = time.time()
+        if self.last_auto is not None and now - self.last_auto < self.auto_interval:
+            return None
+        self.last_auto = now
+        return self.save(image, prefix)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            filename, image = item
+            start = time.perf_counter()
+            try:
+                ok, encoded = cv2.imencode('.' + self.image_format, image, self.params)
+                if not ok:
+                    raise ValueError('encoding failed')
+                with open(filename, 'wb') as f:
+                    f.write(encoded.tobytes())
+                self.saved += 1
+                metrics.inc('snapshots_saved')
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Could not save {filename}: {e}")
+            self.write_time += time.perf_counter() - start
+            metrics.set_gauge('snapshot_queue_depth', self._queue.qsize())
+
+    def stop(self, timeout=5.0):
+        """Finish the queued snapshots, then stop the thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
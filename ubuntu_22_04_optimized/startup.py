@@ -0,0 +1,152 @@
+"""Startup helpers: background MediaPipe loading and time-to-first-metrics reporting"""
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from hot_path_metrics import metrics
+
+
+class BackgroundFaceMesh:
+    """FaceMesh that imports MediaPipe, builds the graph and runs a warm-up frame on a background thread.
+
+    start() returns at once so camera discovery and open can run meanwhile;
+    process() waits for the model (starting it if nobody did). Importing
+    this module does not import MediaPipe.
+    """
+
+    def __init__(self, warmup_shape=(480, 640, 3), **options):
+        self.options = options
+        self.warmup_shape = warmup_shape
+        self.solutions = None           # mediapipe.solutions once loaded
+        self.timings = {}               # import / init / warmup seconds
+        self.ready_time = None          # time.time() when the model became usable
+        self._model = None
+        self._retired = []              # Models replaced by reconfigure(), closed on the next process()
+        self._error = None
+        self._drawing_spec = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='face-mesh-loader', daemon=True)
+                self._thread.start()
+        return self
+
+    def _build(self, options):
+        import mediapipe as mp
+        model = mp.solutions.face_mesh.FaceMesh(**options)
+        built = time.perf_counter()
+        # The first process() call sets up the TFLite delegates; pay for it here, not on frame one
+        model.process(np.zeros(self.warmup_shape, np.uint8))
+        model.reset()
+        return model, built
+
+    def _load(self):
+        try:
+            start = time.perf_counter()
+            import mediapipe as mp
+            imported = time.perf_counter()
+            model, built = self._build(self.options)
+            warmed = time.perf_counter()
+            self.timings = {'import': imported - start, 'init': built - imported, 'warmup': warmed - built}
+            self.solutions = mp.solutions
+            self._model = model
+            self.ready_time = time.time()
+        except Exception as e:
+            self._error = e
+
+    def reconfigure(self, **options):
+        """Rebuild the model with changed options in the background; process() keeps using the old one meanwhile"""
+        options = dict(self.options, **options)
+        if options == self.options:
+            return False
+        self.options = options
+        threading.Thread(target=self._rebuild, args=(options,), name='face-mesh-rebuild', daemon=True).start()
+        return True
+
+    def _rebuild(self, options):
+        self.wait()
+        model, _ = self._build(options)
+        with self._lock:
+            if self.options is not options:
+                # Reconfigured again meanwhile; the newer rebuild wins
+                model.close()
+                return
+            self._retired.append(self._model)
+            self._model = model
+
+    @property
+    def ready(self):
+        return self._model is not None
+
+    def wait(self, timeout=None):
+        """Block until the model is loaded and return it"""
+        self.start()
+        self._thread.join(timeout)
+        if self._error is not None:
+            raise self._error
+        if self._model is None:
+            raise TimeoutError("FaceMesh did not load in time")
+        return self._model
+
+    def process(self, image):
+        if self._retired:
+            # Not in use any more: process() is only ever called from one thread
+            with self._lock:
+                retired, self._retired = self._retired, []
+            for model in retired:
+                model.close()
+        model = self._model if self._model is not None else self.wait()
+        return model.process(image)
+
+    def reset(self):
+        if self._model is not None:
+            self._model.reset()
+
+    def close(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for model in retired:
+            model.close()
+        if self._model is not None:
+            self._model.close()
+
+    def draw_landmarks(self, image, face_landmarks, thickness=1, circle_radius=1):
+        """Draw the face contours with MediaPipe's drawing utils"""
+        drawing = self.solutions.drawing_utils
+        if self._drawing_spec is None:
+            self._drawing_spec = drawing.DrawingSpec(thickness=thickness, circle_radius=circle_radius)
+        drawing.draw_landmarks(
+            image=image,
+            landmark_list=face_landmarks,
+            connections=self.solutions.face_mesh.FACEMESH_CONTOURS,
+            landmark_drawing_spec=self._drawing_spec,
+            connection_drawing_spec=self._drawing_spec)
+
+
+class StartupTimer:
+    """Seconds from process start to each startup milestone (first mark wins)"""
+
+    def __init__(self):
+        self.origin = psutil.Process().create_time()
+        self.marks = {}
+
+    def mark(self, name, when=None):
+        if name not in self.marks:
+            self.marks[name] = (time.time() if when is None else when) - self.origin
+            metrics.set_gauge(f'startup_{name}_seconds', self.marks[name])
+
+    def report(self, model=None):
+        labels = [('imports', 'imports'), ('camera_open', 'camera open'), ('model_ready', 'model ready'),
+                  ('first_frame', 'first frame'), ('first_metrics', 'first metrics')]
+        reached = sorted((self.marks[name], label) for name, label in labels if name in self.marks)
+        parts = [f"{label} {seconds:.2f}s" for seconds, label in reached]
+        print("⏱️  Startup: " + " | ".join(parts))
+        if model is not None and model.timings:
+            t = model.timings
+            print(f"   Model (background): import {t['import']:.2f}s, init {t['init']:.2f}s, "
+                  f"warm-up {t['warmup']:.2f}s")
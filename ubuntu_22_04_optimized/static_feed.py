@@ -0,0 +1,107 @@
+"""Streaming static-feed detection: tells a virtual camera showing a still image from a live camera"""
+import math
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+FeedAnalysis = namedtuple('FeedAnalysis', ['is_static', 'similarity', 'similarities', 'frames', 'sample_frame'])
+
+MAX_SQUARED_DIFF = 255 ** 2
+
+
+class StaticFeedDetector:
+    """Compare each frame with the previous one on a small uint8 grayscale copy.
+
+    Only the previous small frame is kept. Similarity is 1 - MSE / 255^2, as
+    before, but the squared differences are summed by cv2.norm on the uint8
+    pixels. update() returns True/False once the mean similarity is more
+    than `z` standard errors above/below the threshold (a frozen image
+    decides after min_pairs), None while it is still unclear.
+    """
+
+    def __init__(self, similarity_threshold=0.98, size=(80, 60), min_pairs=4, z=3.0):
+        self.similarity_threshold = similarity_threshold
+        self.size = size
+        self.min_pairs = min_pairs
+        self.z = z
+        self._small = np.empty((size[1], size[0], 3), np.uint8)
+        self._reference = np.empty((size[1], size[0]), np.uint8)
+        self._current = np.empty_like(self._reference)
+        self.reset()
+
+    def reset(self):
+        self.has_reference = False
+        self.similarities = []
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0    # Welford running sum of squared deviations
+
+    def _shrink(self, frame, out):
+        if frame.ndim == 2:
+            cv2.resize(frame, self.size, dst=out, interpolation=cv2.INTER_AREA)
+        else:
+            cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=out)
+
+    def update(self, frame):
+        """Add one frame; returns the decision (True = static) or None"""
+        self._shrink(frame, self._current)
+        if not self.has_reference:
+            self._reference, self._current = self._current, self._reference
+            self.has_reference = True
+            return None
+        squared = cv2.norm(self._current, self._reference, cv2.NORM_L2SQR)
+        self._reference, self._current = self._current, self._reference
+        similarity = 1.0 - squared / (self._reference.size * MAX_SQUARED_DIFF)
+        self.similarities.append(similarity)
+
+        self.count += 1
+        delta = similarity - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (similarity - self.mean)
+        return self.decision()
+
+    @property
+    def stderr(self):
+        if self.count < 2:
+            return math.inf
+        return math.sqrt(self._m2 / (self.count - 1) / self.count)
+
+    def decision(self):
+        if self.count < self.min_pairs:
+            return None
+        margin = self.z * self.stderr
+        if self.mean - margin > self.similarity_threshold:
+            return True
+        if self.mean + margin < self.similarity_threshold:
+            return False
+        return None
+
+
+def analyze_feed(cap, similarity_threshold=0.98, max_frames=30, timeout=1.0, detector=None):
+    """Read frames from an open capture until the static/dynamic decision is clear.
+
+    Stops early once it is, otherwise after max_frames frames or timeout
+    seconds and decides on the mean similarity. Frames are read into one
+    reused buffer, so memory stays flat however long it runs.
+    """
+    detector = detector or StaticFeedDetector(similarity_threshold)
+    detector.reset()
+    frame = None
+    frames = 0
+    decision = None
+    start = time.time()
+    while frames < max_frames and time.time() - start < timeout:
+        ret, image = cap.read(frame)
+        if not ret or image is None:
+            continue
+        frame = image
+        frames += 1
+        decision = detector.update(frame)
+        if decision is not None:
+            break
+    if decision is None:
+        decision = detector.count > 0 and detector.mean > detector.similarity_threshold
+    return FeedAnalysis(decision, detector.mean, detector.similarities, frames, frame)
@@ -0,0 +1,146 @@
+import glob
+import shutil
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+import psutil
+
+# Immutable snapshot, replaced as a whole by the sampler thread so readers never need a lock
+SystemStats = namedtuple('SystemStats', ['cpu_usage', 'memory_usage', 'soc_temp', 'gpu_temp', 'timestamp'])
+EMPTY_STATS = SystemStats(0.0, 0.0, 0.0, 0, 0.0)
+
+THERMAL_ZONE_GLOB = '/sys/class/thermal/thermal_zone*/temp'
+# Raspberry Pi firmware flags, same bits as `vcgencmd get_throttled`
+THROTTLED_PATH = '/sys/devices/platform/soc/soc:firmware/get_throttled'
+UNDER_VOLTAGE = 0x1
+FREQUENCY_CAPPED = 0x2
+THROTTLED = 0x4
+SOFT_TEMP_LIMIT = 0x8
+CURRENT_FLAGS = 0xF     # Bits 16-19 repeat these as "has occurred since boot" and stay set until reboot
+
+
+def read_cpu_times():
+    """Return (idle, total) jiffies from /proc/stat, or None when unavailable"""
+    try:
+        with open('/proc/stat', 'r') as f:
+            fields = f.readline().split()
+    except OSError:
+        return None
+    # user nice system idle iowait irq softirq steal
+    values = [int(v) for v in fields[1:9]]
+    return values[3] + values[4], sum(values)
+
+
+def read_memory_usage():
+    """Return used memory in percent from /proc/meminfo (same formula as psutil)"""
+    info = {}
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                info[key] = int(value.split()[0])
+                if 'MemTotal' in info and 'MemAvailable' in info:
+                    break
+        return 100.0 * (info['MemTotal'] - info['MemAvailable']) / info['MemTotal']
+    except (OSError, KeyError, ValueError):
+        return psutil.virtual_memory().percent
+
+
+def read_soc_temp(zone_paths=None):
+    """Return the hottest thermal zone in °C (0.0 when no thermal zones are exposed)"""
+    if zone_paths is None:
+        zone_paths = glob.glob(THERMAL_ZONE_GLOB)
+    hottest = 0.0
+    for path in zone_paths:
+        try:
+            with open(path, 'r') as f:
+                hottest = max(hottest, int(f.read().strip()) / 1000.0)
+        except (OSError, ValueError):
+            continue
+    return hottest
+
+
+def read_throttled(path=THROTTLED_PATH):
+    """Return the Raspberry Pi throttling flags (hex in sysfs), or None on other hardware"""
+    try:
+        with open(path, 'r') as f:
+            return int(f.read().strip(), 16)
+    except (OSError, ValueError):
+        return None
+
+
+def read_gpu_temp():
+    """Return the NVIDIA GPU temperature in °C, or None when nvidia-smi fails"""
+    try:
+        output = subprocess.check_output(
+            ['nvidia-smi', '--query-gpu=temperature.gpu', '--format=csv,noheader,nounits'],
+            stderr=subprocess.DEVNULL, timeout=2)
+        return int(output.decode().strip().splitlines()[0])
+    except Exception:
+        return None
+
+
+class SystemStatsSampler:
+    """Background thread that refreshes CPU, RAM and temperature readings.
+
+    The hot loop reads sampler.snapshot, a SystemStats tuple that is swapped
+    in atomically, so reading it never blocks or takes a lock.
+    """
+
+    def __init__(self, interval=1.0, gpu=True):
+        self.interval = interval
+        self.snapshot = EMPTY_STATS
+        self._zone_paths = glob.glob(THERMAL_ZONE_GLOB)
+        # nvidia-smi is only tried when installed, and dropped after the first failure
+        self._gpu = gpu and shutil.which('nvidia-smi') is not None
+        self._last_cpu_times = read_cpu_times()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='system-stats', daemon=True)
+
+    def start(self):
+        if self._last_cpu_times is None:
+            psutil.cpu_percent(interval=None)  # Prime psutil's non-blocking counter
+        self.snapshot = self.sample()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(self.interval + 1.0)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.snapshot = self.sample()
+            except Exception:
+                pass
+
+    def _cpu_usage(self):
+        cpu_times = read_cpu_times()
+        if cpu_times is None or self._last_cpu_times is None:
+            return psutil.cpu_percent(interval=None)
+        idle_delta = cpu_times[0] - self._last_cpu_times[0]
+        total_delta = cpu_times[1] - self._last_cpu_times[1]
+        self._last_cpu_times = cpu_times
+        if total_delta <= 0:
+            return self.snapshot.cpu_usage
+        return 100.0 * (1.0 - idle_delta / total_delta)
+
+    def sample(self):
+        """Take one reading of every stat (runs on the sampler thread)"""
+        gpu_temp = 0
+        if self._gpu:
+            gpu_temp = read_gpu_temp()
+            if gpu_temp is None:
+                self._gpu = False
+                gpu_temp = 0
+        return SystemStats(
+            cpu_usage=self._cpu_usage(),
+            memory_usage=read_memory_usage(),
+            soc_temp=read_soc_temp(self._zone_paths),
+            gpu_temp=gpu_temp,
+            timestamp=time.time(),
+        )
@@ -0,0 +1,272 @@
+"""Sweep blink/yawn thresholds over recorded EAR/MAR series, every combination at once.
+
+Reproduces update_counters() without a per-frame loop: blinks and yawns
+are runs of closed-eye / open-mouth frames found with run-length
+operations, per-minute rates and PERCLOS are window counts found with
+searchsorted and cumulative sums. Sessions are spread across processes.
+
+Input is what batch_process.py writes (*.frames.npz / *.frames.parquet) or
+landmark cache entries (--landmark-cache), so FaceMesh never runs here.
+"""
+import argparse
+import glob
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+import drowsiness_detection_ubuntu as detection
+from batch_process import OUTPUT_FORMATS, output_names, pa, write_columns
+from drowsiness_window import DrowsinessWindow
+from landmark_cache import CACHE_DIR, LandmarkCache, LandmarkReader, META_FILE, _read_json
+from landmark_math import compute_aspect_ratios
+
+# Sliding window capacities used by DrowsinessWindow (oldest samples drop out when full)
+_DEFAULT_WINDOW = DrowsinessWindow()
+
+
+def parse_grid(text, cast=float):
+    """'0.2:0.3:0.01' (inclusive range) or '1,2,3' -> sorted array of values"""
+    if ':' in text:
+        start, stop, step = (float(v) for v in text.split(':'))
+        values = np.arange(start, stop + step / 2, step)
+    else:
+        values = [float(v) for v in text.split(',')]
+    return np.unique(np.round(np.asarray(values, dtype=np.float64), 6).astype(cast))
+
+
+def load_session(path):
+    """(timestamps, ear, mar) of the face frames of one recorded session"""
+    if os.path.isdir(path):
+        meta = _read_json(os.path.join(path, META_FILE))
+        reader = LandmarkReader(path, meta)
+        timestamps, ears, mars = [], [], []
+        for start, landmarks, present in reader.chunks():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratios = compute_aspect_ratios(landmarks[present])
+            timestamps.append((start + np.flatnonzero(present)) / reader.fps)
+            ears.append((ratios[:, 0] + ratios[:, 1]) / 2.0)
+            mars.append(ratios[:, 2])
+        if not timestamps:
+            return np.zeros(0), np.zeros(0), np.zeros(0)
+        return np.concatenate(timestamps), np.concatenate(ears), np.concatenate(mars)
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=['timestamp', 'face_present', 'ear', 'mar'])
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+    else:
+        with np.load(path) as data:
+            columns = {name: data[name] for name in ('timestamp', 'face_present', 'ear', 'mar')}
+    face = columns['face_present'].astype(bool)
+    return (columns['timestamp'][face].astype(np.float64), columns['ear'][face].astype(np.float64),
+            columns['mar'][face].astype(np.float64))
+
+
+def true_runs(mask):
+    """End index (exclusive) and length of every run of True in a 1-D bool array"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    starts, ends = edges[::2], edges[1::2]
+    return ends, ends - starts
+
+
+def window_counts(event_times, timestamps, window, capacity):
+    """Events in (t - window, t] at every timestamp, capped like a full SlidingWindow"""
+    counts = (np.searchsorted(event_times, timestamps, side='right')
+              - np.searchsorted(event_times, timestamps - window, side='right'))
+    return np.minimum(counts, capacity)
+
+
+def counter_events(values, timestamps, above, thresholds, min_frames):
+    """Blink (above=False) or yawn (above=True) events for every threshold/min-frames pair.
+
+    update_counters() counts a run of qualifying frames once the run ends on
+    a non-qualifying frame, if it lasted at least min_frames; a run still
+    open at the end of the session is not counted. Returns
+    {(threshold, frames): event times}.
+    """
+    events = {}
+    for threshold in thresholds:
+        mask = values > threshold if above else values < threshold
+        ends, lengths = true_runs(mask)
+        closed = ends < len(values)
+        ends, lengths = ends[closed], lengths[closed]
+        for frames in min_frames:
+            events[(threshold, frames)] = timestamps[ends[lengths >= frames]]
+    return events
+
+
+def perclos_flags(closed, timestamps, window, capacity, min_frames, perclos_thresh):
+    """PERCLOS alert condition at every frame (same window and capacity rules as SlidingWindow)"""
+    n = len(closed)
+    index = np.arange(n)
+    start = np.maximum(np.searchsorted(timestamps, timestamps - window, side='right'), index + 1 - capacity)
+    total = np.concatenate(([0], np.cumsum(closed)))
+    size = index + 1 - start
+    perclos = (total[index + 1] - total[start]) / size
+    return (size >= min_frames) & (perclos > perclos_thresh)
+
+
+def alert_intervals(drowsy, timestamps):
+    """(row, start time, end time) of every alert in a (rows, frames) bool array"""
+    edges = np.diff(drowsy.astype(np.int8), axis=1, prepend=0, append=0)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    last = len(timestamps) - 1
+    end_times = timestamps[np.minimum(ends, last)]
+    return rows, timestamps[starts], end_times
+
+
+def sweep_session(timestamps, ear, mar, grid, options):
+    """Evaluate every grid combination on one session; returns (summary columns, alert columns)"""
+    ear_thresholds, blink_frames, mar_thresholds, yawn_frames = grid
+    event_window, perclos_window = options['event_window'], options['perclos_window']
+    blink_capacity, yawn_capacity, perclos_capacity = options['capacities']
+    blink_events = counter_events(ear, timestamps, False, ear_thresholds, blink_frames)
+    yawn_events = counter_events(mar, timestamps, True, mar_thresholds, yawn_frames)
+
+    # Yawn-rate alert condition for every (MAR threshold, frames) pair, shared by all blink settings
+    yawn_keys = list(itertools.product(mar_thresholds, yawn_frames))
+    yawn_flags = np.empty((len(yawn_keys), len(timestamps)), dtype=bool)
+    for row, key in enumerate(yawn_keys):
+        per_minute = window_counts(yawn_events[key], timestamps, event_window, yawn_capacity) * 60.0 / event_window
+        yawn_flags[row] = per_minute > options['yawn_thresh']
+
+    summary = {name: [] for name in ('ear_thresh', 'blink_frames', 'mar_thresh', 'yawn_frames',
+                                     'frames', 'blinks', 'yawns', 'alerts', 'alert_seconds')}
+    alerts = {'combination': [], 'start': [], 'end': []}
+    combination = 0
+    for ear_thresh in ear_thresholds:
+        eyes_closed = perclos_flags(ear < ear_thresh, timestamps, perclos_window, perclos_capacity,
+                                    options['min_perclos_frames'], options['perclos_thresh'])
+        for frames in blink_frames:
+            events = blink_events[(ear_thresh, frames)]
+            per_minute = window_counts(events, timestamps, event_window, blink_capacity) * 60.0 / event_window
+            drowsy = yawn_flags | (eyes_closed | (per_minute > options['blink_thresh']))
+            rows, starts, ends = alert_intervals(drowsy, timestamps)
+            alerts['combination'].append((rows + combination).astype(np.int32))
+            alerts['start'].append(starts)
+            alerts['end'].append(ends)
+            alert_count = np.bincount(rows, minlength=len(yawn_keys))
+            alert_seconds = np.bincount(rows, weights=ends - starts, minlength=len(yawn_keys))
+            for row, (mar_thresh, yawn_min) in enumerate(yawn_keys):
+                summary['ear_thresh'].append(ear_thresh)
+                summary['blink_frames'].append(frames)
+                summary['mar_thresh'].append(mar_thresh)
+                summary['yawn_frames'].append(yawn_min)
+                summary['frames'].append(len(timestamps))
+                summary['blinks'].append(len(events))
+                summary['yawns'].append(len(yawn_events[(mar_thresh, yawn_min)]))
+                summary['alerts'].append(int(alert_count[row]))
+                summary['alert_seconds'].append(float(alert_seconds[row]))
+            combination += len(yawn_keys)
+    alerts = {name: np.concatenate(values) if values else np.zeros(0) for name, values in alerts.items()}
+    return summary, alerts
+
+
+def _sweep_job(job):
+    name, path, grid, options = job
+    try:
+        timestamps, ear, mar = load_session(path)
+        summary, alerts = sweep_session(timestamps, ear, mar, grid, options)
+        return name, summary, alerts, ''
+    except Exception as e:
+        return name, None, None, f'{type(e).__name__}: {e}'
+
+
+def find_sessions(inputs, cache_dir=None):
+    """(name, path) for batch_process frame files and landmark cache entries"""
+    paths = []
+    for pattern in inputs:
+        for path in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+            if path.endswith(('.frames.npz', '.frames.parquet')) and os.path.isfile(path) and path not in paths:
+                paths.append(path)
+    # Named like batch_process.py names its outputs, so sessions from different directories stay apart
+    names = output_names([path.rsplit('.frames.', 1)[0] for path in paths])
+    sessions = list(zip(names, paths))
+    if cache_dir:
+        for _, _, key in sorted(LandmarkCache(cache_dir).entries()):
+            sessions.append((key, os.path.join(cache_dir, key)))
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate blink/yawn threshold combinations on recorded sessions')
+    parser.add_argument('inputs', nargs='*', help='*.frames.npz/parquet files from batch_process.py or glob patterns')
+    parser.add_argument('--landmark-cache', nargs='?', const=CACHE_DIR, metavar='DIR',
+                        help='Also sweep every entry of this landmark cache')
+    parser.add_argument('--ear-thresh', type=parse_grid, default=parse_grid('0.18:0.30:0.01'),
+                        help='EYE_AR_THRESH values, start:stop:step or a,b,c (default: 0.18:0.30:0.01)')
+    parser.add_argument('--blink-frames', type=lambda t: parse_grid(t, int), default=parse_grid('1,2,3,4', int),
+                        help='EYE_AR_CONSEC_FRAMES values (default: 1,2,3,4)')
+    parser.add_argument('--mar-thresh', type=parse_grid, default=parse_grid('0.5:0.8:0.05'),
+                        help='MOUTH_AR_THRESH values (default: 0.5:0.8:0.05)')
+    parser.add_argument('--yawn-frames', type=lambda t: parse_grid(t, int), default=parse_grid('5,10,15,20', int),
+                        help='YAWN_CONSEC_FRAMES values (default: 5,10,15,20)')
+    parser.add_argument('-o', '--output', default='sweep_results', help='Output directory (default: sweep_results)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='npz',
+                        help='Columnar output format (parquet needs pyarrow)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes, one session at a time each (default: CPU count)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and pa is None:
+        print("❌ Parquet output needs pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    try:
+        sessions = find_sessions(args.inputs, args.landmark_cache)
+    except ValueError as e:
+        print(f"❌ Session name collision: {e}")
+        sys.exit(1)
+    if not sessions:
+        print("❌ No sessions found (run batch_process.py first)")
+        sys.exit(1)
+
+    grid = (args.ear_thresh, args.blink_frames, args.mar_thresh, args.yawn_frames)
+    combinations = int(np.prod([len(values) for values in grid]))
+    window = _DEFAULT_WINDOW
+    options = {
+        'blink_thresh': detection.DROWSY_BLINK_THRESH, 'yawn_thresh': detection.DROWSY_YAWN_THRESH,
+        'perclos_thresh': detection.PERCLOS_THRESH, 'event_window': detection.DROWSY_WINDOW,
+        'perclos_window': detection.PERCLOS_WINDOW, 'min_perclos_frames': window.min_perclos_frames,
+        'capacities': (window.blinks.capacity, window.yawns.capacity, window.eyes_closed.capacity),
+    }
+    workers = max(1, min(args.workers, len(sessions)))
+    print(f"🎛️  {len(sessions)} session(s) x {combinations} combinations with {workers} worker(s)...")
+
+    os.makedirs(args.output, exist_ok=True)
+    jobs = [(name, path, grid, options) for name, path in sessions]
+    summary_parts, alert_parts = [], []
+    start = time.time()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers) as pool:
+        for name, summary, alerts, error in pool.imap_unordered(_sweep_job, jobs):
+            if error:
+                print(f"❌ {name}: {error}")
+                continue
+            summary['session'] = [name] * len(summary['frames'])
+            alerts['session'] = [name] * len(alerts['start'])
+            summary_parts.append(summary)
+            alert_parts.append(alerts)
+            print(f"✅ {name}: {summary['frames'][0] if summary['frames'] else 0} face frames")
+
+    def merge(parts):
+        return {key: np.concatenate([np.asarray(part[key]) for part in parts]) for key in parts[0]} if parts else {}
+
+    elapsed = time.time() - start
+    if not summary_parts:
+        print("❌ No session could be swept")
+        sys.exit(1)
+    summary_path = write_columns(os.path.join(args.output, 'sweep'), merge(summary_parts), args.format)
+    alerts_path = write_columns(os.path.join(args.output, 'alerts'), merge(alert_parts), args.format)
+    print(f"📊 {len(summary_parts)} session(s) x {combinations} combinations in {elapsed:.1f}s")
+    print(f"💾 Counts per combination: {summary_path}")
+    print(f"💾 Alert timelines (start/end per alert): {alerts_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,35 @@
 import cv2
 import numpy as np
+import os
 import time
 import sys
 from typing import List, Tuple, Optional
 
+# Shared pipeline helpers live in the Ubuntu optimized folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ubuntu_22_04_optimized'))
+from camera_discovery import probe_cameras
+from static_feed import StaticFeedDetector, analyze_feed
+
 class VirtualCameraDetector:
     def __init__(self):
         self.max_cameras_to_test = 10
-        self.test_duration = 3  # seconds to test each camera
+        self.test_duration = 1  # seconds to test each camera at most (usually decided much sooner)
         self.frame_analysis_count = 30  # number of frames to analyze for each camera
         self.similarity_threshold = 0.98  # threshold for considering frames similar (static image)
+        self.static_detector = StaticFeedDetector(self.similarity_threshold)
         
     def list_available_cameras(self) -> List[int]:
         """Find all available camera indices"""
         available_cameras = []
         
         print("🔍 Scanning for available cameras...")
+        # All indices are opened at once, so missing ones cost one timeout instead of one each
+        cameras = {info.index: info for info in probe_cameras(range(self.max_cameras_to_test), read_frame=False)}
         for i in range(self.max_cameras_to_test):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                # Get camera info
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                
-                print(f"📹 Camera {i}: {width}x{height} @ {fps:.1f} FPS")
+            info = cameras.get(i)
+            if info is not None:
+                print(f"📹 Camera {i}: {info.width}x{info.height} @ {info.fps:.1f} FPS")
                 available_cameras.append(i)
-                cap.release()
             else:
                 print(f"❌ Camera {i}: Not available")
                 
@@ -48,9 +51,8 @@ class VirtualCameraDetector:
         gray1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
         gray2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
         
-        # Calculate structural similarity index
-        # For simplicity, we'll use mean squared error
-        mse = np.mean((gray1.astype(float) - gray2.astype(float)) ** 2)
+        # Mean squared error, summed on the uint8 pixels without float copies
+        mse = cv2.norm(gray1, gray2, cv2.NORM_L2SQR) / gray1.size
         max_mse = 255 ** 2
         similarity = 1 - (mse / max_mse)
         
@@ -67,35 +69,16 @@ class VirtualCameraDetector:
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
-        frames = []
-        similarities = []
-        last_frame = None
-        
-        print(f"🔍 Testing camera {camera_index} for {self.test_duration} seconds...")
-        start_time = time.time()
-        
-        while time.time() - start_time < self.test_duration and len(frames) < self.frame_analysis_count:
-            ret, frame = cap.read()
-            if ret:
-                frames.append(frame)
-                
-                if last_frame is not None:
-                    similarity = self.calculate_frame_similarity(last_frame, frame)
-                    similarities.append(similarity)
-                
-                last_frame = frame.copy()
-            
-            time.sleep(0.1)  # Small delay to avoid overwhelming the camera
-        
+        print(f"🔍 Testing camera {camera_index} for up to {self.test_duration} seconds...")
+        # Streams small grayscale frames and stops as soon as the answer is clear
+        result = analyze_feed(cap, self.similarity_threshold, self.frame_analysis_count,
+                              self.test_duration, self.static_detector)
         cap.release()
         
-        if len(similarities) == 0:
-            return False, 0.0, similarities, None
-        
-        avg_similarity = np.mean(similarities)
-        is_static = avg_similarity > self.similarity_threshold
+        if len(result.similarities) == 0:
+            return False, 0.0, result.similarities, None
         
-        return is_static, avg_similarity, similarities, frames[-1] if frames else None
+        return result.is_static, result.similarity, result.similarities, result.sample_frame
     
     def detect_virtual_camera(self) -> Optional[int]:
         """Main function to detect which camera is the OBS virtual camera"""
@@ -1,20 +1,22 @@
 import cv2
 import sys, time
-import mediapipe as mp
 import numpy as np
-
-mp_drawing = mp.solutions.drawing_utils
-mp_face_mesh = mp.solutions.face_mesh
-
-# For live video:
-drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-face_mesh = mp_face_mesh.FaceMesh(
+import argparse
+import os
+# Shared pipeline helpers live in the Ubuntu optimized folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ubuntu_22_04_optimized'))
+from frame_pipeline import create_pipeline, add_pipeline_arguments
+from frame_source import open_source, add_source_arguments
+from startup import BackgroundFaceMesh
+
+# For live video. MediaPipe loads on a background thread while the camera is opened
+face_mesh = BackgroundFaceMesh(
     static_image_mode=False,  # Set to False for video
     max_num_faces=1,          # Allow up to 1 face
     refine_landmarks=True,    # Better landmark accuracy
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5
-)
+).start()
 
 # Eye landmark indices for MediaPipe Face Mesh
 LEFT_EYE_LANDMARKS = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
@@ -99,12 +101,7 @@ def get_face_mesh(image):
     
     for face_landmarks in results.multi_face_landmarks:
         # Draw face mesh
-        mp_drawing.draw_landmarks(
-            image=annotated_image,
-            landmark_list=face_landmarks,
-            connections=mp_face_mesh.FACEMESH_CONTOURS,
-            landmark_drawing_spec=drawing_spec,
-            connection_drawing_spec=drawing_spec)
+        face_mesh.draw_landmarks(annotated_image, face_landmarks)
         
         # Calculate eye aspect ratios for blink detection
         left_ear = calculate_eye_aspect_ratio(LEFT_EYE_POINTS, face_landmarks.landmark)
@@ -136,9 +133,15 @@ def get_face_mesh(image):
     
     return annotated_image, 0, blink_counter, 0, yawn_counter
 
+parser = argparse.ArgumentParser(description='Webcam Driver Drowsiness Detection')
+add_pipeline_arguments(parser)
+add_source_arguments(parser)
+args = parser.parse_args()
+
 # Initialize webcam
 print("🔍 Initializing webcam...")
-cap = cv2.VideoCapture(0)  # Use camera index 0 (built-in webcam)
+# Camera index 0 (built-in webcam) unless another source is given with --source
+cap = open_source(args.source if args.source is not None else 0, args.pacing, args.fps, args.loop)
 
 if not cap.isOpened():
     print("❌ Could not open webcam. Please check:")
@@ -159,16 +162,11 @@ print("Press ESC to quit, S to save, R to reset counters")
 
 font = cv2.FONT_HERSHEY_SIMPLEX
 
-while cap.isOpened():
-    s = time.time()
-    ret, img = cap.read()  
-    if ret == False:
-        print('❌ Webcam Read Error')    
-        sys.exit(0)
-        
-    annotated, ear, blinks, mar, yawns = get_face_mesh(img)
-    e = time.time()
-    fps = 1 / (e - s)
+frames = create_pipeline(cap, get_face_mesh, args.pipelined, args.queue_size, args.drop_policy)
+
+for item in frames:
+    annotated, ear, blinks, mar, yawns = item.result
+    fps = 1 / item.frame_time if item.frame_time > 0 else 0
     
     # Add FPS and title
     cv2.putText(annotated, 'FPS:%5.2f'%(fps), (10,30), font, fontScale = 0.7,  color = (0,255,0), thickness = 2)
@@ -204,6 +202,9 @@ while cap.isOpened():
         yawn_counter = 0
         print(f"🔄 Counters reset - Blinks: 0, Yawns: 0")
 
+frames.stop()
+if frames.read_failed:
+    print('❌ Webcam Read Error')
 cap.release()
 cv2.destroyAllWindows()
 face_mesh.close()